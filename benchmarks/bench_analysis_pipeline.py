@@ -0,0 +1,85 @@
+"""
+Analysis pipeline benchmark
+===========================
+End to end throughput and latency of the app's CustomPreview analysis
+(camera frame -> Fbo -> analyze_pixels_callback -> mean color), driven by
+the synthetic or replay camera provider, no camera needed.
+
+usage: python benchmarks/bench_analysis_pipeline.py [seconds] [replay source]
+set TARGET_RATE to test the adaptive analysis resolution
+"""
+import os
+import sys
+import time
+from statistics import mean, quantiles
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+os.environ.setdefault('KIVY_NO_ARGS', '1')
+duration = float(sys.argv[1]) if len(sys.argv) > 1 else 5.0
+if len(sys.argv) > 2:
+    os.environ['KIVY_CAMERA'] = 'replay'
+    os.environ['CAMERA4KIVY_REPLAY'] = sys.argv[2]
+else:
+    os.environ['KIVY_CAMERA'] = 'synthetic'
+
+from kivy.config import Config
+Config.set('graphics', 'maxfps', '0')
+from kivy.clock import Clock
+from camera4kivy.based_on_kivy_core import camera
+from popups import CustomPreview
+
+COLOR = (200, 120, 40)
+
+
+class BenchPreview(CustomPreview):
+    """
+    CustomPreview recording when frames are scheduled and analyzed
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.frames = 0
+        self.latencies = []
+
+    def analyze_image_callback_schedule(self, texture, tpos, tscale, mirror):
+        self.frames += 1
+        super().analyze_image_callback_schedule(texture, tpos, tscale, mirror)
+
+    def analyze_pixels_callback(self, pixels, image_size, image_pos,
+                                image_scale, mirror, frame_info=None):
+        super().analyze_pixels_callback(pixels, image_size, image_pos,
+                                        image_scale, mirror)
+        # from the capture of the frame to the end of its analysis
+        self.latencies.append(time.monotonic() - frame_info['timestamp'])
+
+
+if __name__ == '__main__':
+    provider = os.environ['KIVY_CAMERA']
+    if provider == 'synthetic':
+        camera.Camera.framerate = 0
+        camera.Camera.color = COLOR
+    else:
+        camera.Camera.framerate = 0
+    preview = BenchPreview()
+    preview.size = (800, 600)
+    preview.connect_camera(camera_id='0', enable_analyze_pixels=True,
+                           sensor_resolution=[1280, 960],
+                           analyze_pixels_target_rate=float(
+                               os.environ.get('TARGET_RATE', 0)))
+    start = time.perf_counter()
+    while time.perf_counter() - start < duration:
+        Clock.tick()
+    elapsed = time.perf_counter() - start
+    preview.disconnect_camera()
+    Clock.tick()
+
+    print(f"provider   {provider}")
+    print(f"frames     {preview.frames / elapsed:8.1f} /s")
+    print(f"analyses   {len(preview.latencies) / elapsed:8.1f} /s")
+    if len(preview.latencies) > 1:
+        p95 = quantiles(preview.latencies, n=20)[-1]
+        print(f"latency    mean {mean(preview.latencies) * 1e3:.2f} ms, "
+              f"p95 {p95 * 1e3:.2f} ms")
+    print(f"analysis   {preview.analyze_stats()}")
+    print(f"mean color {preview.r, preview.g, preview.b}", end='')
+    print(f" (expected {COLOR})" if provider == 'synthetic' else '')
@@ -0,0 +1,55 @@
+"""
+Batch export benchmark
+======================
+Exports a lab day of synthetic sessions with colorimetry.batch.export_batch
+and reports the throughput (sessions/s) against the number of worker
+processes, for the combined document and for one pdf per session.
+The pool start up is counted, as in the app.
+
+usage: python benchmarks/bench_batch_export.py [sessions] [raster]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+os.environ.setdefault('KIVY_NO_ARGS', '1')
+os.environ.setdefault('KIVY_NO_CONSOLELOG', '1')
+
+from colorimetry import Session, Sample
+from colorimetry.batch import export_batch
+
+
+def lab_day(count: int) -> list[tuple[int, Session]]:
+    """
+    sessions of 8 samples with different dye responses
+    """
+    sessions = []
+    for number in range(count):
+        session = Session()
+        session.reference = Sample(250, 248, 245)
+        for i in range(1, 9):
+            k = 1 + number % 7
+            session.add_sample(Sample(250 - 3 * k * i, 248 - 2 * k * i, 245 - k * i, concentration=i * 1e-3))
+        sessions.append((number, session))
+    return sessions
+
+
+def memory_sink(name: str, stream) -> str:
+    return f"{name} ({len(stream.read())} bytes)"
+
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 24
+    vector_chart = not (len(sys.argv) > 2 and sys.argv[2] == 'raster')
+    sessions = lab_day(count)
+    workers_list = sorted({1, 2, 4, os.cpu_count() or 1})
+    print(f"{count} sessions, {'vector' if vector_chart else 'raster'} charts, {os.cpu_count()} cpus")
+    for combined in (True, False):
+        for workers in workers_list:
+            start = time.perf_counter()
+            locations = export_batch(sessions, combined=combined, workers=workers, vector_chart=vector_chart,
+                                     sink=memory_sink)
+            duration = time.perf_counter() - start
+            print(f"{'combined' if combined else 'per session':12s} workers {workers:2d}   "
+                  f"{duration:6.2f} s   {count / duration:7.1f} sessions/s   {locations[0]}")
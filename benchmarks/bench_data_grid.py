@@ -0,0 +1,91 @@
+"""
+Data grid benchmark
+===================
+Shows a session of 100k samples in the data grid of the analysis screen:
+- list: one dict per sample built for RecycleView.data, RecycleBoxLayout (as before)
+- columns: datagrid.SessionDataModel and RecycleRowsLayout, rows formatted and placed only when shown
+and reports the time to show the session, to sort it by absorbance and the
+frame rate while scrolling (a few rows per frame, as with a finger).
+Needs a window (GL context).
+
+usage: python benchmarks/bench_data_grid.py [samples]
+"""
+import os
+import sys
+import time
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+sys.path.insert(0, SRC)
+os.chdir(SRC)
+os.environ.setdefault('KIVY_NO_ARGS', '1')
+os.environ.setdefault('KIVY_NO_CONSOLELOG', '1')
+
+import random
+from kivy.base import EventLoop
+from kivy.lang import Builder
+from kivy.core.window import Window
+from kivy.factory import Factory
+from colorimetry import Session, Sample
+from datagrid import SessionDataModel
+import screens.analysisscreen  # noqa: F401 (DataGrid and DataGridItem)
+
+Builder.load_string("""
+<ListDataGrid@RecycleView>:
+    viewclass: 'DataGridItem'
+    RecycleBoxLayout:
+        default_size: None, dp(56)
+        default_size_hint: 1, None
+        size_hint_y: None
+        height: self.minimum_height
+        orientation: 'vertical'
+""")
+
+
+def frame(action) -> float:
+    """
+    time of action and of the frame drawn after it, in s
+    """
+    start = time.perf_counter()
+    action()
+    EventLoop.idle()
+    return time.perf_counter() - start
+
+
+def list_rows(session: Session, key=None) -> list[dict]:
+    rows = [{'concentration_text': f"{c:.2e}", 'absorbance_text': f"{a:.3f}", 'sample': s}
+            for c, a, s in session.absorbance_data_points]
+    if key is not None:
+        rows.sort(key=lambda row: row['sample'].absorbance)
+    return rows
+
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    session = Session()
+    session.reference = Sample(250, 248, 245)
+    random.seed(0)
+    for _ in range(count):
+        session.add_sample(Sample(random.randint(20, 249), random.randint(20, 247), random.randint(20, 244),
+                                  concentration=random.random() * 1e-2))
+    session.absorbance_data_points, session.absorbance_columns  # computed once for both modes
+    for mode in ('list', 'columns'):
+        grid = Factory.ListDataGrid() if mode == 'list' else Factory.DataGrid()
+        Window.add_widget(grid)
+        EventLoop.idle()
+        if mode == 'list':
+            show = frame(lambda: setattr(grid, 'data', list_rows(session)))
+            sort = frame(lambda: setattr(grid, 'data', list_rows(session, key='absorbance')))
+        else:
+            model = SessionDataModel()
+            grid.data_model = model
+            show = frame(lambda: model.show(session))
+            sort = frame(lambda: model.sort('absorbance'))
+        start = time.perf_counter()
+        frames = 240
+        step = 3 * 56 / (56 * count - grid.height)  # 3 rows per frame
+        for i in range(frames):
+            grid.scroll_y = 1 - i * step
+            EventLoop.idle()
+        fps = frames / (time.perf_counter() - start)
+        Window.remove_widget(grid)
+        print(f"{mode:8s} {count} rows   show {show * 1e3:7.1f} ms   sort {sort * 1e3:7.1f} ms   scroll {fps:5.1f} fps")
@@ -0,0 +1,77 @@
+"""
+Pdf compression benchmark
+=========================
+Draws reports with a table of 60 measures and a picture of the sample
+(320x240 RGB) on each page, with the page and image streams compressed
+on the drawing thread (0 threads, as before) or handed over to worker
+threads (Canvas(compressionThreads=n)), and reports the pages per second
+for each thread count. zlib releases the GIL: the gain needs several cores.
+The streams are binary (rl_config.useA85 = 0): without reportlab's C
+accelerator the ASCII85 encoding is done in python, holding the GIL.
+The image cache is disabled (rl_config.pdfImageCacheSize = 0): each run
+encodes its images, as the first document of a process does.
+
+usage: python benchmarks/bench_pdf_compression.py [pages] [threads ...]
+"""
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import numpy as np
+from PIL import Image
+from reportlab import rl_config
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfgen.canvas import Canvas
+
+
+def pictures(count: int) -> list[ImageReader]:
+    """
+    pictures of colored samples (smooth gradient and a little sensor noise), all different
+    """
+    rng = np.random.default_rng(0)
+    y, x = np.mgrid[0:240, 0:320]
+    result = []
+    for i in range(count):
+        color = rng.uniform(40, 220, 3)
+        shade = 1 - 0.3 * np.hypot(x - 160, y - 120)[..., None] / 200
+        noise = rng.normal(0, 1, (240, 320, 3))
+        pixels = np.clip(color * shade + noise, 0, 255).astype(np.uint8)
+        result.append(ImageReader(Image.fromarray(pixels, 'RGB')))
+    return result
+
+
+def build(pages: int, threads: int, images: list[ImageReader]) -> tuple[float, int]:
+    """
+    time and size of the pdf
+    """
+    output = io.BytesIO()
+    start = time.perf_counter()
+    canvas = Canvas(output, compressionThreads=threads)
+    for page in range(pages):
+        canvas.setFont('Helvetica-Bold', 14)
+        canvas.drawString(50, 800, f"Analyse n°{page}")
+        canvas.drawImage(images[page], 300, 420, width=240, height=180)
+        canvas.setFont('Helvetica', 10)
+        for i in range(60):
+            y = 780 - 12 * i
+            canvas.drawString(50, y, f"{(page * 60 + i) * 1e-4:.2e}")
+            canvas.drawRightString(250, y, f"{i / 60:.3f}")
+            canvas.line(50, y - 3, 250, y - 3)
+        canvas.showPage()
+    canvas.save()
+    return time.perf_counter() - start, len(output.getvalue())
+
+
+if __name__ == '__main__':
+    pages = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    thread_counts = [int(n) for n in sys.argv[2:]] or [0, 1, 2, 4]
+    rl_config.useA85 = 0
+    rl_config.pdfImageCacheSize = 0
+    images = pictures(pages)
+    print(f"{os.cpu_count()} cpu(s)")
+    for threads in thread_counts:
+        duration, size = build(pages, threads, images)
+        print(f"{pages:5d} pages   {threads:2d} threads   {pages / duration:7.1f} pages/s   pdf {size / 2 ** 20:6.2f} MB")
@@ -0,0 +1,54 @@
+"""
+Streaming pdf benchmark
+=======================
+Draws long reports (a table of 60 measures per page) on a canvas kept in
+memory until saved (as before) or streamed page by page to the file
+(Canvas(streaming=True)), and reports the time and the peak of python
+memory (tracemalloc) while drawing and saving. Each build runs in its own
+interpreter. (With platypus the story, built before the document, is kept
+whatever the mode.)
+
+usage: python benchmarks/bench_pdf_streaming.py [pages ...]
+"""
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+
+def build(pages: int, streaming: bool) -> None:
+    import tracemalloc
+    from reportlab.pdfgen.canvas import Canvas
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'report.pdf')
+        tracemalloc.start()
+        start = time.perf_counter()
+        canvas = Canvas(path, streaming=streaming)
+        for page in range(pages):
+            canvas.setFont('Helvetica-Bold', 14)
+            canvas.drawString(50, 800, f"Analyse n°{page}")
+            canvas.setFont('Helvetica', 10)
+            for i in range(60):
+                y = 780 - 12 * i
+                canvas.drawString(50, y, f"{(page * 60 + i) * 1e-4:.2e}")
+                canvas.drawRightString(250, y, f"{i / 60:.3f}")
+                canvas.line(50, y - 3, 250, y - 3)
+            canvas.showPage()
+        canvas.save()
+        duration = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        size = os.path.getsize(path)
+    print(f"{pages:6d} pages   {'streamed' if streaming else 'in memory':9s}   {duration:6.2f} s   "
+          f"peak {peak / 2 ** 20:7.1f} MB   pdf {size / 2 ** 20:6.2f} MB")
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == '--run':
+        build(int(sys.argv[2]), sys.argv[3] == '1')
+    else:
+        for pages in sys.argv[1:] or ['100', '1000']:
+            for streaming in ('0', '1'):
+                subprocess.run([sys.executable, os.path.abspath(__file__), '--run', pages, streaming], check=True)
@@ -0,0 +1,81 @@
+"""
+Plot decimation benchmark
+=========================
+Plots noisy data sets of growing size in a kivy_garden Graph, with all the
+points and through plotting.DecimatedPlot (vertex budget 1024), and reports:
+- frame: time to give the points to the plot and draw the next frame
+- pan: time to decimate again after a change of the x range (pyramid cached)
+- vertices: number of points given to the plot
+A kivy Point instruction holds at most 2^15-2 points: larger data sets
+can't be drawn without decimation.
+Needs a window (GL context).
+
+usage: python benchmarks/bench_plot_decimation.py [max points]
+"""
+import os
+import sys
+import time
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+sys.path.insert(0, SRC)
+os.environ.setdefault('KIVY_NO_ARGS', '1')
+os.environ.setdefault('KIVY_NO_CONSOLELOG', '1')
+
+import numpy as np
+from kivy.base import EventLoop
+from kivy.core.window import Window
+from kivy_garden.graph import Graph, PointPlot
+from plotting import DecimatedPlot
+
+POINT_LIMIT = 2 ** 15 - 2  # kivy.graphics.Point
+
+
+def frame(action) -> float:
+    """
+    time of action and of the frame drawn after it, in s
+    """
+    start = time.perf_counter()
+    action()
+    EventLoop.idle()
+    return time.perf_counter() - start
+
+
+def data(count: int) -> list[tuple[float, float]]:
+    """
+    noisy calibration line
+    """
+    rng = np.random.default_rng(count)
+    x = np.sort(rng.uniform(0, 1e-2, count))
+    y = 150 * x + rng.normal(0, 0.05, count)
+    return list(zip(x.tolist(), y.tolist()))
+
+
+if __name__ == '__main__':
+    largest = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    graph = Graph(xmin=0, xmax=1e-2, ymin=0, ymax=2, x_ticks_major=1e-3, y_ticks_major=0.1)
+    Window.add_widget(graph)
+    EventLoop.idle()
+    count = 1000
+    while count <= largest:
+        points = data(count)
+        # all the points
+        full = None
+        if count <= POINT_LIMIT:
+            plot = PointPlot(point_size=2)
+            graph.add_plot(plot)
+            full = frame(lambda: setattr(plot, 'points', points))
+            graph.remove_plot(plot)
+        # decimated
+        plot = PointPlot(point_size=2)
+        graph.add_plot(plot)
+        decimated = DecimatedPlot(plot, graph=graph, budget=1024)
+        first = frame(lambda: (decimated.set_points(points), decimated.update()))
+        vertices = len(plot.points)
+        pan = frame(lambda: (setattr(graph, 'xmin', 2e-3), setattr(graph, 'xmax', 7e-3), decimated.update()))
+        same = frame(decimated.update)
+        graph.remove_plot(plot)
+        graph.xmin, graph.xmax = 0, 1e-2
+        full = f"{full * 1e3:8.1f} ms" if full is not None else '   too many'
+        print(f"{count:8d} points   full frame {full}   decimated frame {first * 1e3:7.1f} ms   "
+              f"pan {pan * 1e3:6.1f} ms   unchanged {same * 1e3:5.1f} ms   vertices {vertices:4d}")
+        count *= 10
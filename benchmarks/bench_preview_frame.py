@@ -0,0 +1,128 @@
+"""
+Preview frame-time benchmark
+============================
+Drives PreviewKivyCamera with a dummy camera provider (no sensor needed)
+and measures the time spent in the per frame path (texture blit + on_tex),
+with the analysis overlay of the app's CustomPreview, and the camera
+teardown latency (stop_camera, called on each capture popup dismiss).
+
+usage: python benchmarks/bench_preview_frame.py [frames]
+"""
+import os
+import sys
+import time
+from statistics import mean, quantiles
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+os.environ.setdefault('KIVY_NO_ARGS', '1')
+
+from kivy.graphics import Color, Line, Rectangle
+from kivy.graphics.texture import Texture
+from camera4kivy.based_on_kivy_core.camera import CameraBase
+from camera4kivy.preview_kivycamera import PreviewKivyCamera
+
+
+class DummyCamera(CameraBase):
+    """
+    Camera provider pushing a constant frame at each update
+    """
+
+    def init_camera(self):
+        self._texture = Texture.create(size=self._resolution, colorfmt='rgb')
+        self._texture.flip_vertical()
+        self._frame = bytes(self._resolution[0] * self._resolution[1] * 3)
+
+    def update(self):
+        self._buffer = self._frame
+        self._copy_to_gpu()
+
+
+def overlay(texture, tex_size, tex_pos):
+    # same instructions as popups.CustomPreview
+    x, y = tex_pos
+    w, h = tex_size
+    Color(1, 1, 1, 1)
+    Line(rectangle=(x + w / 2 - 50, y + h / 2 - 50, 100, 100), width=1)
+
+
+def legacy_on_tex(self, camera):
+    # per frame path before the instructions were made persistent
+    tex = self._camera.texture.get_region(*self.tex_crop)
+    view_size = self.view_size
+    view_pos = self.view_pos
+    self.canvas.clear()
+    with self.canvas:
+        Color(1, 1, 1, 1)
+        Rectangle(texture=tex, size=view_size, pos=view_pos)
+        self.canvas_callback(tex, view_size, view_pos)
+
+
+def legacy_clear_texture(self):
+    # teardown before the blank buffer allocation was removed
+    tex_size = self._camera.texture.size
+    buf = bytes([255] * tex_size[0] * tex_size[1] * 3)
+    self._camera.texture.blit_buffer(buf, colorfmt=self._camera._format,
+                                     bufferfmt='ubyte')
+    self.on_tex(None)
+
+
+def teardown(resolution: tuple[int, int], legacy: bool) -> float:
+    preview = PreviewKivyCamera()
+    preview.size = (800, 600)
+    preview.configure_viewport()
+    preview.data_callback = None
+    preview.canvas_callback = overlay
+    preview.mirror = False
+    if legacy:
+        preview.clear_texture = legacy_clear_texture.__get__(preview)
+    camera = DummyCamera(resolution=resolution, context=preview)
+    preview._camera = camera
+    preview.configure_texture_crop(None)
+    camera.update()
+    start = time.perf_counter()
+    preview.stop_camera()
+    return time.perf_counter() - start
+
+
+def run(frames: int, resolution: tuple[int, int], legacy: bool) -> list[float]:
+    preview = PreviewKivyCamera()
+    preview.size = (800, 600)
+    preview.configure_viewport()
+    preview.data_callback = None
+    preview.canvas_callback = overlay
+    preview.mirror = False
+    if legacy:
+        preview.on_tex = legacy_on_tex.__get__(preview)
+    camera = DummyCamera(resolution=resolution, context=preview)
+    preview._camera = camera
+    preview.configure_texture_crop(None)
+    frame_timings = []
+    on_tex_timings = []
+    for _ in range(frames):
+        start = time.perf_counter()
+        camera.update()
+        frame_timings.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        preview.on_tex(None)
+        on_tex_timings.append(time.perf_counter() - start)
+    return frame_timings, on_tex_timings
+
+
+def report(name: str, timings: tuple[list[float], list[float]]) -> None:
+    for label, values in zip(('frame', 'on_tex'), timings):
+        p95 = quantiles(values, n=20)[-1]
+        print(f"{name:12s}{label:8s} mean {mean(values) * 1e3:7.3f} ms   p95 {p95 * 1e3:7.3f} ms")
+
+
+if __name__ == '__main__':
+    frames = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    for resolution in [(640, 480), (1280, 960)]:
+        print(f"--- {resolution[0]}x{resolution[1]}, {frames} frames")
+        report('legacy', run(frames, resolution, legacy=True))
+        report('persistent', run(frames, resolution, legacy=False))
+    print("--- teardown (stop_camera)")
+    for resolution in [(1280, 960), (1920, 1080), (3264, 2448)]:
+        old = teardown(resolution, legacy=True)
+        new = teardown(resolution, legacy=False)
+        print(f"{resolution[0]}x{resolution[1]:<6d} legacy {old * 1e3:9.3f} ms"
+              f"   current {new * 1e3:7.3f} ms")
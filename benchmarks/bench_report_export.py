@@ -0,0 +1,54 @@
+"""
+Report export benchmark
+=======================
+Exports the same session with the vector chart (reportlab graphics) and
+with the matplotlib png chart, and compares export time and pdf size.
+Each export runs in a new interpreter so the import time of the chart
+library is counted, as for the first export in the app.
+
+usage: python benchmarks/bench_report_export.py [repeat]
+"""
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+
+EXPORT = """
+import sys, time
+sys.path.insert(0, {src!r})
+start = time.perf_counter()
+from colorimetry import Session, Sample
+session = Session()
+session.reference = Sample(250, 250, 250)
+for i in range(1, 9):
+    session.add_sample(Sample(250 - 25 * i, 250 - 15 * i, 250 - 8 * i, concentration=i * 1e-3))
+path = session.export_report(1, vector_chart={vector})
+print(time.perf_counter() - start, path)
+"""
+
+
+def export(vector: bool) -> tuple[float, int]:
+    """
+    exports a report in a new interpreter (home and working directory are temporary)
+    returns (export time in s, pdf size in bytes)
+    """
+    with tempfile.TemporaryDirectory() as home:
+        os.makedirs(os.path.join(home, 'Documents'))
+        env = dict(os.environ, HOME=home, KIVY_NO_ARGS='1')
+        out = subprocess.run([sys.executable, '-c', EXPORT.format(src=os.path.abspath(SRC), vector=vector)],
+                             cwd=home, env=env, capture_output=True, text=True, check=True).stdout
+        duration, path = out.strip().splitlines()[-1].split(' ', 1)
+        return float(duration), os.path.getsize(path)
+
+
+if __name__ == '__main__':
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    for vector, name in ((True, 'vector (reportlab)'), (False, 'raster (matplotlib)')):
+        start = time.perf_counter()
+        results = [export(vector) for _ in range(repeat)]
+        best = min(duration for duration, _ in results)
+        print(f"{name:20s} export {best * 1e3:8.1f} ms (best of {repeat})   "
+              f"pdf {results[0][1] / 1024:8.1f} kB   process {(time.perf_counter() - start) / repeat:6.2f} s")
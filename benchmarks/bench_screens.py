@@ -0,0 +1,96 @@
+"""
+Session screens memory benchmark
+================================
+Creates 100 sessions of 8 samples and compares the memory used when every
+session has its AnalysisScreen (eager, as before) with the lazy screen
+manager of the app (current and adjacent screens only). Each mode runs in
+its own interpreter, without transition animations so the page change time
+is the cost of building or rebinding screens. Needs a window (GL context).
+
+usage: python benchmarks/bench_screens.py [sessions]
+"""
+import os
+import subprocess
+import sys
+import time
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+
+
+def rss() -> int:
+    """
+    resident memory of this process in bytes (linux)
+    """
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+
+
+def run(mode: str, count: int) -> None:
+    """
+    builds the sessions in this process and prints the measures
+    """
+    os.chdir(SRC)
+    sys.path.insert(0, SRC)
+    os.environ['KIVY_NO_ARGS'] = '1'
+    os.environ['KIVY_NO_CONSOLELOG'] = '1'
+    import tracemalloc
+    from kivy.base import EventLoop
+    from kivy.core.window import Window
+    from kivy.uix.screenmanager import ScreenManager, Screen, NoTransition
+    from colorimetry import Sample
+    from main import MyScreenManager
+    from screens.analysisscreen import AnalysisScreen, SessionData
+
+    def fill(session):
+        session.reference = Sample(250, 248, 245)
+        for i in range(1, 9):
+            session.add_sample(Sample(250 - 12 * i, 248 - 8 * i, 245 - 4 * i, concentration=i * 1e-3))
+
+    EventLoop.idle()
+    base = rss()
+    tracemalloc.start()
+    start = time.perf_counter()
+    if mode == 'eager':
+        sm = ScreenManager(transition=NoTransition())
+        sm.add_widget(Screen(name='main_screen'))  # the info page needs a running app
+        for number in range(count):
+            data = SessionData(number)
+            fill(data.session)
+            sm.add_widget(AnalysisScreen(data=data, name=f'analysis_screen{number}'))
+    else:
+        sm = MyScreenManager(transition=NoTransition())
+        sm.add_widget(Screen(name='main_screen'))  # the info page needs a running app
+        sm.current = 'main_screen'
+        for number in range(count):
+            name = f'analysis_screen{number}'
+            sm.sessions[name] = SessionData(number)
+            fill(sm.sessions[name].session)
+        sm.last_number_for_analysis = count
+        sm.show_page('analysis_screen0', 'left')
+    Window.add_widget(sm)
+    for _ in range(5):
+        EventLoop.idle()
+    duration = time.perf_counter() - start
+    python_heap, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    built = sum(isinstance(screen, AnalysisScreen) for screen in sm.screens)
+    # browse all the sessions
+    start = time.perf_counter()
+    for _ in range(count):
+        if mode == 'eager':
+            sm.current = sm.next()
+        else:
+            sm.change_screen('right')
+        EventLoop.idle()
+    browse = (time.perf_counter() - start) / count
+    print(f"{mode:6s} {count} sessions   built screens {built:3d}   rss +{(rss() - base) / 2 ** 20:6.1f} MB   "
+          f"python heap {python_heap / 2 ** 20:6.1f} MB   build {duration:6.2f} s   page change {browse * 1e3:6.1f} ms")
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 2 and sys.argv[1] == '--run':
+        run(sys.argv[2], int(sys.argv[3]))
+    else:
+        count = sys.argv[1] if len(sys.argv) > 1 else '100'
+        for mode in ('eager', 'lazy'):
+            subprocess.run([sys.executable, os.path.abspath(__file__), '--run', mode, count], check=True)
@@ -0,0 +1,73 @@
+"""
+Startup benchmark
+=================
+Starts the app in a new interpreter and reports:
+- import: time to import main.py
+- first frame: time until the window shows the main screen
+- ready: time until the popups and the camera provider are loaded
+(all from the start of the interpreter). The app is stopped when it is
+ready. Needs a window (GL context).
+
+usage: python benchmarks/bench_startup.py [repeat]
+"""
+import os
+import subprocess
+import sys
+import time
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+
+APP = """
+import os, sys, time
+start = float(sys.argv[1])
+sys.path.insert(0, '.')
+import main
+imported = time.time()
+from kivy.clock import Clock
+from kivy.core.window import Window
+times = {'import': imported - start}
+
+app = main.MobileColorimeterApp()
+
+
+def first_frame(*args):
+    Window.unbind(on_flip=first_frame)
+    times.setdefault('first frame', time.time() - start)
+
+
+def check_ready(dt):
+    if 'first frame' in times and getattr(app, 'ui_ready', True) and 'popups' in sys.modules:
+        times['ready'] = time.time() - start
+        app.stop()
+    else:
+        Clock.schedule_once(check_ready, 0)
+
+
+def on_start(*args):
+    Window.bind(on_flip=first_frame)
+    check_ready(0)
+
+
+app.bind(on_start=on_start)
+app.run()
+for name, value in times.items():
+    print(f"{name}={value:.4f}")
+"""
+
+
+def start_app() -> dict[str, float]:
+    """
+    runs the app once, returns the times in s
+    """
+    env = dict(os.environ, KIVY_NO_ARGS='1', KIVY_NO_CONSOLELOG='1')
+    out = subprocess.run([sys.executable, '-c', APP, str(time.time())], cwd=SRC, env=env,
+                         capture_output=True, text=True, check=True).stdout
+    return {name: float(value) for name, value in (line.split('=') for line in out.splitlines() if '=' in line)}
+
+
+if __name__ == '__main__':
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    start_app()  # warm the file system cache
+    runs = [start_app() for _ in range(repeat)]
+    for name in runs[0]:
+        print(f"{name:12s} {min(run[name] for run in runs) * 1e3:8.1f} ms (best of {repeat})")
@@ -0,0 +1,96 @@
+"""
+String width benchmark
+======================
+Lays out a paragraph heavy report (method notes and a table of measures,
+in Helvetica and in a TrueType font) with platypus, as the report layout
+does for each pdf, and measures:
+- stringWidth calls on the words of the report, one by one and with
+  pdfmetrics.stringWidths (one call for all the words)
+- the layout of the report (wrap and split of the flowables, no pdf written)
+each without the word width cache (rl_config.stringWidthCacheSize = 0,
+per character sums as before) and with it.
+
+usage: python benchmarks/bench_string_width.py [paragraphs]
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from reportlab import rl_config
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.platypus import Paragraph, Table
+
+TTF = '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf'
+WORDS = ("la solution étalon est diluée puis mesurée à la longueur d'onde de la diode "
+         "l'absorbance suit la loi de Beer-Lambert sur toute la gamme de concentrations "
+         "chaque échantillon est lu trois fois et la moyenne est retenue pour l'étalonnage").split()
+
+
+def flowables(paragraphs: int) -> list:
+    """
+    paragraphs of notes and tables of measures
+    """
+    rng = random.Random(0)
+    styles = getSampleStyleSheet()
+    styles['BodyText'].fontName = 'Helvetica'
+    story = []
+    for i in range(paragraphs):
+        style = styles['BodyText'] if i % 2 else styles['Normal']
+        if os.path.exists(TTF) and i % 3 == 0:
+            style = style.clone(f"ttf{i}", fontName='DejaVuSans')
+        story.append(Paragraph(' '.join(rng.choice(WORDS) for _ in range(120)), style))
+        if i % 5 == 4:
+            story.append(Table([[f"{(i * 20 + j) * 1e-4:.2e}", f"{rng.random():.3f}", rng.choice(WORDS)]
+                                for j in range(20)]))
+    return story
+
+
+def layout(story: list) -> float:
+    """
+    time to wrap and split the story on A4 frames, in s
+    """
+    width, height = A4[0] - 144, A4[1] - 144
+    start = time.perf_counter()
+    pending = list(story)
+    while pending:
+        flowable = pending.pop(0)
+        if flowable.wrap(width, height)[1] > height:
+            pending[0:0] = flowable.split(width, height)
+    return time.perf_counter() - start
+
+
+def widths(words: list[str], batch: bool) -> float:
+    """
+    time of the widths of the words in Helvetica 10, in s
+    """
+    start = time.perf_counter()
+    if batch:
+        pdfmetrics.stringWidths(words, 'Helvetica', 10)
+    else:
+        for word in words:
+            pdfmetrics.stringWidth(word, 'Helvetica', 10)
+    return time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    paragraphs = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    rng = random.Random(1)
+    words = [rng.choice(WORDS) for _ in range(100_000)]
+    cache_size = rl_config.stringWidthCacheSize
+    for cached in (False, True):
+        rl_config.stringWidthCacheSize = cache_size if cached else 0
+        pdfmetrics._reset()
+        if os.path.exists(TTF):
+            pdfmetrics.registerFont(TTFont('DejaVuSans', TTF))
+        one = widths(words, False)
+        many = widths(words, True)
+        story = flowables(paragraphs)
+        duration = layout(story)
+        print(f"{'cached' if cached else 'uncached':9s} {len(words)} words   stringWidth {one * 1e3:6.1f} ms"
+              f"   stringWidths {many * 1e3:6.1f} ms   layout of {paragraphs} paragraphs {duration * 1e3:7.1f} ms")
@@ -0,0 +1,63 @@
+"""
+TrueType font benchmark
+=======================
+Builds a series of one page reports, each registering its TrueType fonts
+again (ttfonts.freshTTFont) as a report service does for every request:
+- uncached: font files read in memory, parsed and subset for each document (as before)
+- cached: font files memory mapped (rl_config.ttfMmap), parsed tables shared
+  between TTFont instances (rl_config.ttfParsedCacheSize) and subsets kept
+  between documents (rl_config.ttfSubsetCacheSize)
+and reports the font cost (registering the fonts and saving the report) of
+the first document and of the next ones.
+
+usage: python benchmarks/bench_ttf_fonts.py [documents] [font.ttf ...]
+"""
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from reportlab import rl_config
+from reportlab.pdfbase import pdfmetrics, ttfonts
+from reportlab.pdfgen.canvas import Canvas
+
+FONTS = ['/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf',
+         '/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf']
+
+
+def report(fonts: list[str]) -> float:
+    """
+    time of a report using the fonts, in s
+    """
+    start = time.perf_counter()
+    names = []
+    for i, path in enumerate(fonts):
+        names.append(f"Bench{i}")
+        pdfmetrics.registerFont(ttfonts.freshTTFont(names[-1], path))
+    canvas = Canvas(io.BytesIO())
+    for i in range(60):
+        canvas.setFont(names[i % len(names)], 10)
+        canvas.drawString(50, 800 - 12 * i, f"Échantillon n°{i}   c = {i * 1e-4:.2e} mol/L   A = {i / 60:.3f}")
+    canvas.showPage()
+    canvas.save()
+    return time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    documents = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    fonts = sys.argv[2:] or FONTS
+    for mode in ('uncached', 'cached'):
+        rl_config.ttfMmap = mode == 'cached'
+        rl_config.ttfSubsetCacheSize = 4 * 1024 * 1024 if mode == 'cached' else 0
+        rl_config.ttfParsedCacheSize = 16 if mode == 'cached' else 0
+        ttfonts._reset()
+        times = []
+        for _ in range(documents):
+            if mode == 'uncached':
+                ttfonts._reset()
+            times.append(report(fonts))
+        nexts = times[1:] or times
+        print(f"{mode:9s} {len(fonts)} fonts   first document {times[0] * 1e3:7.1f} ms"
+              f"   next documents {sum(nexts) / len(nexts) * 1e3:7.1f} ms")
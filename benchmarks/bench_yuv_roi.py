@@ -0,0 +1,60 @@
+"""
+YUV to rgb benchmark
+====================
+Checks the NumPy YUV420 conversion against PIL (JPEG full range) on
+synthetic planes, and compares the analysis of a region of interest with
+the conversion of the whole frame. No camera or GL context needed.
+
+usage: python benchmarks/bench_yuv_roi.py
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+os.environ.setdefault('KIVY_NO_ARGS', '1')
+
+import numpy as np
+from PIL import Image
+from camera4kivy.based_on_kivy_core.camera.yuv import YUVFrame, yuv420_to_rgb
+
+
+def synthetic_planes(width: int, height: int) -> tuple[bytes, bytes, bytes, np.ndarray]:
+    """
+    yuv420 planes of a smooth color image, and the image
+    """
+    xs = np.linspace(0, 1, width, dtype=np.float32)
+    ys = np.linspace(0, 1, height, dtype=np.float32)[:, np.newaxis]
+    rgb = np.empty((height, width, 3), dtype=np.uint8)
+    rgb[..., 0] = 40 + 180 * xs
+    rgb[..., 1] = 200 - 150 * ys
+    rgb[..., 2] = 90 + 60 * xs * ys
+    ycc = np.asarray(Image.fromarray(rgb).convert('YCbCr'))
+    y = ycc[..., 0].tobytes()
+    u = ycc[::2, ::2, 1].tobytes()
+    v = ycc[::2, ::2, 2].tobytes()
+    return y, u, v, rgb
+
+
+def timed(function, repeat: int = 20) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return (time.perf_counter() - start) / repeat
+
+
+if __name__ == '__main__':
+    for width, height in [(800, 600), (1280, 960), (2304, 1296)]:
+        y, u, v, rgb = synthetic_planes(width, height)
+        frame = YUVFrame(y, u, v, (width, height))
+        error = np.abs(frame.to_rgb().astype(int) - rgb.astype(int))
+        roi = frame.roi_pixels(fraction=(100 / width, 100 / height))
+        x0, y0, w, h = roi
+        expected = rgb[y0:y0 + h, x0:x0 + w].reshape(-1, 3).mean(axis=0)
+        measured = frame.mean_rgb(fraction=(100 / width, 100 / height))
+        full = timed(lambda: yuv420_to_rgb(y, u, v, (width, height)))
+        part = timed(lambda: frame.mean_rgb(fraction=(100 / width, 100 / height)))
+        print(f"--- {width}x{height}")
+        print(f"max error {error.max()}, roi mean {np.round(measured, 2)} "
+              f"(expected {np.round(expected, 2)})")
+        print(f"full frame {full * 1e3:8.3f} ms   roi 100x100 {part * 1e3:6.3f} ms")
@@ -17,6 +17,7 @@ Core class for acquiring the camera and converting its input into a
 __all__ = ('CameraBase', 'Camera')
 
 
+from time import monotonic
 from kivy.utils import platform
 from kivy.event import EventDispatcher
 from kivy.logger import Logger
@@ -24,6 +25,24 @@ from .. import core_select_lib
 
 
 class CameraBase(EventDispatcher):
+    '''Abstract Camera Widget class.
+
+    :Events:
+        `on_load`
+            Fired when the camera is loaded and the texture has become
+            available.
+        `on_texture`
+            Fired each time the camera texture is updated.
+
+    Each frame copied to the texture is described by `frame_info`, a dict
+    with at least:
+        `timestamp`: monotonic capture time (time.monotonic() clock)
+        `sequence`: frame number since the camera was created
+    and, when the provider knows them, `exposure` and `gain` (provider
+    units). A frame copied again keeps its capture timestamp.
+    '''
+
+    __events__ = ('on_load', 'on_texture')
 
     def __init__(self, **kwargs):
         kwargs.setdefault('stopped', False)
@@ -36,12 +55,20 @@ class CameraBase(EventDispatcher):
         self._buffer = None
         self._format = 'rgb'
         self._texture = None
+        self._sequence = 0
+        self.frame_info = {}
         self.capture_device = None
         super().__init__()
         self.init_camera()
         #if not self.stopped and not self._context:
         #    self.start()
 
+    def _get_resolution(self):
+        return self._resolution
+
+    resolution = property(lambda self: self._get_resolution(),
+                          doc='Resolution of camera capture (width, height)')
+
     def _get_texture(self):
         return self._texture
     
@@ -64,11 +91,31 @@ class CameraBase(EventDispatcher):
         '''Update the camera (internal)'''
         pass
 
-    def _copy_to_gpu(self):
-        '''Copy the the buffer into the texture'''
+    def yuv_frame(self):
+        '''YUVFrame (see yuv.py) of the last frame for providers receiving
+        YUV planes, else None.'''
+        return None
+
+    def lock_exposure(self, lock=True):
+        '''Freeze the exposure, gain and white balance at their current
+        values, or release them with lock=False.
+        Returns True if the camera did it.'''
+        return False
+
+    def _copy_to_gpu(self, timestamp=None, **metadata):
+        '''Copy the the buffer into the texture
+
+        :Parameters:
+            `timestamp`: monotonic capture time of the buffer, default is now
+            `metadata`: exposure, gain, ... of the buffer
+        '''
         if self._texture is None:
             Logger.debug('Camera: copy_to_gpu() failed, _texture is None !')
             return
+        self._sequence += 1
+        metadata['timestamp'] = monotonic() if timestamp is None else timestamp
+        metadata['sequence'] = self._sequence
+        self.frame_info = metadata
         self._texture.blit_buffer(self._buffer, colorfmt=self._format) 
         self._buffer = None
         if self._context:
@@ -76,11 +123,11 @@ class CameraBase(EventDispatcher):
         else:
             self.dispatch('on_texture')
 
-    #def on_texture(self):
-    #    pass
+    def on_texture(self):
+        pass
 
-    #def on_load(self):
-    #    pass
+    def on_load(self):
+        pass
 
 import kivy
 import importlib
@@ -119,6 +166,8 @@ if platform in ['macosx', 'ios']:
 elif platform == 'win':
     providers += (('opencv', 'camera_opencv', 'CameraOpenCV'), )
     providers += (('gi', 'camera_gi', 'CameraGi'), )
+    providers += (('synthetic', 'camera_synthetic', 'CameraSynthetic'), )
+    providers += (('replay', 'camera_replay', 'CameraReplay'), )
 elif platform == 'android':
     pass
 else:
@@ -126,7 +175,11 @@ else:
     providers += (('picamera', 'camera_picamera', 'CameraPiCamera'), )
     providers += (('gi', 'camera_gi', 'CameraGi'), )
     providers += (('opencv', 'camera_opencv', 'CameraOpenCV'), )
+    providers += (('synthetic', 'camera_synthetic', 'CameraSynthetic'), )
+    providers += (('replay', 'camera_replay', 'CameraReplay'), )
 
+# synthetic and replay are not in the default kivy options, they are only
+# selected with KIVY_CAMERA=synthetic or KIVY_CAMERA=replay
 if providers:
     Camera = select_provider('camera', (providers),
                              base='camera4kivy.based_on_kivy_core')
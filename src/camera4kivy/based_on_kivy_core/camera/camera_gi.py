@@ -15,11 +15,12 @@ except:
 from gi.repository import Gst
 from kivy.clock import Clock
 from kivy.graphics.texture import Texture
-from kivy.core.camera import CameraBase
+from . import CameraBase
 from kivy.support import install_gobject_iteration
 from kivy.logger import Logger
 from ctypes import Structure, c_void_p, c_int, string_at
 from weakref import ref
+from time import monotonic
 import atexit
 
 # initialize the camera/gi. if the older version is used, don't use camera_gi.
@@ -79,7 +80,7 @@ class CameraGi(CameraBase):
 
         video_src = self._video_src
         if video_src == 'v4l2src':
-            video_src += ' device=/dev/video%d' % self._index
+            video_src += ' device=/dev/video%d name=camerasrc' % self._index
         elif video_src == 'dc1394src':
             video_src += ' camera-number=%d' % self._index
 
@@ -125,6 +126,7 @@ class CameraGi(CameraBase):
             return False
 
         self._sample = sample
+        self._sample_time = monotonic()
 
         if self._texturesize is None:
             # try to get the camera image size
@@ -147,6 +149,23 @@ class CameraGi(CameraBase):
         super(CameraGi, self).stop()
         self._pipeline.set_state(Gst.State.PAUSED)
 
+    def lock_exposure(self, lock=True):
+        # v4l2 controls are applied as soon as they are set on an open device
+        # both white balance names are set, they changed with kernel versions
+        src = self._pipeline.get_by_name('camerasrc') if self._pipeline\
+            else None
+        if src is None:
+            return False
+        if lock:
+            controls = ('c,auto_exposure=1,white_balance_automatic=0,'
+                        'white_balance_temperature_auto=0')
+        else:
+            controls = ('c,auto_exposure=3,white_balance_automatic=1,'
+                        'white_balance_temperature_auto=1')
+        src.set_property('extra-controls',
+                         Gst.Structure.new_from_string(controls))
+        return True
+
     def unload(self):
         self._pipeline.set_state(Gst.State.NULL)
 
@@ -177,7 +196,7 @@ class CameraGi(CameraBase):
 
             # now get the memory
             self._buffer = string_at(c_mapinfo.data, mapinfo.size)
-            self._copy_to_gpu()
+            self._copy_to_gpu(timestamp=self._sample_time, pts=buf.pts)
         finally:
             if mapinfo is not None:
                 buf.unmap(mapinfo)
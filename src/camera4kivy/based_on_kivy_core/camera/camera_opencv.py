@@ -43,7 +43,9 @@ class CameraOpenCV(CameraBase):
             ret, frame = self._device.read()
             if ret:
                 self._buffer = frame.reshape(-1)
-                self._copy_to_gpu()
+                self._copy_to_gpu(
+                    exposure=self._device.get(cv2.CAP_PROP_EXPOSURE),
+                    gain=self._device.get(cv2.CAP_PROP_GAIN))
                 if self.photo_capture:
                     self.photo_capture = False
                     cropped = frame[self.crop[1]: self.crop[1]+self.crop[3],
@@ -74,6 +76,27 @@ class CameraOpenCV(CameraBase):
             self._update_ev.cancel()
             self._update_ev = None
 
+    def lock_exposure(self, lock=True):
+        if self._device is None:
+            return False
+        device = self._device
+        # CAP_PROP_AUTO_EXPOSURE values: DirectShow 0.25 manual, 0.75 auto
+        # V4L2 1 manual, 3 aperture priority
+        if lock:
+            exposure = device.get(cv2.CAP_PROP_EXPOSURE)
+            gain = device.get(cv2.CAP_PROP_GAIN)
+            temperature = device.get(cv2.CAP_PROP_WB_TEMPERATURE)
+            manual = 0.25 if platform == 'win' else 1
+            locked = device.set(cv2.CAP_PROP_AUTO_EXPOSURE, manual)
+            locked = device.set(cv2.CAP_PROP_EXPOSURE, exposure) and locked
+            device.set(cv2.CAP_PROP_GAIN, gain)
+            if device.set(cv2.CAP_PROP_AUTO_WB, 0):
+                device.set(cv2.CAP_PROP_WB_TEMPERATURE, temperature)
+            return bool(locked)
+        auto = 0.75 if platform == 'win' else 3
+        device.set(cv2.CAP_PROP_AUTO_WB, 1)
+        return bool(device.set(cv2.CAP_PROP_AUTO_EXPOSURE, auto))
+
     def photo(self, path, callback):
         self.photo_capture = True
         self.photo_path = path
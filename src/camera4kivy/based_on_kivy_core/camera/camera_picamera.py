@@ -9,11 +9,12 @@ PiCamera Camera: Implement CameraBase with PiCamera
 __all__ = ('CameraPiCamera', )
 
 from math import ceil
+from time import monotonic
 
 from kivy.logger import Logger
 from kivy.clock import Clock
 from kivy.graphics.texture import Texture
-from kivy.core.camera import CameraBase
+from . import CameraBase
 
 from picamera import PiCamera
 import numpy
@@ -69,6 +70,7 @@ class CameraPiCamera(CameraBase):
             output = numpy.empty(
                 (bufsize[0] * bufsize[1] * 3,), dtype=numpy.uint8)
             self._camera.capture(output, self._format, use_video_port=True)
+            timestamp = monotonic()
 
             # Trim the buffer to fit the actual requested resolution.
             # TODO: Is there a simpler way to do all this reshuffling?
@@ -77,7 +79,9 @@ class CameraPiCamera(CameraBase):
             self._buffer = output.reshape(
                 (self.resolution[0] * self.resolution[1] * 3,))
 
-            self._copy_to_gpu()
+            self._copy_to_gpu(timestamp=timestamp,
+                              exposure=self._camera.exposure_speed,
+                              gain=float(self._camera.analog_gain))
         except KeyboardInterrupt:
             raise
         except Exception:
@@ -18,8 +18,10 @@ from picamera2.request import _MappedBuffer
 
 import numpy as np
 from os import environ
+from time import monotonic
 from PIL import Image
 from . import CameraBase
+from .yuv import YUVFrame
 
 import signal
 import subprocess
@@ -42,18 +44,33 @@ class SensorInterface(NullPreview):
         self.v = None
         self.mjpeg = None
         self.stream_size = ()
+        self.frame_info = {}
 
     # Sync event loops
     ###################
     @mainthread
-    def sync_yuv(self,y,u,v):
+    def sync_yuv(self,y,u,v,frame_info):
         self.y = y
         self.u = u
         self.v = v
+        self.frame_info = frame_info
 
     @mainthread
-    def sync_mjpeg(self,mjpeg):
+    def sync_mjpeg(self,mjpeg,frame_info):
         self.mjpeg = mjpeg
+        self.frame_info = frame_info
+
+    def request_frame_info(self, request):
+        # capture time and exposure of the request, the same frame
+        # displayed again keeps this timestamp
+        frame_info = {'timestamp': monotonic()}
+        try:
+            metadata = request.get_metadata()
+            frame_info['exposure'] = metadata.get('ExposureTime')
+            frame_info['gain'] = metadata.get('AnalogueGain')
+        except Exception:
+            pass
+        return frame_info
     
     # Request Handlers
     ###################
@@ -71,6 +88,7 @@ class SensorInterface(NullPreview):
             # The added latency due to array manipulation in some of
             # these, occurs in the Picamera2 thread and is much less
             # than sample period of the Kivy thread. Nyquist is happy.
+            frame_info = self.request_frame_info(request)
             with _MappedBuffer(request,self.display_stream_name) as mm:
                 if self.stream_fmt == 'YUV420':
                     size = len(mm)
@@ -79,10 +97,10 @@ class SensorInterface(NullPreview):
                     y = bytes(mm[:end_y])
                     u = bytes(mm[end_y:end_u])
                     v = bytes(mm[end_u:])
-                    self.sync_yuv(y,u,v)
+                    self.sync_yuv(y,u,v,frame_info)
                                 
                 elif self.stream_fmt == 'MJPEG':
-                    self.sync_mjpeg(bytes(mm))
+                    self.sync_mjpeg(bytes(mm),frame_info)
                     
                 elif self.stream_fmt and not self.mute:
                     self.mute = True
@@ -297,6 +315,19 @@ class CameraPi2():
     # Display Update
     ###############################
 
+    def frame_info(self):
+        if self.sensor:
+            return self.sensor.frame_info
+        return {}
+
+    def yuv_frame(self):
+        ss = self.sensor
+        if ss and ss.y and ss.stream_fmt == 'YUV420':
+            stride = len(ss.y) // ss.stream_size[1]
+            return YUVFrame(ss.y, ss.u, ss.v, ss.stream_size,
+                            rotation=self._rotate, stride=stride)
+        return None
+
     def update(self):
         ss = self.sensor
         if ss and ss.y:
@@ -353,6 +384,16 @@ class CameraPi2():
         self.picam2.controls.ScalerCrop = self.scaler_crop
 
 
+    # Exposure lock
+    ###############################
+
+    def lock_exposure(self, lock):
+        if self.picam2 and not self.is_usb:
+            self.picam2.set_controls({'AeEnable': not lock,
+                                      'AwbEnable': not lock})
+            return True
+        return False
+
     # Photo start/stop capture
     ###############################
 
@@ -539,7 +580,7 @@ class CameraPiCamera2(CameraBase):
         try:
             self._buffer = self._camera.update()
             if self._buffer:
-                self._copy_to_gpu()
+                self._copy_to_gpu(**self._camera.frame_info())
         except Exception as e:
             Logger.error('CameraPiCamera2\n' + str(e))
 
@@ -588,6 +629,16 @@ class CameraPiCamera2(CameraBase):
         if self._camera:
             self._camera.zoom(scale)
 
+    def lock_exposure(self, lock=True):
+        if self._camera:
+            return self._camera.lock_exposure(lock)
+        return False
+
+    def yuv_frame(self):
+        if self._camera:
+            return self._camera.yuv_frame()
+        return None
+
     def drag(self, dx, dy):
         if self._camera:
             self._camera.drag(dx, dy)
@@ -0,0 +1,159 @@
+'''
+Replay Camera
+=============
+
+Implement CameraBase by replaying recorded frames, no camera required.
+The source is a directory of images (played in name order) or a video
+file (needs OpenCV). Playback loops at the end of the source.
+
+The provider is not part of the default kivy camera options, enable it with
+the environment variable KIVY_CAMERA=replay
+
+:Parameters:
+    `source`: str, default is the CAMERA4KIVY_REPLAY environment variable
+        directory of images or video file.
+    `framerate`: float, default is 30
+        frames per second, 0 for one frame per Clock tick.
+    `loop`: bool, default is True
+        restart at the first frame at the end of the source.
+'''
+
+__all__ = ('CameraReplay', )
+
+from os import environ, listdir
+from os.path import isdir, join, splitext
+from kivy.logger import Logger
+from kivy.clock import Clock
+from kivy.graphics.texture import Texture
+from PIL import Image
+from . import CameraBase
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.tif', '.tiff')
+
+
+class CameraReplay(CameraBase):
+
+    source = environ.get('CAMERA4KIVY_REPLAY', '')
+    framerate = 30
+    loop = True
+
+    def __init__(self, **kwargs):
+        self._update_ev = None
+        self._frames = []
+        self._frame_index = 0
+        self._video = None
+        self.source = kwargs.get('source', self.source)
+        self.framerate = kwargs.get('framerate', self.framerate)
+        self.loop = kwargs.get('loop', self.loop)
+        super().__init__(**kwargs)
+
+    def init_camera(self):
+        if not self.source:
+            raise ValueError('Replay: no source, set CAMERA4KIVY_REPLAY')
+        if isdir(self.source):
+            self._format = 'rgb'
+            self._frames = self.load_images(self.source)
+        else:
+            self._format = 'bgr'
+            self._video = self.open_video(self.source)
+        if self.framerate:
+            self.fps = 1.0 / self.framerate
+        else:
+            self.fps = 0
+        if self._context:
+            self.crop = self._context.crop_for_aspect_orientation(
+                *self._resolution)
+        self.stopped = True
+
+    def load_images(self, directory):
+        '''Decode all the images of the directory, they must have the same
+        size. The frames are decoded once so the replay does no file io.'''
+        names = sorted(name for name in listdir(directory)
+                       if splitext(name)[1].lower() in IMAGE_EXTENSIONS)
+        if not names:
+            raise ValueError('Replay: no image in ' + directory)
+        frames = []
+        for name in names:
+            with Image.open(join(directory, name)) as img:
+                img = img.convert('RGB')
+                if not frames:
+                    self._resolution = img.size
+                elif img.size != tuple(self._resolution):
+                    Logger.warning('Replay: skipping ' + name +
+                                   ', size is not ' + str(self._resolution))
+                    continue
+                frames.append(img.tobytes())
+        Logger.info('Replay: ' + str(len(frames)) + ' frames from ' +
+                    directory)
+        return frames
+
+    def open_video(self, path):
+        import cv2
+        video = cv2.VideoCapture(path)
+        if not video.isOpened():
+            raise ValueError('Replay: unable to open ' + path)
+        self._resolution = (int(video.get(cv2.CAP_PROP_FRAME_WIDTH)),
+                            int(video.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+        if self.framerate and video.get(cv2.CAP_PROP_FPS) > 1:
+            self.framerate = video.get(cv2.CAP_PROP_FPS)
+        return video
+
+    def next_frame(self):
+        '''Next frame buffer, None at the end of a source without loop'''
+        if self._video is not None:
+            ret, frame = self._video.read()
+            if not ret and self.loop:
+                self.rewind()
+                ret, frame = self._video.read()
+            return frame.reshape(-1) if ret else None
+        if self._frame_index >= len(self._frames):
+            if not self.loop:
+                return None
+            self._frame_index = 0
+        frame = self._frames[self._frame_index]
+        self._frame_index += 1
+        return frame
+
+    def rewind(self):
+        '''Play the source again from its first frame'''
+        if self._video is not None:
+            import cv2
+            self._video.set(cv2.CAP_PROP_POS_FRAMES, 0)
+        self._frame_index = 0
+
+    def update(self, dt):
+        if self.stopped:
+            return
+        if self._texture is None:
+            self._texture = Texture.create(self._resolution)
+            self._texture.flip_vertical()
+            if self._context:
+                self._context.on_load()
+        self._buffer = self.next_frame()
+        if self._buffer is None:
+            return
+        self._copy_to_gpu()
+
+    def start(self):
+        self.stopped = False
+        if self._update_ev is not None:
+            self._update_ev.cancel()
+        self._update_ev = Clock.schedule_interval(self.update, self.fps)
+
+    def stop(self):
+        self.stopped = True
+        if self._update_ev is not None:
+            self._update_ev.cancel()
+            self._update_ev = None
+        # the video capture is kept so that start() can play the source
+        # again, release() closes it
+        self.rewind()
+
+    def release(self):
+        '''Close the video file and free the frames, the camera can not be
+        started again'''
+        self.stop()
+        if self._video is not None:
+            self._video.release()
+            self._video = None
+        self._frames = []
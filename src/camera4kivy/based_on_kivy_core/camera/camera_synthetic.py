@@ -0,0 +1,112 @@
+'''
+Synthetic Camera
+================
+
+Implement CameraBase with generated frames, no camera required.
+Frames have a known content so analysis results can be checked, and the
+frame rate can be fixed or unlimited for benchmarks.
+
+The provider is not part of the default kivy camera options, enable it with
+the environment variable KIVY_CAMERA=synthetic
+
+:Parameters:
+    `pattern`: str, default is 'color'
+        'color' a uniform frame, 'noise' the color plus gaussian noise,
+        'gradient' a horizontal gradient from black to the color.
+    `color`: tuple, default is (128, 128, 128)
+        rgb color of the frame.
+    `noise`: float, default is 8
+        standard deviation of the noise (pattern 'noise').
+    `framerate`: float, default is 30
+        frames per second, 0 for one frame per Clock tick.
+'''
+
+__all__ = ('CameraSynthetic', )
+
+from kivy.logger import Logger
+from kivy.clock import Clock
+from kivy.graphics.texture import Texture
+import numpy as np
+from . import CameraBase
+
+
+class CameraSynthetic(CameraBase):
+
+    pattern = 'color'
+    color = (128, 128, 128)
+    noise = 8.0
+    framerate = 30
+    # number of pre-generated noise frames, played in a loop
+    noise_frames = 8
+
+    def __init__(self, **kwargs):
+        self._update_ev = None
+        self._frames = []
+        self._frame_index = 0
+        self.pattern = kwargs.get('pattern', self.pattern)
+        self.color = tuple(kwargs.get('color', self.color))
+        self.noise = kwargs.get('noise', self.noise)
+        self.framerate = kwargs.get('framerate', self.framerate)
+        super().__init__(**kwargs)
+
+    def init_camera(self):
+        self._format = 'rgb'
+        if not self._resolution:
+            self._resolution = (640, 480)
+        self._resolution = (int(self._resolution[0]),
+                            int(self._resolution[1]))
+        self._frames = self.generate_frames()
+        self._frame_index = 0
+        if self.framerate:
+            self.fps = 1.0 / self.framerate
+        else:
+            self.fps = 0
+        if self._context:
+            self.crop = self._context.crop_for_aspect_orientation(
+                *self._resolution)
+        self.stopped = True
+
+    def generate_frames(self):
+        '''Frames played by the camera, as flat rgb numpy arrays'''
+        w, h = self._resolution
+        color = np.array(self.color, dtype=np.float32)
+        if self.pattern == 'noise':
+            rng = np.random.default_rng(0)
+            frames = []
+            for _ in range(self.noise_frames):
+                frame = color + rng.normal(0, self.noise, (h, w, 3))
+                frames.append(np.clip(frame, 0, 255).astype(np.uint8))
+        elif self.pattern == 'gradient':
+            ramp = np.linspace(0, 1, w, dtype=np.float32)
+            frame = ramp[np.newaxis, :, np.newaxis] * color
+            frames = [np.broadcast_to(frame, (h, w, 3)).astype(np.uint8)]
+        else:
+            if self.pattern != 'color':
+                Logger.warning('Synthetic: unknown pattern ' +
+                               str(self.pattern) + ', using color')
+            frames = [np.full((h, w, 3), self.color, dtype=np.uint8)]
+        return [frame.reshape(-1) for frame in frames]
+
+    def update(self, dt):
+        if self.stopped:
+            return
+        if self._texture is None:
+            self._texture = Texture.create(self._resolution)
+            self._texture.flip_vertical()
+            if self._context:
+                self._context.on_load()
+        self._buffer = self._frames[self._frame_index]
+        self._frame_index = (self._frame_index + 1) % len(self._frames)
+        self._copy_to_gpu()
+
+    def start(self):
+        self.stopped = False
+        if self._update_ev is not None:
+            self._update_ev.cancel()
+        self._update_ev = Clock.schedule_interval(self.update, self.fps)
+
+    def stop(self):
+        self.stopped = True
+        if self._update_ev is not None:
+            self._update_ev.cancel()
+            self._update_ev = None
@@ -0,0 +1,128 @@
+'''
+YUV frames
+==========
+
+CPU conversion of YUV420 (I420) planes to rgb with NumPy, for the analysis
+of a region of interest without the GPU shader and Fbo readback.
+Only the rows and columns of the region are converted.
+
+Any provider receiving YUV planes can return a YUVFrame from
+CameraBase.yuv_frame().
+'''
+
+__all__ = ('YUVFrame', 'yuv420_to_rgb')
+
+import numpy as np
+
+# rgb = matrix @ (y - y_offset, u - 128, v - 128)
+YUV_MATRICES = {
+    # full range, same as the picamera2 shader
+    'jpeg': (0, np.array([[1.0, 0.0, 1.402],
+                          [1.0, -0.344, -0.714],
+                          [1.0, 1.772, 0.0]], dtype=np.float32)),
+    # limited range
+    'rec601': (16, np.array([[1.164, 0.0, 1.596],
+                             [1.164, -0.392, -0.813],
+                             [1.164, 2.017, 0.0]], dtype=np.float32)),
+    'rec709': (16, np.array([[1.164, 0.0, 1.793],
+                             [1.164, -0.213, -0.533],
+                             [1.164, 2.112, 0.0]], dtype=np.float32)),
+}
+
+
+def _plane(data, width, height, stride):
+    plane = np.frombuffer(data, dtype=np.uint8)
+    return plane[:stride * height].reshape(height, stride)[:, :width]
+
+
+def yuv420_to_rgb(y, u, v, size, roi=None, matrix='jpeg', stride=None):
+    '''Convert the region of interest of YUV420 planes to rgb
+
+    :Parameters:
+        `y`, `u`, `v`: bytes like planes, u and v are half size
+        `size`: (width, height) of the y plane
+        `roi`: (x, y, w, h) in pixels of the y plane, top left origin,
+            default is the whole frame
+        `matrix`: 'jpeg' (full range), 'rec601' or 'rec709'
+        `stride`: bytes per row of the y plane, default is width
+
+    Returns a (h, w, 3) uint8 array.
+    '''
+    width, height = size
+    stride = stride or width
+    if roi is None:
+        roi = (0, 0, width, height)
+    x0, y0, w, h = (int(val) for val in roi)
+    x0 = min(max(x0, 0), width - 1)
+    y0 = min(max(y0, 0), height - 1)
+    x1 = min(x0 + max(w, 1), width)
+    y1 = min(y0 + max(h, 1), height)
+    y_plane = _plane(y, width, height, stride)
+    u_plane = _plane(u, (width + 1) // 2, (height + 1) // 2, stride // 2)
+    v_plane = _plane(v, (width + 1) // 2, (height + 1) // 2, stride // 2)
+    # chroma of each pixel of the roi, half resolution
+    rows = np.arange(y0, y1) // 2
+    cols = np.arange(x0, x1) // 2
+    yuv = np.empty((y1 - y0, x1 - x0, 3), dtype=np.float32)
+    yuv[..., 0] = y_plane[y0:y1, x0:x1]
+    yuv[..., 1] = u_plane[rows[:, np.newaxis], cols]
+    yuv[..., 2] = v_plane[rows[:, np.newaxis], cols]
+    offset, mat = YUV_MATRICES[matrix]
+    yuv -= (offset, 128, 128)
+    rgb = yuv @ mat.T
+    return np.clip(rgb + 0.5, 0, 255).astype(np.uint8)
+
+
+class YUVFrame:
+    '''YUV420 planes of one camera frame
+
+    :Parameters:
+        `y`, `u`, `v`: bytes like planes
+        `size`: (width, height) of the y plane
+        `rotation`: clockwise rotation of the displayed image (0, 90, 180,
+            270), regions given as ratios of the displayed image are
+            rotated to the planes.
+        `matrix`: conversion matrix, see yuv420_to_rgb()
+        `crop`: (x, y, w, h) part of the rotated frame that is displayed
+            (cropped to the aspect ratio of the preview), as ratios of the
+            rotated frame. Set by the preview.
+    '''
+
+    def __init__(self, y, u, v, size, rotation=0, matrix='jpeg',
+                 stride=None, crop=(0.0, 0.0, 1.0, 1.0)):
+        self.y = y
+        self.u = u
+        self.v = v
+        self.size = tuple(size)
+        self.rotation = rotation
+        self.matrix = matrix
+        self.stride = stride
+        self.crop = tuple(crop)
+
+    def roi_pixels(self, center=(0.5, 0.5), fraction=(1.0, 1.0)):
+        '''Region of the planes, in pixels, from a region of the displayed
+        image given by its center and size as ratios'''
+        x, y, w, h = self.crop
+        cx, cy = x + center[0] * w, y + center[1] * h
+        fw, fh = fraction[0] * w, fraction[1] * h
+        if self.rotation in (90, 270):
+            cx, cy = cy, cx
+            fw, fh = fh, fw
+        if self.rotation in (90, 180):
+            cy = 1 - cy
+        if self.rotation in (180, 270):
+            cx = 1 - cx
+        width, height = self.size
+        w = max(round(fw * width), 1)
+        h = max(round(fh * height), 1)
+        return (round(cx * width - w / 2), round(cy * height - h / 2), w, h)
+
+    def to_rgb(self, roi=None):
+        '''rgb array of the roi (pixels of the planes), see yuv420_to_rgb()'''
+        return yuv420_to_rgb(self.y, self.u, self.v, self.size, roi=roi,
+                             matrix=self.matrix, stride=self.stride)
+
+    def mean_rgb(self, center=(0.5, 0.5), fraction=(1.0, 1.0)):
+        '''Mean (r, g, b) of a region of the displayed image'''
+        rgb = self.to_rgb(self.roi_pixels(center, fraction))
+        return tuple(float(c) for c in rgb.reshape(-1, 3).mean(axis=0))
@@ -3,7 +3,11 @@ from kivy.uix.label import Label
 from kivy.graphics import Fbo, Color, Rectangle, Scale
 from kivy.properties import ColorProperty, StringProperty, ObjectProperty
 from kivy.utils import platform
+from kivy.logger import Logger
+from kivy.clock import mainthread
 from threading import Thread, Event
+from inspect import signature
+from time import perf_counter
 
 
 if platform == 'android':
@@ -60,6 +64,19 @@ class Preview(AnchorLayout):
         self._image_available = Event()
         self.analyze_resolution = 1024
         self.auto_analyze_resolution = []
+        self.analyze_target_rate = 0
+        self.analyze_resolution_bounds = (256, 2048)
+        self.skip_repeated_frames = True
+        self.frame_info = {}
+        self.yuv_frame = None
+        self._reset_analyze_stats()
+        self.exposure_locked = False
+        self.convergence_time = None
+        self._lock_requested = None
+        self._reference_color = None
+        self._frame_lock_requested = None
+        self._frame_reference_color = None
+        self._analyze_pixels = False
     
     def on_orientation(self,instance,orientation):
         if self.preview and not self.inhibit_property:
@@ -80,11 +97,26 @@ class Preview(AnchorLayout):
     ##########################################
 
     def connect_camera(self, analyze_pixels_resolution = 1024,
-                       enable_analyze_pixels = False, **kwargs):
+                       enable_analyze_pixels = False,
+                       analyze_pixels_target_rate = 0,
+                       analyze_pixels_resolution_bounds = (256, 2048),
+                       **kwargs):
+        # analyze_pixels_target_rate : analyses per second, if set the
+        #    analysis resolution is adapted within
+        #    analyze_pixels_resolution_bounds to reach this rate.
         self.analyze_resolution = analyze_pixels_resolution
+        self.analyze_target_rate = analyze_pixels_target_rate
+        self.analyze_resolution_bounds = (
+            min(analyze_pixels_resolution_bounds),
+            max(analyze_pixels_resolution_bounds))
+        self._reset_analyze_stats()
+        parameters = signature(self.analyze_pixels_callback).parameters
+        self._pass_frame_info = 'frame_info' in parameters
+        self._pass_yuv_frame = 'yuv_frame' in parameters
         self.inhibit_property = True
         self.camera_connected = True
         self._fbo = None
+        self._analyze_pixels = enable_analyze_pixels
         if enable_analyze_pixels:
             Thread(target=self.image_scheduler, daemon=True).start()
         self.preview.connect_camera(analyze_callback =
@@ -97,6 +129,8 @@ class Preview(AnchorLayout):
 
     def disconnect_camera(self):
         self._image_available.set()
+        # the camera controls outlive the device, give them back first
+        self.unlock_exposure()
         self.camera_connected = False
         self.preview.disconnect_camera()
         self.inhibit_property = False
@@ -145,8 +179,20 @@ class Preview(AnchorLayout):
         # tpos   : location of texture in Preview
         # tscale : scale from oriented Texture resolution to Preview resolution
         # mirror : true if preview is mirrored
-        if not self._busy:
+        frame_info = self.preview.frame_info()
+        timestamp = frame_info.get('timestamp')
+        if self.skip_repeated_frames and timestamp is not None and\
+           timestamp == self._last_frame_timestamp:
+            # same capture displayed again, already analyzed
+            self._frames_repeated += 1
+            return
+        self._frames_offered += 1
+        if self._busy:
+            self._frames_dropped += 1
+        else:
             self._busy = True
+            self._analyze_start = perf_counter()
+            self._last_frame_timestamp = timestamp
             # Create a texture with lower resolution
             if self.auto_analyze_resolution:
                 # resolution set by the analyzer [w,h] regardless of
@@ -167,24 +213,41 @@ class Preview(AnchorLayout):
                 fbo_size  = (round(texture.size[0]/fbo_scale),
                              round(texture.size[1]/fbo_scale))
                 scale = tscale * fbo_scale
-            origin    = (round(fbo_size[0]/2), round(fbo_size[1]/2))
-            # new or resized texture
-            if not self._fbo or self._fbo.size[0] != fbo_size[0] or\
-               self._fbo.size[1] != fbo_size[1]:
-                self._fbo = Fbo(size = fbo_size)
-            self._fbo.clear()
-            with self._fbo:
-                Color(1,1,1,1)
-                Scale(1,-1,1, origin = origin)
-                Rectangle(texture= texture, size = fbo_size)
-            self._fbo.draw()
+            # lock and normalization decided with the frame, they may change
+            # on the main thread before the frame is analyzed
+            lock_requested = self._lock_requested
+            reference_color = self._reference_color
+            # YUV planes analyzed on the cpu, no Fbo and no readback
+            # (the lock needs the pixels)
+            self.yuv_frame = None
+            if self._pass_yuv_frame and lock_requested is None and\
+               reference_color is None:
+                self.yuv_frame = self.preview.yuv_frame()
+            if self.yuv_frame:
+                self.pixels = None
+                self.im_size = tuple(fbo_size)
+            else:
+                origin    = (round(fbo_size[0]/2), round(fbo_size[1]/2))
+                # new or resized texture
+                if not self._fbo or self._fbo.size[0] != fbo_size[0] or\
+                   self._fbo.size[1] != fbo_size[1]:
+                    self._fbo = Fbo(size = fbo_size)
+                self._fbo.clear()
+                with self._fbo:
+                    Color(1,1,1,1)
+                    Scale(1,-1,1, origin = origin)
+                    Rectangle(texture= texture, size = fbo_size)
+                self._fbo.draw()
+                self.pixels = self._fbo.texture.pixels
+                self.im_size = self._fbo.texture.size
 
             # save these for self.analyze_pixels_callback()
-            self.pixels = self._fbo.texture.pixels
-            self.im_size = self._fbo.texture.size
             self.scale = scale  # 2 ele list , or scalar
             self.tpos = tpos
             self.mirror = mirror
+            self.frame_info = frame_info
+            self._frame_lock_requested = lock_requested
+            self._frame_reference_color = reference_color
             # ready
             self._image_available.set()
 
@@ -195,14 +258,211 @@ class Preview(AnchorLayout):
             # Thread
             if self._image_available.is_set():
                 self._image_available.clear()
-                self.analyze_pixels_callback(self.pixels, self.im_size, self.tpos,
-                                             self.scale, self.mirror)
+                pixels = self.pixels
+                lock_requested = self._frame_lock_requested
+                reference_color = self._frame_reference_color
+                if pixels is not None and lock_requested is not None:
+                    self._check_convergence(pixels, self.im_size,
+                                            self.frame_info, lock_requested)
+                if pixels is not None and reference_color is not None:
+                    pixels = self._normalize_pixels(pixels, self.im_size,
+                                                    reference_color)
+                kwargs = {}
+                if self._pass_frame_info:
+                    kwargs['frame_info'] = self.frame_info
+                if self._pass_yuv_frame:
+                    kwargs['yuv_frame'] = self.yuv_frame
+                self.analyze_pixels_callback(pixels, self.im_size,
+                                             self.tpos, self.scale,
+                                             self.mirror, **kwargs)
+                # measured before the next frame can be scheduled
+                self._adapt_analyze_resolution(perf_counter() -
+                                               self._analyze_start)
                 self._busy = False
 
+    ##########################################
+    # Adaptive Analysis Resolution
+    ##########################################
+
+    def _reset_analyze_stats(self):
+        self._frames_offered = 0
+        self._frames_dropped = 0
+        self._frames_repeated = 0
+        self._last_frame_timestamp = None
+        self._analyses = 0
+        self._analyze_start = 0
+        self._cycle_time = 0
+        self._window_start = perf_counter()
+        self._window_offered = 0
+        self._window_dropped = 0
+
+    def _adapt_analyze_resolution(self, cycle_time):
+        # cycle_time : from the frame scheduled for analysis to the end of
+        #    analyze_pixels_callback(), the time the analysis is busy.
+        # Every 5 analyses the measured analysis rate and drop rate of the
+        # window decide the step, no model of the analysis cost is assumed:
+        # - rate below the target and frames dropped : the analysis is the
+        #   bottleneck, lower the resolution
+        # - rate above the target and no frame dropped : the analysis keeps
+        #   up with the camera, raise the resolution
+        # - else (camera limited or near the target) : keep it
+        if self._cycle_time:
+            self._cycle_time = 0.8 * self._cycle_time + 0.2 * cycle_time
+        else:
+            self._cycle_time = cycle_time
+        self._analyses += 1
+        if not self.analyze_target_rate or self.auto_analyze_resolution or\
+           self._analyses % 5:
+            return
+        now = perf_counter()
+        rate = 5 / (now - self._window_start)
+        offered = self._frames_offered - self._window_offered
+        dropped = self._frames_dropped - self._window_dropped
+        self._window_start = now
+        self._window_offered = self._frames_offered
+        self._window_dropped = self._frames_dropped
+        if rate < 0.9 * self.analyze_target_rate and dropped:
+            ratio = 0.8
+        elif rate > 1.1 * self.analyze_target_rate and not dropped and\
+             offered:
+            ratio = 1.25
+        else:
+            return
+        low, high = self.analyze_resolution_bounds
+        resolution = round(min(max(self.analyze_resolution * ratio, low),
+                               high) / 16) * 16
+        if resolution != self.analyze_resolution:
+            self.analyze_resolution = resolution
+            Logger.info('Preview: analysis resolution ' + str(resolution))
+
+    def analyze_stats(self):
+        # Report of the analysis, keep the resolution with the results
+        # for them to be reproducible.
+        # resolution    : long edge of the analyzed image
+        # analysis_time : mean (ema) time per analysis in seconds
+        # analysis_rate : analyses per second at that time
+        # drop_rate     : ratio of the frames not analyzed
+        # repeated      : frames skipped because already analyzed
+        if self.auto_analyze_resolution:
+            resolution = max(self.auto_analyze_resolution)
+        else:
+            resolution = self.analyze_resolution
+        return {'resolution': resolution,
+                'analysis_time': self._cycle_time,
+                'analysis_rate': 1 / self._cycle_time if self._cycle_time\
+                                 else 0,
+                'drop_rate': self._frames_dropped / self._frames_offered\
+                             if self._frames_offered else 0,
+                'repeated': self._frames_repeated}
+
+    ##########################################
+    # Exposure and White Balance Lock
+    ##########################################
+
+    def lock_exposure(self, reference_patch = None, callback = None,
+                      timeout = 5):
+        # Freeze exposure, gain and white balance once the automatic
+        # exposure has converged (stable image level, exposure and gain over
+        # the last analyzed frames), or after timeout seconds.
+        # The camera does the lock if it can. If not, and a reference_patch
+        # is given, the analyzed pixels are normalized so that the patch
+        # keeps its color at the time of the lock.
+        #
+        # reference_patch : (x, y, w, h) region of the analyzed image that
+        #    does not change (white background...), as ratios of the image
+        #    size.
+        # callback : called on the main thread with
+        #    (convergence_time, hardware), hardware is False for the software
+        #    fallback.
+        self.unlock_exposure()
+        self._lock_patch = reference_patch
+        self._lock_callback = callback
+        self._lock_timeout = timeout
+        self._lock_history = []
+        self._lock_requested = perf_counter()
+        if not self._analyze_pixels:
+            # no analyzed frames to check the convergence
+            self._lock_requested = None
+            self._apply_exposure_lock(0, None)
+
+    def unlock_exposure(self):
+        self._lock_requested = None
+        self._reference_color = None
+        if self.exposure_locked:
+            self.preview.lock_exposure(False)
+        self.exposure_locked = False
+        self.convergence_time = None
+
+    def _check_convergence(self, pixels, image_size, frame_info,
+                           lock_requested):
+        import numpy as np
+        image = np.frombuffer(pixels, dtype=np.uint8).reshape(
+            image_size[1], image_size[0], 4)
+        level = float(image[::8, ::8, :3].mean())
+        history = self._lock_history
+        history.append((level, frame_info.get('exposure'),
+                        frame_info.get('gain')))
+        del history[:-5]
+        elapsed = perf_counter() - lock_requested
+        levels = [h[0] for h in history]
+        converged = len(history) == 5 and\
+            max(levels) - min(levels) <= 0.02 * max(sum(levels) / 5, 1) and\
+            len(set(h[1:] for h in history)) == 1
+        if self._lock_requested != lock_requested:
+            # unlocked or locked again meanwhile
+            return
+        if converged or elapsed > self._lock_timeout:
+            if not converged:
+                Logger.warning('Preview: exposure did not converge in ' +
+                               str(self._lock_timeout) + 's')
+            self._lock_requested = None
+            reference = None
+            if self._lock_patch:
+                reference = self._patch_color(image)
+            self._apply_exposure_lock(elapsed, reference)
+
+    @mainthread
+    def _apply_exposure_lock(self, convergence_time, reference_color):
+        if not self.camera_connected:
+            return
+        hardware = self.preview.lock_exposure(True)
+        if not hardware and reference_color is not None:
+            self._reference_color = reference_color
+        self.exposure_locked = hardware or reference_color is not None
+        self.convergence_time = convergence_time
+        Logger.info('Preview: exposure locked ' +
+                    ('by the camera' if hardware else 'in software') +
+                    ', convergence ' + str(round(convergence_time, 3)) + 's')
+        if self._lock_callback:
+            self._lock_callback(convergence_time, hardware)
+
+    def _patch_color(self, image):
+        height, width = image.shape[:2]
+        x, y, w, h = self._lock_patch
+        patch = image[int(y * height): max(int((y + h) * height), 1),
+                      int(x * width): max(int((x + w) * width), 1), :3]
+        return patch.reshape(-1, 3).mean(axis=0)
+
+    def _normalize_pixels(self, pixels, image_size, reference_color):
+        # scale each channel so the reference patch keeps its locked color
+        import numpy as np
+        image = np.frombuffer(pixels, dtype=np.uint8).reshape(
+            image_size[1], image_size[0], 4)
+        gains = reference_color / np.maximum(self._patch_color(image),
+                                                   1)
+        normalized = image.astype(np.float32)
+        normalized[..., :3] *= gains
+        return np.clip(normalized, 0, 255).astype(np.uint8).tobytes()
+
     def possible_canvas_callback(self, texture, tex_size, tex_pos):
         if self.camera_connected:
             self.canvas_instructions_callback(texture, tex_size, tex_pos)
 
+    def refresh_canvas_instructions(self):
+        # canvas_instructions_callback() is called again on the next frame
+        if self.preview:
+            self.preview.refresh_overlay()
+
     ##########################################
     # Data Analysis Callbacks 
     ##########################################
@@ -216,6 +476,15 @@ class Preview(AnchorLayout):
     # image_scale   : Ratio between the analyzed Texture resolution and
     #    screen image resolution.
     # mirror        : True if Preview is mirrored
+    # yuv_frame     : Optional, only passed if the callback has this
+    #    parameter. YUVFrame (camera4kivy.based_on_kivy_core.camera.yuv) when
+    #    the camera provides YUV planes, pixels is then None and the
+    #    analyzer converts only its region of interest. Else None.
+    # frame_info    : Optional, only passed if the callback has this
+    #    parameter. Dict of the analyzed frame, 'timestamp' (monotonic capture
+    #    time), 'sequence' and when available 'exposure' and 'gain'.
+    #    Frames captured once and displayed again are not analyzed again,
+    #    unless skip_repeated_frames is False.
     
     def analyze_pixels_callback(self, pixels, image_size, image_pos,
                                 image_scale, mirror):
@@ -223,6 +492,10 @@ class Preview(AnchorLayout):
 
     # canvas_instructions_callback()
     #
+    # The instructions are kept in a persistent group, the callback is only
+    # called when the view geometry changes or after
+    # refresh_canvas_instructions().
+    #
     # texture  : the default texture to be displayed in the Priview
     # tex_size : texture size with mirror information
     # tex_pos  : texture pos with mirror information
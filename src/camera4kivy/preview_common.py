@@ -105,6 +105,23 @@ class PreviewCommon(Widget):
                 orientation = 'landscape'
         return orientation
 
+    def frame_info(self):
+        # Capture timestamp, sequence number, exposure... of the displayed
+        # frame, empty if the camera does not provide them.
+        return {}
+
+    def lock_exposure(self, lock):
+        # True if the camera locked (or unlocked) exposure and white balance
+        return False
+
+    def yuv_frame(self):
+        # YUVFrame of the displayed frame, None if the camera is not YUV
+        return None
+
+    def refresh_overlay(self):
+        # Overlays that are redrawn every frame have nothing to refresh
+        pass
+
     def screenshot_crop(self):
         pos_x = 0
         pos_y = 0
@@ -4,7 +4,7 @@ from threading import Thread
 from kivy.clock import mainthread
 from kivy.utils import platform
 from kivy.core import core_select_lib
-from kivy.graphics import Rectangle, Color
+from kivy.graphics import Rectangle, Color, Canvas
 from kivy.graphics.texture import Texture
 from kivy.core.text import Label as CoreLabel
 from kivy.metrics import sp
@@ -43,6 +43,7 @@ class PreviewKivyCamera(PreviewCommon, CommonGestures):
         if platform == 'ios':
             self._enable_on_resume()
         self.provider = KivyCameraProviderInfo().get_name()
+        self._build_canvas()
             
     def __del__(self):
         self.disconnect_camera()
@@ -63,17 +64,29 @@ class PreviewKivyCamera(PreviewCommon, CommonGestures):
                 orientation = self._camera.get_device_orientation()
                 if orientation in [1,2,3,4]:
                     self._camera.set_video_orientation(orientation)
-        self.canvas.clear()
+        self._build_canvas()
         if self.error_message:
             self.canvas_text(self.error_message)
         elif self._camera and self._camera._texture:
             self.on_tex(None)
-        else:
-            with self.canvas:
-                Color(1,1,1,1)
-                Rectangle(size = self.view_size, pos = self.view_pos)
         self.window_width = Window.width
 
+    def _build_canvas(self):
+        # The preview instructions are built once, per frame only the
+        # texture, size and pos of the view are updated.
+        # The overlay (canvas_callback) has its own persistent group, it is
+        # only rebuilt when the view geometry changes or on refresh_overlay()
+        self.canvas.clear()
+        with self.canvas:
+            self._view_color = Color(1,1,1,1)
+            self._view_rect = Rectangle(size = self.view_size,
+                                        pos = self.view_pos)
+            self._overlay = Canvas()
+            self._message = Canvas()
+        self._tex_region = None
+        self._tex_region_key = None
+        self._overlay_key = None
+
     #############################################
     # User Events
     #############################################
@@ -276,7 +289,7 @@ class PreviewKivyCamera(PreviewCommon, CommonGestures):
                 if platform in ['macosx', 'ios']:
                     # default 16:9
                     self._sensor_resolution = [3840, 2160]
-                elif self.provider in ['picamera','opencv']:
+                elif self.provider in ['picamera','opencv','synthetic']:
                     self._sensor_resolution = [1280 , 960]
                 elif self.provider in ['picamera2']:
                     self._sensor_resolution = [800 , 600]
@@ -284,7 +297,8 @@ class PreviewKivyCamera(PreviewCommon, CommonGestures):
                     #default 4:3 , value ignored by gi
                     self._sensor_resolution = [6400, 4800]
 
-            if self.provider in ['picamera2', 'opencv']:
+            if self.provider in ['picamera2', 'opencv', 'synthetic',
+                                 'replay']:
                 context = self
             else:
                 context = None
@@ -340,8 +354,13 @@ class PreviewKivyCamera(PreviewCommon, CommonGestures):
             self._camera.stop()
             self._camera.unbind(on_texture=self.on_tex)
             self.clear_texture()
+            self._overlay.clear()
+            self._overlay_key = None
             if self._camera.__class__.__name__ == 'CameraGi':
                 self._camera.unload()
+            camera_release = getattr(self._camera, 'release', None)
+            if camera_release:
+                camera_release()
             del self._camera
             self._camera = None
             
@@ -350,18 +369,17 @@ class PreviewKivyCamera(PreviewCommon, CommonGestures):
     #############################################
 
     def clear_texture(self):
-        if self._camera and self._camera.texture:
-            tex_size = self._camera.texture.size
-            buf = bytes([255] * tex_size[0] * tex_size[1] * 3)
-            fmt = self._camera._format   ## all the providers are 3 byte
-            self._camera.texture.blit_buffer(buf, colorfmt= fmt,
-                                             bufferfmt='ubyte')
-            self.on_tex(None)
+        # The view is blanked by drawing it without texture (white), the
+        # camera texture is left as is, so no full frame buffer is allocated.
+        self._view_rect.texture = None
+        self._tex_region = None
+        self._tex_region_key = None
+        self.canvas.ask_update()
             
 
     def on_tex(self, camera):
         if self._camera and self._camera.texture:
-            tex = self._camera.texture.get_region(*self.tex_crop)
+            tex = self._texture_region()
 
             if self.data_callback:
                 self.data_callback(tex, self.view_pos,
@@ -373,12 +391,56 @@ class PreviewKivyCamera(PreviewCommon, CommonGestures):
             else:
                 view_size = self.view_size
                 view_pos  = self.view_pos
-            self.canvas.clear()
-            with self.canvas:
-                Color(1,1,1,1)
-                Rectangle(texture= tex, size = view_size, pos = view_pos)
-                if self.canvas_callback:
+            if self._message.children:
+                self._message.clear()
+            if self._view_rect.texture is not tex:
+                self._view_rect.texture = tex
+            self._view_rect.size = view_size
+            self._view_rect.pos = view_pos
+            overlay_key = (tuple(view_size), tuple(view_pos), tex.size)
+            if self.canvas_callback and overlay_key != self._overlay_key:
+                self._overlay_key = overlay_key
+                self._overlay.clear()
+                with self._overlay:
                     self.canvas_callback(tex, view_size, view_pos)
+            self.canvas.ask_update()
+
+    def frame_info(self):
+        if self._camera:
+            return getattr(self._camera, 'frame_info', {})
+        return {}
+
+    def lock_exposure(self, lock):
+        camera_lock = getattr(self._camera, 'lock_exposure', None)
+        if camera_lock:
+            return camera_lock(lock)
+        return False
+
+    def yuv_frame(self):
+        camera_yuv_frame = getattr(self._camera, 'yuv_frame', None)
+        if camera_yuv_frame:
+            frame = camera_yuv_frame()
+            if frame and self._camera.texture:
+                # the analyzed image is the cropped texture
+                width_tex, height_tex = self._camera.texture.size
+                x, y, w, h = self.tex_crop
+                frame.crop = (x / width_tex, y / height_tex,
+                              w / width_tex, h / height_tex)
+            return frame
+        return None
+
+    def refresh_overlay(self):
+        # Rebuild the overlay instructions on the next frame
+        self._overlay_key = None
+
+    def _texture_region(self):
+        # The region follows the blits to the camera texture, so it is only
+        # recreated when the texture or the crop changes.
+        key = (id(self._camera.texture), tuple(self.tex_crop))
+        if self._tex_region is None or key != self._tex_region_key:
+            self._tex_region_key = key
+            self._tex_region = self._camera.texture.get_region(*self.tex_crop)
+        return self._tex_region
 
     def configure_texture_crop(self, dontcare):
         if not self._camera or not self._camera.texture:
@@ -443,7 +505,8 @@ class PreviewKivyCamera(PreviewCommon, CommonGestures):
             pos = [self.view_pos[0] +\
                    (self.view_size[0] - label.texture.size[0]) / 2,
                    self.view_pos[1] + self.view_size[1] / 2]            
-            with self.canvas:
+            self._message.clear()
+            with self._message:
                 Color(0.6,0.6,0.6,1)
                 Rectangle(size = self.view_size, pos = self.view_pos)
                 Color(1,0,0,1)
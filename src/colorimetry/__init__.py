@@ -6,15 +6,31 @@ Support classes for colorimetry and absorbance analysis
 Olivier Boesch (c) 2023
 """
 from math import log10
+import numpy as np
 from numpy.polynomial import polynomial as poly
 import logging
-from os.path import join, expanduser
-from os import remove
+from bisect import bisect_right
+from copy import deepcopy
+from io import BytesIO
+from tempfile import SpooledTemporaryFile
+from threading import Thread, Event
+from typing import Any, BinaryIO, Callable
 from kivy.base import platform
 
 log = logging.getLogger("Colorimetry")
 log.setLevel(logging.INFO)
 
+# reports larger than this are spooled to a temporary file while they are built
+REPORT_SPOOL_SIZE: int = 4 * 1024 * 1024
+# version of the report layout, change it when write_report changes so cached reports are not reused
+REPORT_TEMPLATE_VERSION: int = 1
+
+
+class ExportCancelled(Exception):
+    """
+    Raised by Session.export_report when the export is cancelled
+    """
+
 
 class Sample:
     def __init__(self, red_value: int = 0, green_value: int = 0, blue_value: int = 0,
@@ -88,10 +104,55 @@ class Session:
         manages samples and updates reference
         evaluates regressions expressions for concentration and absorbance
         Export reports for analysis in pdf format
+        ---
+        every change through the methods of the session increments version and is sent to the bound callbacks
+        derived data (data points, regression line, bounds) is computed once per version
+        (samples must not be modified directly)
         """
         self.samples: list[Sample] = []
         self._reference: Sample | None = None
         self.max_concentration = 0.0
+        self.version: int = 0
+        self._derived: dict[str, tuple[int, Any]] = {}  # name -> (version, value)
+        self._callbacks: list[Callable[["Session", str, int | None, Sample | None], None]] = []
+
+    def __getstate__(self) -> dict:
+        # callbacks (screens...) are not part of the data: not copied by snapshot() or sent to other processes
+        state = self.__dict__.copy()
+        state["_callbacks"] = []
+        return state
+
+    def bind(self, callback: Callable[["Session", str, int | None, Sample | None], None]) -> None:
+        """
+        calls callback(session, event, index, sample) after each change
+        event is 'add' or 'remove' (index and sample of the sample), 'clear' or 'reference' (index and sample are None)
+        """
+        self._callbacks.append(callback)
+
+    def unbind(self, callback: Callable[["Session", str, int | None, Sample | None], None]) -> None:
+        if callback in self._callbacks:
+            self._callbacks.remove(callback)
+
+    def _changed(self, event: str, index: int | None = None, sample: Sample | None = None) -> None:
+        self.version += 1
+        for callback in self._callbacks[:]:
+            callback(self, event, index, sample)
+
+    def _memoized(self, name: str, compute: Callable[[], Any]) -> Any:
+        """
+        value of a derived quantity, computed only if the session changed since the last computation
+        """
+        version, value = self._derived.get(name, (-1, None))
+        if version != self.version:
+            value = compute()
+            self._derived[name] = (self.version, value)
+        return value
+
+    def is_dirty(self, name: str) -> bool:
+        """
+        the derived quantity must be computed again (the session changed since the last computation)
+        """
+        return self._derived.get(name, (-1, None))[0] != self.version
 
     def __str__(self):
         coefs, r2 = self.absorbance_data_line
@@ -123,33 +184,39 @@ class Session:
         self._reference = new_val
         for i in range(len(self.samples)):
             self.samples[i].reference = new_val
+        self._changed('reference')
 
     def add_sample(self, sample: Sample) -> None:
         """
         stores a new sample and sets the reference sample with the one of the session
+        samples are kept sorted by concentration
         """
         sample.reference = self._reference
         if sample.concentration > self.max_concentration:
             self.max_concentration = sample.concentration
-        self.samples.append(sample)
-        self.samples.sort(key=lambda s: s.concentration)
+        index = bisect_right(self.samples, sample.concentration, key=lambda s: s.concentration)
+        self.samples.insert(index, sample)
+        self._changed('add', index, sample)
 
     def clear_samples(self) -> None:
         """
         deletes all the samples
         """
         self.samples.clear()
+        self._changed('clear')
 
     def remove_sample(self, index_or_sample: Sample | int) -> None:
         """
         remove a sample by its index or reference
         """
         if isinstance(index_or_sample, int):
-            del self.samples[index_or_sample]
+            index = range(len(self.samples))[index_or_sample]  # negative indexes, IndexError
         elif isinstance(index_or_sample, Sample):
-            self.samples.remove(index_or_sample)
+            index = self.samples.index(index_or_sample)
         else:
             raise TypeError("parameter must be an int or Sample object")
+        sample = self.samples.pop(index)
+        self._changed('remove', index, sample)
 
     @property
     def maximum_concentration(self) -> float:
@@ -159,8 +226,32 @@ class Session:
     def absorbance_data_points(self) -> list[tuple[float, float, "Sample"]]:
         """
         computes list of data points (concentration, absorbance) for plotting purpose
+        memoized: the same list is returned until the session changes, it must not be modified
+        """
+        return self._memoized("points", lambda: [(s.concentration, s.absorbance, s) for s in self.samples])
+
+    @property
+    def absorbance_columns(self) -> tuple[np.ndarray, np.ndarray]:
         """
-        return [(s.concentration, s.absorbance, s) for s in self.samples]
+        concentrations and absorbances of the samples as arrays (absorbance is nan without reference)
+        memoized: the same arrays are returned until the session changes, they must not be modified
+        """
+        def compute() -> tuple[np.ndarray, np.ndarray]:
+            absorbances = (s.absorbance for s in self.samples)
+            return (np.fromiter((s.concentration for s in self.samples), float, len(self.samples)),
+                    np.fromiter((np.nan if a is None else a for a in absorbances), float, len(self.samples)))
+        return self._memoized("columns", compute)
+
+    @property
+    def absorbance_bounds(self) -> tuple[float, float]:
+        """
+        maximum concentration and maximum absorbance of the samples (0 if there are none)
+        """
+        def compute() -> tuple[float, float]:
+            absorbances = [a for _, a, _ in self.absorbance_data_points if a is not None]
+            return (max((s.concentration for s in self.samples), default=0.0),
+                    max(absorbances, default=0.0))
+        return self._memoized("bounds", compute)
 
     @property
     def absorbance_data_line(self) -> tuple[float, float, float]:
@@ -170,7 +261,11 @@ class Session:
         r2 is the residual R²
         return object : (a, r2)
         r2 is None if it can't be computed
+        memoized: fitted once per version of the session
         """
+        return self._memoized("line", self._fit_absorbance_line)
+
+    def _fit_absorbance_line(self) -> tuple[float, float, float]:
         coefs, stats = poly.polyfit(x=[s.concentration for s in self.samples],
                                     y=[s.absorbance for s in self.samples],
                                     deg=[1,0], full=True)
@@ -185,6 +280,13 @@ class Session:
         log.info(f"data line regression: A={coefs[1]} * C + {coefs[0]}")
         return coefs[0], coefs[1], r2
 
+    def snapshot(self) -> "Session":
+        """
+        returns an independent copy of the session (samples and reference)
+        used to export a report while the session is still modified
+        """
+        return deepcopy(self)
+
     def compute_concentration_from_sample(self, sample: Sample) -> float:
         """
         computes the predicted concentration from given absorbance and the session data samples
@@ -197,83 +299,199 @@ class Session:
         log.debug(f"computed concentration: {concentration}")
         return concentration
 
-    def export_report(self, number: int):
+    def export_report(self, number: int, progress: Callable[[float, str], None] | None = None,
+                      cancel: Event | None = None, vector_chart: bool = True,
+                      sink: "ReportSink | None" = None, use_cache: bool = True) -> str:
         """
         Exports data analysis as a pdf report
+        the pdf is built in memory (spooled to a temporary file if large) then streamed to the sink
+        with the cache, an unchanged report is not built again (see colorimetry.cache.ReportCache)
         :param number: number of analysis
-        :return: None
+        :param progress: called with (fraction done, step name) after each step
+        :param cancel: when set, the export stops at the next step with ExportCancelled (not once the report is stored)
+        :param vector_chart: draw the chart with reportlab graphics (vector), else as a matplotlib png
+        :param sink: destination of the report, callable (name, stream) -> location (default: platform sink)
+        :param use_cache: use the process wide report cache
+        :return: location of the report given by the sink (path on desktop, content uri on android)
         """
-        from reportlab.lib import pagesizes, styles, units, utils
-        from reportlab.platypus import SimpleDocTemplate, Paragraph, Table, TableStyle, Spacer, Image
-        import matplotlib
-        matplotlib.use('agg')
-        from matplotlib import pyplot as plt
-        # storage dir
-        if platform == 'android':
-            from androidstorage4kivy import SharedStorage
-            from androidstorage4kivy.sharedstorage import Environment
-            ss = SharedStorage()
+        def step(fraction: float, name: str) -> None:
+            if cancel is not None and cancel.is_set():
+                raise ExportCancelled(name)
+            log.debug(f"Pdf report: {name} ({fraction * 100:.0f}%)")
+            if progress is not None:
+                progress(fraction, name)
 
-            storage_dir = "."
+        from .sinks import default_sink
+        from .cache import report_cache
+        if sink is None:
+            sink = default_sink()
+        cache = report_cache if use_cache else None
+        key = self.report_key(number, vector_chart) if use_cache else None
+        data = None
+        if cache is not None:
+            location = cache.stored_location(key, sink)
+            if location is not None:
+                log.info(f"Pdf report: unchanged, already saved to {location}")
+                if progress is not None:
+                    progress(1.0, "stored")
+                return location
+            data = cache.report(key)
+        if data is not None:
+            log.info("Pdf report: unchanged, using the cached document")
+            buffer = BytesIO(data)
+        else:
+            buffer = SpooledTemporaryFile(max_size=REPORT_SPOOL_SIZE)
+        with buffer:
+            if data is None:
+                self.write_report(number, buffer, step=step, vector_chart=vector_chart, cache=cache)
+                if cache is not None and buffer.tell() <= REPORT_SPOOL_SIZE:
+                    buffer.seek(0)
+                    cache.store_report(key, buffer.read())
+            buffer.seek(0)
+            location = sink(f"report{number}.pdf", buffer)
+        if cache is not None:
+            cache.stored(key, sink, location)
+        log.info(f"Pdf report: saved to {location}")
+        # stored: too late to cancel
+        if progress is not None:
+            progress(1.0, "stored")
+        return location
 
-            def store_file(filepath):
-                ss.copy_to_shared(filepath, Environment.DIRECTORY_DOCUMENTS)
-                remove(filepath)  # cleanup
+    def report_key(self, number: int, vector_chart: bool = True) -> str:
+        """
+        hash of the content of the report: session data, regression model and report template
+        """
+        from .cache import content_key
+        reference = self.reference.values if self.reference is not None else None
+        return content_key("report", REPORT_TEMPLATE_VERSION, number, vector_chart, reference,
+                           [(s.values, s.concentration) for s in self.samples],
+                           self.absorbance_data_line, self.max_concentration)
 
-        else:
-            def store_file(filepath):
+    def report_content(self, number: int, vector_chart: bool = True, cache: "ReportCache | None" = None,
+                       step: Callable[[float, str], None] | None = None) -> dict:
+        """
+        Content of the pdf report: table, equation and rendered chart
+        plain data (can be sent to another process), laid out by report.report_flowables
+        :param number: number of analysis
+        :param vector_chart: draw the chart with reportlab graphics (vector), else as a matplotlib png
+        :param cache: reuse the rendered chart from this cache if the chart data didn't change
+        :param step: called with (fraction done, step name) after each step, may raise to stop
+        """
+        if step is None:
+            def step(fraction: float, name: str) -> None:
                 pass
 
-            storage_dir = join(expanduser("~"), "Documents")
-
-        # document
-        path = join(storage_dir, f"report{number}.pdf")
-        log.info(f"Pdf report: saving file to {path}")
-        doc = SimpleDocTemplate(path, pagesize=pagesizes.A4)
-        elements = []
-        # title
-        p = Paragraph(f"Analyse par colormétrie (session n°{number})", style=styles.ParagraphStyle(name="title", font="Arial", fontSize=25, align="center"))
-        elements.append(p)
-        # space
-        elements.append(Spacer(height=1 * units.cm, width=pagesizes.A4[0]))
+        from .report import render_chart
+        from .cache import content_key
+        step(0.1, "imports")
         # table of data
-        data = [["C (mol/L)", "R", "G", "B", "I (U.A.)", "T (%)", "A (U.A.)"]]
-        plot_data_x = []  # for future graph
-        plot_data_y = []  # for future graph
+        rows = [["C (mol/L)", "R", "G", "B", "I (U.A.)", "T (%)", "A (U.A.)"]]
+        points = []
         for s in self.samples:
-            data.append([f"{s.concentration:.3e}", f"{s.red_value:d}", f"{s.green_value:d}", f"{s.blue_value:d}", f"{s.intensity:.3f}", f"{s.transmittance*100:.2f}", f"{s.absorbance:.3f}"])
-            plot_data_x.append(s.concentration)
-            plot_data_y.append(s.absorbance)
-        t = Table(data=data, style=TableStyle(name="samples", font="Arial", fontSize=10, align="center"))
-        elements.append(t)
-        # space
-        elements.append(Spacer(height=1 * units.cm, width=pagesizes.A4[0]))
+            rows.append([f"{s.concentration:.3e}", f"{s.red_value:d}", f"{s.green_value:d}", f"{s.blue_value:d}", f"{s.intensity:.3f}", f"{s.transmittance*100:.2f}", f"{s.absorbance:.3f}"])
+            points.append((s.concentration, s.absorbance))
         # equation
         b, a, r2 = self.absorbance_data_line
-        text = f"Equation : A = {a:.3e} C + {b:.3e}"
+        equation = f"Equation : A = {a:.3e} C + {b:.3e}"
         if r2 is not None:
-            text += f", R² = {r2:.5f}"
-        p = Paragraph(text=text, style=styles.ParagraphStyle(name="body", font="Arial", fontSize=12, align="center", bold=True))
-        elements.append(p)
-        # space
-        elements.append(Spacer(height=1 * units.cm, width=pagesizes.A4[0]))
-        # graph
-        plt.figure(0, dpi=600)
-        plt.scatter(plot_data_x, plot_data_y, s=20, color='black')
-        plt.plot([0, self.max_concentration], [b, self.max_concentration * a + b], color='#212121', linestyle='--')
-        plt.xlabel("Concentration (mol/L)")
-        plt.ylabel("Absorbance")
-        plt.grid(True)
-        plt.savefig("temp.png", dpi=600)
-        img = utils.ImageReader("temp.png")
-        iw, ih = img.getSize()
-        aspect = ih / iw
-        elements.append(Image("temp.png", width=15*units.cm, height=15*aspect*units.cm))
-        # build and save document
-        doc.build(elements)
-        log.info("Pdf report: file saved")
-        # store file (used for android)
-        store_file(path)
-        # cleanup
-        remove('temp.png')
+            equation += f", R² = {r2:.5f}"
+        step(0.2, "table")
+        line_points = [(0, b), (self.max_concentration, self.max_concentration * a + b)]
+        if cache is not None:
+            chart = cache.chart(content_key("chart", REPORT_TEMPLATE_VERSION, vector_chart, points, line_points),
+                                lambda: render_chart(points, line_points, vector_chart))
+        else:
+            chart = render_chart(points, line_points, vector_chart)
+        step(0.6, "graph")
+        return {"number": number, "rows": rows, "equation": equation, "chart": chart}
+
+    def write_report(self, number: int, output: BinaryIO, step: Callable[[float, str], None] | None = None,
+                     vector_chart: bool = True, cache: "ReportCache | None" = None) -> None:
+        """
+        Writes the pdf report to a binary stream
+        :param number: number of analysis
+        :param output: writable binary stream
+        :param step: called with (fraction done, step name) after each step, may raise to stop
+        :param vector_chart: draw the chart with reportlab graphics (vector), else as a matplotlib png
+        :param cache: reuse the rendered chart from this cache if the chart data didn't change
+        """
+        from .report import write_document
+        content = self.report_content(number, vector_chart=vector_chart, cache=cache, step=step)
+        write_document([content], output)
+        if step is not None:
+            step(0.9, "document")
+
+
+class ReportExport:
+    def __init__(self, session: Session, number: int,
+                 on_progress: Callable[[float, str], None] | None = None,
+                 on_done: Callable[["ReportExport"], None] | None = None,
+                 sink: "ReportSink | None" = None) -> None:
+        """
+        Export of a session report in a worker thread
+        ---
+        the report is made from a snapshot of the session taken now, the session can be modified during the export
+        session : session to export
+        number : number of analysis
+        on_progress : called from the worker thread with (fraction done, step name)
+        on_done : called from the worker thread with this object when the export ends (path, error or cancelled)
+        sink : destination of the report (default: platform sink, see Session.export_report)
+        """
+        self.snapshot: Session = session.snapshot()
+        self.number: int = number
+        self.on_progress = on_progress
+        self.on_done = on_done
+        self.sink = sink
+        self.progress: float = 0.0
+        self.path: str | None = None
+        self.error: Exception | None = None
+        self._cancel = Event()
+        self._thread = Thread(target=self._run, daemon=True)
+
+    @property
+    def running(self) -> bool:
+        return self._thread.is_alive()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel.is_set()
+
+    def start(self) -> "ReportExport":
+        self._thread.start()
+        return self
+
+    def cancel(self) -> None:
+        """
+        asks the export to stop at its next step
+        """
+        self._cancel.set()
+
+    def wait(self, timeout: float | None = None) -> str | None:
+        """
+        waits for the end of the export and returns the path of the report (None if cancelled or failed)
+        """
+        self._thread.join(timeout)
+        return self.path
+
+    def _set_progress(self, fraction: float, name: str) -> None:
+        self.progress = fraction
+        if self.on_progress is not None:
+            self.on_progress(fraction, name)
+
+    def _run(self) -> None:
+        try:
+            self.path = self.snapshot.export_report(self.number, progress=self._set_progress, cancel=self._cancel,
+                                                    sink=self.sink)
+        except ExportCancelled:
+            log.info(f"Pdf report: export of session {self.number} cancelled")
+        except Exception as e:
+            log.exception("Pdf report: export failed")
+            self.error = e
+        finally:
+            if platform == 'android':
+                # the worker thread was attached to the jvm by the shared storage
+                from jnius import detach
+                detach()
+        if self.on_done is not None:
+            self.on_done(self)
 
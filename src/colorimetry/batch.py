@@ -0,0 +1,102 @@
+"""
+Batch
+
+Export of the reports of many sessions at once: one pdf with a table of contents, or one pdf per session
+The sessions are rendered in parallel in a process pool, the combined document is assembled in this process
+
+Olivier Boesch (c) 2023
+"""
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, Future, as_completed
+from io import BytesIO
+from os import cpu_count
+from tempfile import SpooledTemporaryFile
+from threading import Event
+from typing import Callable
+from kivy.base import platform
+from . import Session, ExportCancelled, REPORT_SPOOL_SIZE, log
+
+
+def render_session(number: int, session: Session, vector_chart: bool, combined: bool) -> dict | bytes:
+    """
+    Renders one session (runs in a worker process)
+    returns the content of the report (combined document) or the pdf bytes of the session
+    """
+    if combined:
+        return session.report_content(number, vector_chart=vector_chart)
+    buffer = BytesIO()
+    session.write_report(number, buffer, vector_chart=vector_chart)
+    return buffer.getvalue()
+
+
+def batch_workers(workers: int | None, sessions: int) -> int:
+    """
+    number of worker processes used for a batch (0: render in this process)
+    """
+    if platform in ('android', 'ios'):
+        # no process pool on mobile (no sem_open on android)
+        return 0
+    if workers is None:
+        workers = cpu_count() or 1
+    workers = min(workers, sessions)
+    return workers if workers > 1 else 0
+
+
+def export_batch(sessions: list[tuple[int, Session]], combined: bool = True, workers: int | None = None,
+                 vector_chart: bool = True, sink: "ReportSink | None" = None, name: str = "reports.pdf",
+                 progress: Callable[[float, str], None] | None = None, cancel: Event | None = None) -> list[str]:
+    """
+    Exports the reports of several sessions
+    :param sessions: list of (number of analysis, session), the sessions are not modified (snapshots are sent)
+    :param combined: one document with a table of contents (name), else one report per session (report<number>.pdf)
+    :param workers: number of processes rendering the sessions (default: number of cpus, 0 or 1: in this process)
+    :param vector_chart: draw the charts with reportlab graphics (vector), else as matplotlib pngs
+    :param sink: destination of the documents (default: platform sink, see Session.export_report)
+    :param name: file name of the combined document
+    :param progress: called with (fraction done, step name) after each session
+    :param cancel: when set, the export stops with ExportCancelled (nothing is stored)
+    :return: locations of the documents given by the sink
+    """
+    from .sinks import default_sink
+    if sink is None:
+        sink = default_sink()
+    total = len(sessions) + 1
+    results: list[dict | bytes | None] = [None] * len(sessions)
+
+    def step(fraction: float, name: str) -> None:
+        if cancel is not None and cancel.is_set():
+            raise ExportCancelled(name)
+        if progress is not None:
+            progress(fraction, name)
+
+    workers = batch_workers(workers, len(sessions))
+    log.info(f"Pdf batch: rendering {len(sessions)} sessions with {workers or 'no'} worker processes")
+    if workers:
+        # spawn: the app process has threads and a gl context, it must not be forked
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as executor:
+            futures: dict[Future, int] = {executor.submit(render_session, number, session, vector_chart, combined): i
+                                          for i, (number, session) in enumerate(sessions)}
+            try:
+                for done, future in enumerate(as_completed(futures), 1):
+                    results[futures[future]] = future.result()
+                    step(done / total, f"session {sessions[futures[future]][0]}")
+            except BaseException:
+                executor.shutdown(wait=False, cancel_futures=True)
+                raise
+    else:
+        for i, (number, session) in enumerate(sessions):
+            results[i] = render_session(number, session, vector_chart, combined)
+            step((i + 1) / total, f"session {number}")
+    # store
+    if combined:
+        from .report import write_document
+        with SpooledTemporaryFile(max_size=REPORT_SPOOL_SIZE) as buffer:
+            write_document(results, buffer)
+            buffer.seek(0)
+            locations = [sink(name, buffer)]
+    else:
+        locations = [sink(f"report{number}.pdf", BytesIO(data)) for (number, _), data in zip(sessions, results)]
+    log.info(f"Pdf batch: saved to {', '.join(locations)}")
+    if progress is not None:
+        progress(1.0, "stored")
+    return locations
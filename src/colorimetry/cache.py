@@ -0,0 +1,133 @@
+"""
+Cache
+
+Process wide cache of the exported reports, keyed by a hash of their content
+
+Olivier Boesch (c) 2023
+"""
+from collections import OrderedDict
+from hashlib import sha256
+from threading import Lock
+from typing import Any, Callable
+
+
+def content_key(*parts: Any) -> str:
+    """
+    hash of the content of a report (or part of report)
+    parts are plain values (numbers, strings, tuples, lists) with a stable repr
+    """
+    return sha256(repr(parts).encode("utf-8")).hexdigest()
+
+
+class ReportCache:
+    def __init__(self, max_reports: int = 8, max_charts: int = 16) -> None:
+        """
+        Cache of reports (pdf bytes and where they were stored) and of rendered charts
+        ---
+        an unchanged session is not built again: the stored file is returned if the sink can tell it is still there
+        (sink.stat), a sink without stat is trusted with the content key (the hash of the report it stored)
+        when only the table of a report changes, the chart is reused
+        max_reports : number of pdf kept in memory (least recently used are dropped)
+        max_charts : number of rendered charts kept in memory
+        """
+        self.max_reports: int = max_reports
+        self.max_charts: int = max_charts
+        self._reports: OrderedDict[str, bytes] = OrderedDict()
+        self._charts: OrderedDict[str, Any] = OrderedDict()
+        # content key -> {sink: (location, stat of the stored file, None if the sink has no stat)}
+        self._locations: dict[str, dict[Any, tuple[str, Any]]] = {}
+        self._lock = Lock()
+        self.hits: int = 0
+        self.file_hits: int = 0
+        self.misses: int = 0
+        self.chart_hits: int = 0
+        self.chart_misses: int = 0
+
+    def stored_location(self, key: str, sink: Callable) -> str | None:
+        """
+        location of the report if it was stored by this sink and is unchanged since, else None
+        without sink.stat, the location is returned while the report with this content key is cached
+        """
+        stat = getattr(sink, "stat", None)
+        with self._lock:
+            location, stored_stat = self._locations.get(key, {}).get(sink, (None, None))
+        if location is None or (stat is not None and stat(location) != stored_stat):
+            return None
+        with self._lock:
+            self.hits += 1
+            self.file_hits += 1
+        return location
+
+    def report(self, key: str) -> bytes | None:
+        """
+        pdf bytes of a report, None if not cached (counted as a miss)
+        """
+        with self._lock:
+            data = self._reports.get(key)
+            if data is None:
+                self.misses += 1
+                return None
+            self._reports.move_to_end(key)
+            self.hits += 1
+            return data
+
+    def store_report(self, key: str, data: bytes) -> None:
+        with self._lock:
+            self._reports[key] = data
+            self._reports.move_to_end(key)
+            while len(self._reports) > self.max_reports:
+                old_key, _ = self._reports.popitem(last=False)
+                self._locations.pop(old_key, None)
+
+    def stored(self, key: str, sink: Callable, location: str) -> None:
+        """
+        records where a sink stored a report
+        another report stored at the same location replaces it
+        """
+        stat = getattr(sink, "stat", None)
+        stored_stat = stat(location) if stat is not None else None
+        with self._lock:
+            for locations in self._locations.values():
+                if locations.get(sink, (None,))[0] == location:
+                    del locations[sink]
+            if key in self._reports:
+                self._locations.setdefault(key, {})[sink] = (location, stored_stat)
+
+    def chart(self, key: str, render: Callable[[], Any]) -> Any:
+        """
+        rendered chart for this key, render() is called if it is not cached
+        """
+        with self._lock:
+            chart = self._charts.get(key)
+            if chart is not None:
+                self._charts.move_to_end(key)
+                self.chart_hits += 1
+                return chart
+            self.chart_misses += 1
+        chart = render()
+        with self._lock:
+            self._charts[key] = chart
+            while len(self._charts) > self.max_charts:
+                self._charts.popitem(last=False)
+        return chart
+
+    def stats(self) -> dict[str, int]:
+        """
+        cache statistics (for diagnostics)
+        """
+        with self._lock:
+            return {"hits": self.hits, "file_hits": self.file_hits, "misses": self.misses,
+                    "chart_hits": self.chart_hits, "chart_misses": self.chart_misses,
+                    "reports": len(self._reports), "charts": len(self._charts)}
+
+    def clear(self) -> None:
+        """
+        drops all cached reports and charts (statistics are kept)
+        """
+        with self._lock:
+            self._reports.clear()
+            self._charts.clear()
+            self._locations.clear()
+
+
+report_cache = ReportCache()
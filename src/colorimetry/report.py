@@ -0,0 +1,196 @@
+"""
+Report
+
+Building blocks of the pdf reports (reportlab only, imported when a report is exported)
+
+Olivier Boesch (c) 2023
+"""
+import os
+from io import BytesIO
+from typing import BinaryIO
+from reportlab.lib import colors, pagesizes, styles, units
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Table, TableStyle, Spacer, Image, PageBreak, Flowable
+from reportlab.platypus.tableofcontents import TableOfContents
+from reportlab.graphics.shapes import Drawing
+from reportlab.graphics.charts.lineplots import LinePlot
+from reportlab.graphics.charts.textlabels import Label
+from reportlab.graphics.widgets.markers import makeMarker
+
+# threads compressing the pages and images while the next pages are laid out (none on a single core)
+COMPRESSION_THREADS = min((os.cpu_count() or 1) - 1, 4)
+
+# resolution of the raster charts in the pdf (they are rendered at 600 dpi, downsampled when they are drawn)
+CHART_DPI = 300
+
+
+def calibration_chart(points: list[tuple[float, float]], line: list[tuple[float, float]],
+                      width: float, height: float) -> Drawing:
+    """
+    Calibration chart (absorbance vs concentration) as vector graphics
+    ---
+    points : measured (concentration, absorbance) points, drawn as dots
+    line : two points of the regression line, drawn dashed
+    width, height : size of the chart in points
+    returns a Drawing, which is also a platypus flowable
+    """
+    drawing = Drawing(width, height)
+    plot = LinePlot()
+    plot.x = 55
+    plot.y = 40
+    plot.width = width - plot.x - 15
+    plot.height = height - plot.y - 15
+    plot.data = [points, line]
+    # measures: markers only
+    plot.lines[0].lineStyle = 'line'
+    plot.lines[0].strokeColor = colors.black
+    plot.lines[0].symbol = makeMarker('FilledCircle', size=4)
+    # regression line: dashed, no markers
+    plot.lines[1].lineStyle = 'joinedLine'
+    plot.lines[1].strokeColor = colors.HexColor('#212121')
+    plot.lines[1].strokeWidth = 1
+    plot.lines[1].strokeDashArray = (4, 3)
+    for axis in (plot.xValueAxis, plot.yValueAxis):
+        axis.visibleGrid = True
+        axis.gridStrokeColor = colors.lightgrey
+        axis.gridStrokeWidth = 0.5
+        axis.labels.fontName = 'Helvetica'
+        axis.labels.fontSize = 8
+    plot.xValueAxis.valueMin = 0
+    plot.xValueAxis.labelTextFormat = '%.1e'
+    plot.yValueAxis.labelTextFormat = '%.2f'
+    drawing.add(plot)
+    # axis titles
+    x_title = Label()
+    x_title.setOrigin(plot.x + plot.width / 2, 5)
+    x_title.setText("Concentration (mol/L)")
+    x_title.boxAnchor = 's'
+    y_title = Label()
+    y_title.setOrigin(5, plot.y + plot.height / 2)
+    y_title.setText("Absorbance")
+    y_title.angle = 90
+    y_title.boxAnchor = 'n'
+    for title in (x_title, y_title):
+        title.fontName = 'Helvetica'
+        title.fontSize = 10
+        drawing.add(title)
+    return drawing
+
+
+def frozen_drawing(drawing: Drawing) -> Drawing:
+    """
+    Copy of a drawing made of basic shapes only (lines, strings...)
+    ---
+    charts and labels are laid out once, the copy can be drawn in many documents
+    without computing the axes again
+    """
+    frozen = Drawing(drawing.width, drawing.height)
+    frozen.add(drawing._explode())
+    return frozen
+
+
+def raster_chart(points: list[tuple[float, float]], line: list[tuple[float, float]]) -> tuple[bytes, float]:
+    """
+    Calibration chart drawn by matplotlib
+    ---
+    returns the png bytes and the aspect ratio (height / width) of the image
+    """
+    # figure object, pyplot is not thread safe
+    from matplotlib.figure import Figure
+    fig = Figure(dpi=600)
+    ax = fig.subplots()
+    ax.scatter(*zip(*points), s=20, color='black')
+    ax.plot(*zip(*line), color='#212121', linestyle='--')
+    ax.set_xlabel("Concentration (mol/L)")
+    ax.set_ylabel("Absorbance")
+    ax.grid(True)
+    png = BytesIO()
+    fig.savefig(png, dpi=600)
+    iw, ih = fig.canvas.get_width_height()
+    return png.getvalue(), ih / iw
+
+
+def render_chart(points: list[tuple[float, float]], line: list[tuple[float, float]],
+                 vector_chart: bool = True) -> Drawing | tuple[bytes, float]:
+    """
+    Rendered calibration chart of a report, plain data that can be cached or sent to another process
+    ---
+    vector_chart : frozen reportlab drawing if True, else matplotlib png (see raster_chart)
+    """
+    if vector_chart:
+        # frozen to basic shapes: the axes are not computed again when the drawing is reused
+        return frozen_drawing(calibration_chart(points, line, width=15*units.cm, height=11.25*units.cm))
+    return raster_chart(points, line)
+
+
+def report_flowables(content: dict) -> list[Flowable]:
+    """
+    Layout of the report of a session
+    ---
+    content : content of the report (see Session.report_content)
+    the title paragraph has a toc_entry attribute (text of the entry in a table of contents)
+    """
+    elements = []
+    # title
+    title = f"Analyse par colormétrie (session n°{content['number']})"
+    p = Paragraph(title, style=styles.ParagraphStyle(name="title", font="Arial", fontSize=25, align="center"))
+    p.toc_entry = title
+    elements.append(p)
+    # space
+    elements.append(Spacer(height=1 * units.cm, width=pagesizes.A4[0]))
+    # table of data
+    t = Table(data=content["rows"], style=TableStyle(name="samples", font="Arial", fontSize=10, align="center"))
+    elements.append(t)
+    # space
+    elements.append(Spacer(height=1 * units.cm, width=pagesizes.A4[0]))
+    # equation
+    p = Paragraph(text=content["equation"], style=styles.ParagraphStyle(name="body", font="Arial", fontSize=12, align="center", bold=True))
+    elements.append(p)
+    # space
+    elements.append(Spacer(height=1 * units.cm, width=pagesizes.A4[0]))
+    # graph
+    chart = content["chart"]
+    if isinstance(chart, Drawing):
+        elements.append(chart)
+    else:
+        png, aspect = chart
+        elements.append(Image(BytesIO(png), width=15*units.cm, height=15*aspect*units.cm, dpi=CHART_DPI))
+    return elements
+
+
+class BatchDocTemplate(SimpleDocTemplate):
+    """
+    Document of several sessions: fills the table of contents and the pdf outline with the session titles
+    """
+
+    def afterFlowable(self, flowable: Flowable) -> None:
+        text = getattr(flowable, "toc_entry", None)
+        if text is None:
+            return
+        key = f"section{self.seq.nextf('sections')}"
+        self.canv.bookmarkPage(key)
+        self.canv.addOutlineEntry(text, key, level=0)
+        self.notify("TOCEntry", (0, text, self.page, key))
+
+
+def write_document(contents: list[dict], output: BinaryIO) -> None:
+    """
+    Builds the pdf of one session, or of several sessions with a table of contents (one section per session)
+    ---
+    contents : contents of the reports (see Session.report_content)
+    output : writable binary stream, written page by page (streaming) for one session
+    """
+    if len(contents) == 1:
+        doc = SimpleDocTemplate(output, pagesize=pagesizes.A4, streaming=True, objectStreams=True,
+                                compressionThreads=COMPRESSION_THREADS)
+        doc.build(report_flowables(contents[0]))
+        return
+    doc = BatchDocTemplate(output, pagesize=pagesizes.A4, objectStreams=True, compressionThreads=COMPRESSION_THREADS)
+    elements = [Paragraph("Analyses par colorimétrie", style=styles.ParagraphStyle(name="title", fontSize=25, leading=30)),
+                Spacer(height=1 * units.cm, width=pagesizes.A4[0]),
+                TableOfContents()]
+    for content in contents:
+        elements.append(PageBreak())
+        elements.extend(report_flowables(content))
+    # two passes: the table of contents gets the page numbers of the first one
+    # (not streamed: only the last pass is saved)
+    doc.multiBuild(elements)
@@ -0,0 +1,149 @@
+"""
+Sinks
+
+Destinations of the exported reports. A sink is any callable sink(name, stream) -> location:
+it gets the file name of the report and a binary stream positioned at the start of the pdf,
+copies the stream to its destination and returns where the report is (path, uri...)
+A sink can also have a stat(location) method returning a value that changes when the stored
+file changes (None if it is gone), the report cache then returns unchanged files without writing them
+(without stat, the cache trusts a sink to keep the reports it stored)
+
+Olivier Boesch (c) 2023
+"""
+from os import makedirs, remove, replace, stat
+from os.path import join, expanduser, exists
+from shutil import copyfileobj
+from typing import BinaryIO, Callable
+from kivy.base import platform
+
+ReportSink = Callable[[str, BinaryIO], str]
+
+# size of the chunks copied to the destination
+CHUNK_SIZE: int = 64 * 1024
+
+
+class FileSink:
+    def __init__(self, directory: str | None = None) -> None:
+        """
+        Writes reports to a directory of the local file system
+        ---
+        directory : destination directory (default is ~/Documents), created if needed
+        the file is written next to its destination then renamed, an existing report is never half written
+        """
+        self.directory: str = directory if directory is not None else join(expanduser("~"), "Documents")
+
+    def __call__(self, name: str, stream: BinaryIO) -> str:
+        makedirs(self.directory, exist_ok=True)
+        path = join(self.directory, name)
+        part_path = path + ".part"
+        try:
+            with open(part_path, "wb") as f:
+                copyfileobj(stream, f, CHUNK_SIZE)
+            replace(part_path, path)
+        finally:
+            if exists(part_path):
+                remove(part_path)
+        return path
+
+    def stat(self, location: str) -> tuple[int, int] | None:
+        """
+        (size, modification time) of a stored report, None if it doesn't exist anymore
+        """
+        try:
+            st = stat(location)
+        except OSError:
+            return None
+        return st.st_size, st.st_mtime_ns
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, FileSink) and other.directory == self.directory
+
+    def __hash__(self) -> int:
+        return hash(self.directory)
+
+
+class MediaStoreSink:
+    def __init__(self, mime_type: str = "application/pdf") -> None:
+        """
+        Writes reports to the shared Documents collection of Android (MediaStore, API 29+)
+        ---
+        the stream is copied to the content output stream, without an intermediate file
+        mime_type : mime type of the reports
+        """
+        self.mime_type: str = mime_type
+
+    def __call__(self, name: str, stream: BinaryIO) -> str:
+        from jnius import autoclass
+        PythonActivity = autoclass('org.kivy.android.PythonActivity')
+        ContentValues = autoclass('android.content.ContentValues')
+        Environment = autoclass('android.os.Environment')
+        Integer = autoclass('java.lang.Integer')
+        MediaColumns = autoclass('android.provider.MediaStore$MediaColumns')
+        MediaStoreFiles = autoclass('android.provider.MediaStore$Files')
+        resolver = PythonActivity.mActivity.getContentResolver()
+        values = ContentValues()
+        values.put(MediaColumns.DISPLAY_NAME, name)
+        values.put(MediaColumns.MIME_TYPE, self.mime_type)
+        values.put(MediaColumns.RELATIVE_PATH, Environment.DIRECTORY_DOCUMENTS)
+        # hidden from other apps until written
+        values.put(MediaColumns.IS_PENDING, Integer(1))
+        uri = resolver.insert(MediaStoreFiles.getContentUri("external"), values)
+        try:
+            output = resolver.openOutputStream(uri)
+            try:
+                while chunk := stream.read(CHUNK_SIZE):
+                    output.write(chunk)
+            finally:
+                output.close()
+        except Exception:
+            resolver.delete(uri, None, None)
+            raise
+        values.clear()
+        values.put(MediaColumns.IS_PENDING, Integer(0))
+        resolver.update(uri, values, None, None)
+        return uri.toString()
+
+    def stat(self, location: str) -> tuple[int, int] | None:
+        """
+        (size, modification time) of a stored report, None if it was deleted (or is not readable anymore)
+        """
+        from jnius import autoclass
+        PythonActivity = autoclass('org.kivy.android.PythonActivity')
+        MediaColumns = autoclass('android.provider.MediaStore$MediaColumns')
+        Uri = autoclass('android.net.Uri')
+        resolver = PythonActivity.mActivity.getContentResolver()
+        try:
+            cursor = resolver.query(Uri.parse(location), [MediaColumns.SIZE, MediaColumns.DATE_MODIFIED],
+                                    None, None, None)
+        except Exception:
+            return None
+        if cursor is None:
+            return None
+        try:
+            if not cursor.moveToFirst():
+                return None
+            return cursor.getLong(0), cursor.getLong(1)
+        finally:
+            cursor.close()
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, MediaStoreSink) and other.mime_type == self.mime_type
+
+    def __hash__(self) -> int:
+        return hash(self.mime_type)
+
+
+def default_sink() -> ReportSink:
+    """
+    sink of the platform: shared Documents on android, ~/Documents on desktop
+    """
+    if platform == 'android':
+        from android import api_version
+        if api_version >= 29:
+            return MediaStoreSink()
+        # before scoped storage: public directory (WRITE_EXTERNAL_STORAGE permission)
+        from jnius import autoclass
+        Environment = autoclass('android.os.Environment')
+        directory = Environment.getExternalStoragePublicDirectory(Environment.DIRECTORY_DOCUMENTS)
+        return FileSink(directory.getAbsolutePath())
+    return FileSink()
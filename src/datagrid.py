@@ -0,0 +1,252 @@
+"""
+Data grid
+
+Data model and layout of the samples grid (RecycleView) for large sessions
+rows are read from the columns of the session, formatted only when they are shown and kept until the session changes,
+sorting and filtering change the order of the rows, no list of rows is built
+the layout computes the position of the rows (same height): nothing is done for the rows that are not shown
+"""
+from collections import OrderedDict
+from math import isnan
+from typing import Callable
+import numpy as np
+from kivy.event import EventDispatcher
+from kivy.uix.recycleboxlayout import RecycleBoxLayout
+from kivy.uix.recycleview.datamodel import RecycleDataModelBehavior
+from colorimetry import Session, Sample
+
+# formatted rows kept (about 20 rows are visible at once)
+ROW_CACHE_SIZE = 512
+
+COLUMNS = ('concentration', 'absorbance')
+
+
+class SessionRows:
+    """
+    Rows of the data grid (dicts of DataGridItem properties) for the samples of a session
+    row i is formatted when it is read (rows[i]) then cached until the session or the order changes
+    session: session shown (None: no rows)
+    remove_sample: called with the sample of a row when the row is pressed
+    """
+    def __init__(self, session: Session | None = None, remove_sample: Callable[[Sample], None] | None = None):
+        self.session = session
+        self.remove_sample = remove_sample
+        self.sort_column: str | None = None
+        self.reverse: bool = False
+        self.filter: tuple[str, float, float] | None = None  # (column, minimum, maximum)
+        self.order: np.ndarray | None = None  # indexes of the samples shown (None: all, in the session order)
+        self._version: int = -1  # version of the session for the order and the cached rows
+        self._rows: OrderedDict[int, dict] = OrderedDict()
+
+    @property
+    def ordered(self) -> bool:
+        """
+        the rows are sorted or filtered
+        """
+        return self.sort_column is not None or self.filter is not None
+
+    def _check_version(self) -> None:
+        if self.session is not None and self._version != self.session.version:
+            self._version = self.session.version
+            self._rows.clear()
+            self.order = self._compute_order() if self.ordered else None
+
+    def _compute_order(self) -> np.ndarray:
+        columns = dict(zip(COLUMNS, self.session.absorbance_columns))
+        order = np.arange(len(self.session.samples))
+        if self.filter is not None:
+            column, minimum, maximum = self.filter
+            values = columns[column]
+            order = np.flatnonzero((values >= minimum) & (values <= maximum))
+        if self.sort_column is not None:
+            order = order[np.argsort(columns[self.sort_column][order], kind='stable')]
+            if self.reverse:
+                order = order[::-1]
+        return order
+
+    def set_order(self, sort_column: str | None, reverse: bool, filter: tuple[str, float, float] | None) -> None:
+        """
+        sorts and filters the rows
+        :param sort_column: 'concentration', 'absorbance' or None (order of the session)
+        :param reverse: descending order
+        :param filter: only the rows with minimum <= column <= maximum (column, minimum, maximum) or None
+        """
+        self.sort_column, self.reverse, self.filter = sort_column, reverse, filter
+        self._version = -1
+
+    def __len__(self) -> int:
+        if self.session is None:
+            return 0
+        self._check_version()
+        return len(self.session.samples) if self.order is None else len(self.order)
+
+    def __getitem__(self, index: int) -> dict:
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        row = self._rows.get(index)
+        if row is not None:
+            self._rows.move_to_end(index)
+            return row
+        sample_index = index if self.order is None else int(self.order[index])
+        concentrations, absorbances = self.session.absorbance_columns
+        absorbance = absorbances[sample_index]
+        row = {'concentration_text': f"{concentrations[sample_index]:.2e}",
+               'absorbance_text': f"{absorbance:.3f}" if not isnan(absorbance) else "--",
+               'sample': self.session.samples[sample_index],
+               'remove_sample': self.remove_sample}
+        self._rows[index] = row
+        if len(self._rows) > ROW_CACHE_SIZE:
+            self._rows.popitem(last=False)
+        return row
+
+
+class SessionDataModel(RecycleDataModelBehavior, EventDispatcher):
+    """
+    Data model of a RecycleView showing the samples of a session (see SessionRows)
+    the view is told which rows were inserted or removed, only the new rows are formatted
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.data = SessionRows()
+
+    def show(self, session: Session | None, remove_sample: Callable[[Sample], None] | None = None) -> None:
+        """
+        shows the samples of a session (sort and filter are kept)
+        """
+        rows = self.data
+        self.data = SessionRows(session, remove_sample)
+        self.data.set_order(rows.sort_column, rows.reverse, rows.filter)
+        self.dispatch('on_data_changed')
+
+    def inserted(self, index: int) -> None:
+        """
+        the sample index was added to the session
+        """
+        if self.data.ordered:
+            self.dispatch('on_data_changed')
+        else:
+            self.dispatch('on_data_changed', inserted=index)
+
+    def removed(self, index: int) -> None:
+        """
+        the sample index was removed from the session
+        """
+        if self.data.ordered:
+            self.dispatch('on_data_changed')
+        else:
+            self.dispatch('on_data_changed', removed=index)
+
+    def sort(self, column: str | None, reverse: bool = False) -> None:
+        """
+        sorts the rows by column ('concentration', 'absorbance') or shows them in the order of the session (None)
+        """
+        self.data.set_order(column, reverse, self.data.filter)
+        self.dispatch('on_data_changed')
+
+    def filter(self, column: str | None, minimum: float = -np.inf, maximum: float = np.inf) -> None:
+        """
+        shows only the rows with minimum <= column <= maximum (all the rows if column is None)
+        """
+        self.data.set_order(self.data.sort_column, self.data.reverse,
+                            (column, minimum, maximum) if column is not None else None)
+        self.dispatch('on_data_changed')
+
+
+def _moved_index(index: int, flag: dict) -> int | None:
+    """
+    index of a row after the change flag (inserted, removed: index, modified: slice) of the data model
+    None if the row was removed or modified
+    """
+    for change, value in flag.items():
+        if change == 'inserted':
+            index += index >= value
+        elif change == 'removed':
+            if index == value:
+                return None
+            index -= index > value
+        elif change != 'appended' and (change != 'modified' or index in range(*value.indices(index + 1))):
+            return None
+    return index
+
+
+class RowOptions:
+    """
+    Layout options of the rows of a RecycleRowsLayout (computed when read, the same for all the rows but the position)
+    """
+
+    def __init__(self, layout: "RecycleRowsLayout", count: int):
+        self.layout = layout
+        self.count = count
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __getitem__(self, index: int) -> dict:
+        layout = self.layout
+        height = layout.default_size[1]
+        return {'size': [layout.width, height], 'size_hint': [None, None], 'size_hint_min': [None, None],
+                'size_hint_max': [None, None], 'pos': [layout.x, layout.top - (index + 1) * height], 'pos_hint': {},
+                'viewclass': layout.viewclass, 'width_none': False, 'height_none': False}
+
+
+class RecycleRowsLayout(RecycleBoxLayout):
+    """
+    Vertical layout of rows of the same height (default_size[1], full width, no spacing or padding)
+    the visible rows are found from the scroll position, rows are never iterated
+    when rows are inserted or removed (flags of SessionDataModel), the views of the other rows are kept and only placed
+    again, the views of the changed rows are refreshed when they are reused
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._layout_key = None  # (rows, width, height) of the last layout
+
+    def compute_sizes_from_data(self, data, flags):
+        if all(flags):
+            self._move_views(flags)
+        else:
+            # at least one change is unknown
+            self.clear_layout()
+        self._layout_key = None
+        self.view_opts = RowOptions(self, len(data))
+
+    def _move_views(self, flags) -> None:
+        """
+        gives the views (still in sync with their rows) the index of their row after the changes
+        """
+        self.remove_views()
+        for views in self.recycleview.view_adapter.dirty_views.values():
+            moved = {}
+            stale = min(min(views, default=0), 0)
+            for index, view in views.items():
+                for flag in flags:
+                    if index is None or index < 0:
+                        break
+                    index = _moved_index(index, flag)
+                if index is None:
+                    # never asked for: reused (and refreshed) for any row
+                    stale -= 1
+                    index = stale
+                moved[index] = view
+            views.clear()
+            views.update(moved)
+
+    def compute_layout(self, data, flags):
+        self._size_needs_update = False
+        self.minimum_height = len(data) * self.default_size[1]
+        key = (len(data), self.width, self.height)
+        if key != self._layout_key:
+            # rows shown are placed again (their views are kept)
+            self._layout_key = key
+            self.remove_views()
+
+    def get_view_index_at(self, pos):
+        count = len(self.view_opts)
+        return min(max(int((self.top - pos[1]) // self.default_size[1]), 0), count - 1)
+
+    def compute_visible_views(self, data, viewport):
+        if not data:
+            return []
+        x, y, w, h = viewport
+        return list(range(self.get_view_index_at((x, y + h)), self.get_view_index_at((x, y)) + 1))
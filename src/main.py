@@ -2,22 +2,24 @@
 Main application file
 =====================
 Colorimeter App
+
+Only the main screen is loaded before the first frame: the session screens, the popups and the camera
+(provider probing) are imported after the start of the app (see MobileColorimeterApp.start_app)
 """
-import webbrowser
+from threading import Thread
 from kivy.app import App
 from kivy.uix.behaviors import ButtonBehavior
 from kivy.uix.screenmanager import ScreenManager, Screen
 from kivy.logger import Logger
 from kivy.utils import platform
 from kivy.uix.rst import RstDocument
-from kivy.properties import NumericProperty, ColorProperty, StringProperty, ListProperty
+from kivy.properties import NumericProperty, ColorProperty, StringProperty, ListProperty, BooleanProperty
 from kivy.uix.image import Image
 from kivy.factory import Factory
 from kivy.lang import Builder
+from kivy.clock import Clock, mainthread
 from android_permissions import AndroidPermissions
 from screens.mainscreen import MainScreen
-from screens.analysisscreen import AnalysisScreen
-from popups import CapturePopup, ConcentrationPopup
 
 LINKS: dict[str, str] = {
     'github': "https://github.com/olivier-boesch/MobileColorimeter",
@@ -89,6 +91,7 @@ class InfoRstDocument(RstDocument):
         :param node: which node is it (not used)
         :param ref: what ref was pressed
         """
+        import webbrowser
         try:
             webbrowser.open(LINKS[ref])
         except KeyError:
@@ -98,9 +101,25 @@ class InfoRstDocument(RstDocument):
 class MyScreenManager(ScreenManager):
     """
     Screen manager of the app
+    sessions are kept as SessionData, only the screens of the current session and of its neighbours are built
+    (screens of the other sessions are released to a pool and rebound when needed)
     """
     # higher number for session number (always higher in a use)
     last_number_for_analysis = NumericProperty(0)
+    # number of released analysis screens kept for reuse
+    screen_pool_size = 2
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.sessions: dict[str, "SessionData"] = {}  # screen name -> session, in display order
+        self.screen_pool: list["AnalysisScreen"] = []
+
+    @property
+    def page_names(self) -> list[str]:
+        """
+        names of all the pages (built or not) in display order
+        """
+        return ['main_screen', *self.sessions]
 
     def change_screen(self, direction: str) -> None:
         """
@@ -108,27 +127,71 @@ class MyScreenManager(ScreenManager):
         :param direction: where to move the screen
         """
         Logger.info(f"Ui: Moving \"{direction}\"")
+        pages = self.page_names
+        cur = pages.index(self.current)
         if direction == 'left':
-            self.transition.direction = 'right'
-            cur = self.screen_names.index(self.current)
-            self.current = self.screen_names[(cur - 1) % len(self.screen_names)]
+            self.show_page(pages[(cur - 1) % len(pages)], 'right')
         if direction == 'right':
-            self.transition.direction = 'left'
-            cur = self.screen_names.index(self.current)
-            self.current = self.screen_names[(cur + 1) % len(self.screen_names)]
+            self.show_page(pages[(cur + 1) % len(pages)], 'left')
+
+    def show_page(self, name: str, direction: str) -> None:
+        """
+        Shows a page (its screen is built if needed)
+        :param name: name of the page
+        :param direction: direction of the transition
+        """
+        self.build_screen(name)
+        self.transition.direction = direction
+        self.current = name
+        Clock.schedule_once(self.trim_screens, self.transition.duration)
+
+    def build_screen(self, name: str) -> None:
+        """
+        Builds the screen of a session page (recycles a released screen if possible)
+        :param name: name of the page
+        """
+        if self.has_screen(name) or name not in self.sessions:
+            return
+        from screens.analysisscreen import AnalysisScreen
+        if self.screen_pool:
+            screen = self.screen_pool.pop()
+            screen.bind_session(self.sessions[name])
+        else:
+            screen = AnalysisScreen(data=self.sessions[name])
+        screen.name = name
+        self.add_widget(screen)
+
+    def trim_screens(self, *args) -> None:
+        """
+        Keeps only the screens of the current page and of its neighbours, builds the neighbours
+        """
+        if self.transition.is_active:
+            Clock.schedule_once(self.trim_screens, self.transition.duration)
+            return
+        from screens.analysisscreen import AnalysisScreen
+        pages = self.page_names
+        cur = pages.index(self.current)
+        keep = {pages[(cur + offset) % len(pages)] for offset in (-1, 0, 1)}
+        for screen in self.screens[:]:
+            if isinstance(screen, AnalysisScreen) and screen.name not in keep:
+                self.remove_widget(screen)
+                screen.release_session()
+                if len(self.screen_pool) < self.screen_pool_size:
+                    self.screen_pool.append(screen)
+        for name in keep:
+            self.build_screen(name)
 
     def add_session(self) -> None:
         """
         Add a new session to the screen manager (a new screen analysis)
         :return:
         """
+        from screens.analysisscreen import SessionData
         session_screen_name = 'analysis_screen' + str(self.last_number_for_analysis)
         Logger.info(f"Session: Adding \"{session_screen_name}\"")
-        self.add_widget(AnalysisScreen(name=session_screen_name,
-                                       number=self.last_number_for_analysis))
-        self.transition.direction = 'up'
-        self.current = session_screen_name
-        Logger.info(f"Session: Updated screens list {self.screen_names!s}")
+        self.sessions[session_screen_name] = SessionData(self.last_number_for_analysis)
+        self.show_page(session_screen_name, 'up')
+        Logger.info(f"Session: Updated sessions list {list(self.sessions)!s}")
         self.last_number_for_analysis += 1
 
     def ask_delete_session(self, screen: str) -> None:
@@ -158,11 +221,51 @@ class MyScreenManager(ScreenManager):
         :param screen: screen object to delete
         """
         Logger.info(f"Session: Deleting \"{screen.name}\"")
-        cur = self.screen_names.index(screen.name)
-        self.transition.direction = 'down'
-        self.remove_widget(screen)
-        Logger.info(f"Session: Updated screens list {self.screen_names!s}")
-        self.current = self.screen_names[(cur - 1) % len(self.screen_names)]
+        pages = self.page_names
+        cur = pages.index(screen.name)
+        del self.sessions[screen.name]
+        Logger.info(f"Session: Updated sessions list {list(self.sessions)!s}")
+        # the screen is released when the transition is over
+        self.show_page(pages[(cur - 1) % len(pages)], 'down')
+
+    def export_sessions(self) -> None:
+        """
+        Exports the reports of all the sessions in one document with a table of contents
+        the export runs in the background on snapshots of the sessions
+        """
+        import popups  # message popups
+        sessions = [(data.number, data.session.snapshot()) for data in self.sessions.values()
+                    if data.session.reference is not None and len(data.session.samples) > 0]
+        if not sessions:
+            Factory.MessagePopup(message="aucune session à exporter.").open()
+            return
+        Logger.info(f"Session: Exporting {len(sessions)} sessions")
+        Thread(target=self._export_sessions, args=(sessions,), daemon=True).start()
+
+    def _export_sessions(self, sessions: list) -> None:
+        from colorimetry.batch import export_batch
+        try:
+            export_batch(sessions, combined=True)
+            self.export_sessions_done(True)
+        except Exception:
+            Logger.exception("Session: export of the sessions failed")
+            self.export_sessions_done(False)
+        finally:
+            if platform == 'android':
+                # the worker thread was attached to the jvm by the shared storage
+                from jnius import detach
+                detach()
+
+    @mainthread
+    def export_sessions_done(self, success: bool) -> None:
+        """
+        Called (in the main thread) when the export of the sessions ends
+        :param success: the document was saved
+        """
+        if success:
+            Factory.MessagePopup(message='le fichier est disponible dans votre dossier document.').open()
+        else:
+            Factory.MessagePopup(message="l'export du document a échoué.").open()
 
 
 class MobileColorimeterApp(App):
@@ -171,11 +274,33 @@ class MobileColorimeterApp(App):
     """
     title = "Mobile Colorimeter"
     icon = "images/logo.png"
-    capture_popup = CapturePopup()
-    concentration_popup = ConcentrationPopup()
     version = __version__
     dont_gc = None
     sm = None
+    # session screens, popups and camera are loaded
+    ui_ready = BooleanProperty(False)
+    _capture_popup = None
+    _concentration_popup = None
+
+    @property
+    def capture_popup(self) -> "CapturePopup":
+        """
+        popup for color captures (built on first use)
+        """
+        if self._capture_popup is None:
+            from popups import CapturePopup
+            self._capture_popup = CapturePopup()
+        return self._capture_popup
+
+    @property
+    def concentration_popup(self) -> "ConcentrationPopup":
+        """
+        popup asking for a concentration (built on first use)
+        """
+        if self._concentration_popup is None:
+            from popups import ConcentrationPopup
+            self._concentration_popup = ConcentrationPopup()
+        return self._concentration_popup
 
     def build(self):
         self.sm = MyScreenManager()
@@ -189,8 +314,37 @@ class MobileColorimeterApp(App):
     def start_app(self):
         """
         called when the app starts
+        loads the rest of the ui in the background
         """
         self.dont_gc = None
+        Thread(target=self.preload_modules, daemon=True).start()
+
+    def preload_modules(self):
+        """
+        imports the heavy modules without kv rules (camera providers, numpy, PIL) in a worker thread
+        """
+        import numpy
+        from PIL import Image
+        if platform != 'android':
+            # probes the camera providers
+            import camera4kivy.based_on_kivy_core.camera
+        Clock.schedule_once(self.load_ui)
+
+    def load_ui(self, dt):
+        """
+        loads the session screens and the popups (kv rules) in the main thread, one per frame
+        """
+        import screens.analysisscreen
+        Clock.schedule_once(self.build_popups)
+
+    def build_popups(self, dt):
+        """
+        builds the popups before their first use
+        """
+        for popup in (self.capture_popup, self.concentration_popup):
+            Logger.debug(f"Ui: {type(popup).__name__} built")
+        self.ui_ready = True
+        Logger.info("Ui: session screens and popups loaded")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,181 @@
+"""
+Plotting
+
+Decimation of large data sets for the plots of kivy_garden's Graph
+the plot gets at most a fixed number of points (vertex budget) whatever the size of the data:
+points of the visible x range are picked from a cached multi-resolution pyramid then reduced with
+min/max bucketing (keeps the extremes, for scatter plots) or LTTB (keeps the shape, for traces)
+"""
+import numpy as np
+from kivy.clock import Clock
+
+
+def minmax_decimate(y: np.ndarray, buckets: int) -> np.ndarray:
+    """
+    indexes of the minimum and maximum of y in each of the buckets (at most 2 * buckets indexes, sorted)
+    """
+    n = len(y)
+    if n <= 2 * buckets:
+        return np.arange(n)
+    size = -(-n // buckets)
+    buckets = -(-n // size)
+    padded = np.full(buckets * size, np.nan)
+    padded[:n] = y
+    padded = padded.reshape(buckets, size)
+    offsets = np.arange(buckets) * size
+    indexes = np.concatenate((offsets + np.nanargmin(padded, axis=1), offsets + np.nanargmax(padded, axis=1)))
+    return np.unique(indexes)
+
+
+def lttb_decimate(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """
+    indexes of the points kept by the largest triangle three buckets algorithm (threshold points, sorted)
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int)
+    indexes = np.empty(threshold, dtype=np.intp)
+    indexes[0] = 0
+    indexes[-1] = n - 1
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        # average point of the next bucket
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+        # point of the bucket making the largest triangle with the previous point and the average
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(np.argmax(area))
+        indexes[i + 1] = a
+    return indexes
+
+
+class DecimationPyramid:
+    def __init__(self, x: np.ndarray, y: np.ndarray, budget: int, factor: int = 4) -> None:
+        """
+        Levels of decimation of a data set, each level has about factor times fewer points than the previous one
+        ---
+        x must be increasing
+        levels[0] is all the points, the last level has at most budget points
+        """
+        self.x = x
+        self.y = y
+        self.levels: list[np.ndarray] = [np.arange(len(x))]
+        while len(self.levels[-1]) > budget:
+            level = self.levels[-1]
+            kept = minmax_decimate(y[level], max(len(level) // (2 * factor), 1))
+            if len(kept) >= len(level):
+                break
+            self.levels.append(level[kept])
+
+    def visible(self, xmin: float, xmax: float, budget: int) -> np.ndarray:
+        """
+        indexes of the points between xmin and xmax, from the coarsest level with at least budget points in this range
+        """
+        for level in reversed(self.levels):
+            x = self.x[level]
+            start, end = np.searchsorted(x, xmin, 'left'), np.searchsorted(x, xmax, 'right')
+            if end - start >= budget or level is self.levels[0]:
+                return level[start:end]
+
+
+class DecimatedPlot:
+    """
+    Feeds a kivy_garden.graph plot with a decimated copy of the data
+    the decimation is done again only when the data or the visible x range of the graph changes
+    plot: the plot (PointPlot, LinePlot...)
+    graph: graph of the plot, its xmin/xmax give the visible range (all the data if None)
+    budget: maximum number of points given to the plot
+    method: 'minmax' (scatter plots) or 'lttb' (traces)
+    """
+
+    def __init__(self, plot, graph=None, budget: int = 1024, method: str = 'minmax'):
+        self.plot = plot
+        self.graph = graph
+        self.budget = budget
+        self.method = method
+        self.x = np.empty(0)
+        self.y = np.empty(0)
+        self.version = 0
+        self._pyramid: DecimationPyramid | None = None
+        self._shown = None  # (version, first index, last index) of the points given to the plot
+        self._update_trigger = Clock.create_trigger(self.update)
+        if graph is not None:
+            graph.fbind('xmin', self._update_trigger)
+            graph.fbind('xmax', self._update_trigger)
+
+    def set_points(self, points: list[tuple[float, float]]) -> None:
+        """
+        replaces the data (points are sorted by x)
+        """
+        data = np.array(points, dtype=float).reshape(-1, 2)
+        order = np.argsort(data[:, 0], kind='stable')
+        self.x = data[order, 0]
+        self.y = data[order, 1]
+        self._changed()
+
+    def insert(self, index: int, point: tuple[float, float]) -> None:
+        """
+        inserts one point (index keeps x increasing)
+        the plot gets only this point if it shows all the data
+        """
+        shows_all = self._shows_all()
+        self.x = np.insert(self.x, index, point[0])
+        self.y = np.insert(self.y, index, point[1])
+        self._changed()
+        if shows_all and len(self.x) <= self.budget and self._in_range(point[0]):
+            self.plot.points.insert(index, tuple(point))
+            self._shown = (self.version, 0, len(self.x))
+
+    def remove(self, index: int) -> None:
+        """
+        removes one point
+        the plot loses only this point if it shows all the data, not decimated
+        """
+        shows_all = self._shows_all() and len(self.x) <= self.budget
+        self.x = np.delete(self.x, index)
+        self.y = np.delete(self.y, index)
+        self._changed()
+        if shows_all:
+            del self.plot.points[index]
+            self._shown = (self.version, 0, len(self.x))
+
+    def _changed(self) -> None:
+        self.version += 1
+        self._pyramid = None
+        self._update_trigger()
+
+    def _in_range(self, x: float) -> bool:
+        return self.graph is None or self.graph.xmin <= x <= self.graph.xmax
+
+    def _shows_all(self) -> bool:
+        return self._shown is not None and self._shown == (self.version, 0, len(self.x))
+
+    def _visible_range(self) -> tuple[int, int]:
+        if self.graph is None:
+            return 0, len(self.x)
+        return (int(np.searchsorted(self.x, self.graph.xmin, 'left')),
+                int(np.searchsorted(self.x, self.graph.xmax, 'right')))
+
+    def update(self, *args) -> None:
+        """
+        gives the decimated visible points to the plot (nothing is done if they didn't change)
+        """
+        start, end = self._visible_range()
+        shown = (self.version, start, end)
+        if shown == self._shown:
+            return
+        self._shown = shown
+        if end - start <= self.budget:
+            indexes = np.arange(start, end)
+        else:
+            if self._pyramid is None:
+                self._pyramid = DecimationPyramid(self.x, self.y, self.budget)
+            indexes = self._pyramid.visible(self.x[start], self.x[end - 1], self.budget)
+            if self.method == 'lttb':
+                indexes = indexes[lttb_decimate(self.x[indexes], self.y[indexes], self.budget)]
+            else:
+                indexes = indexes[minmax_decimate(self.y[indexes], self.budget // 2)]
+        self.plot.points = list(zip(self.x[indexes].tolist(), self.y[indexes].tolist()))
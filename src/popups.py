@@ -170,18 +170,23 @@ class CustomPreview(Preview):
     sample = ListProperty([0, 0, 0])
     analyze_on = BooleanProperty(False)
 
-    def analyze_pixels_callback(self, pixels: bytes, image_size: tuple[int, int], image_pos: tuple[int, int],
-                                image_scale: float, mirror: bool):
+    def analyze_pixels_callback(self, pixels: bytes | None, image_size: tuple[int, int], image_pos: tuple[int, int],
+                                image_scale: float, mirror: bool, yuv_frame: "YUVFrame | None" = None):
         """
         Custom callback for image analysis of a rectangle (analyse_w x analyse_h)
         computes the mean color of this rectangle
-        :param pixels: image pixels in rgba format
+        :param pixels: image pixels in rgba format (None if yuv_frame is given)
         :param image_size: tuple (width, height) of the image
         :param image_pos: position of the image
         :param image_scale: scale of the image
         :param mirror: is the image mirrored ?
+        :param yuv_frame: yuv planes of the image if the camera provides them (only the rectangle is converted)
         :return: None
         """
+        if yuv_frame is not None:
+            w, h = image_size
+            self.set_rgb_values(yuv_frame.mean_rgb(fraction=(self.analyse_w / w, self.analyse_h / h)))
+            return
         pil_image = Image.frombytes(mode='RGBA', size=image_size,
                                     data=pixels)
         w, h = image_size
@@ -209,7 +214,19 @@ class CustomPreview(Preview):
         self.g = int(mean_color[1])
         self.b = int(mean_color[2])
 
+    def on_analyse_w(self, instance: "CustomPreview", value: int):
+        """
+        the analysis rectangle changed: redraw the overlay
+        """
+        self.refresh_canvas_instructions()
+
+    on_analyse_h = on_analyse_w
+
     def canvas_instructions_callback(self, texture: "Texture", tex_size: tuple[int, int], tex_pos: tuple[int, int]):
+        """
+        draws the analysis rectangle over the preview
+        only called when the preview geometry changes (instructions are kept between frames)
+        """
         x, y = tex_pos
         w, h = tex_size
         Color(1, 1, 1, 1)
@@ -283,6 +300,8 @@ class CapturePopup(Popup):
         """
         Called when the popup is about to be opened
         """
+        # fixed analysis resolution: the analysed rectangle is in image pixels,
+        # an adaptive resolution would change the part of the frame averaged
         self.ids['preview'].connect_camera(camera_id='back',
                                            enable_video=False,
                                            enable_analyze_pixels=True, mirror=False)
@@ -301,7 +320,7 @@ class CapturePopup(Popup):
         :param val: sampled color (tuple of r,g, and b values)
         """
         self.sample = val
-        Logger.info(f"Sampled Color: {val}")
+        Logger.info(f"Sampled Color: {val} (analysis: {self.ids.preview.analyze_stats()!s})")
         if self.callback_method is not None:
             self.callback_method(self.concentration, self.sample)
             self.dismiss()
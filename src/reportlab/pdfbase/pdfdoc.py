@@ -14,8 +14,10 @@ The classes within this generally mirror structures in the PDF file
 and are not part of any public interface.  Instead, canvas and font
 classes are made available elsewhere for users to manipulate.
 """
-import binascii, codecs, zlib
+import binascii, codecs, zlib, threading
 from collections import OrderedDict
+from io import BytesIO
+from concurrent.futures import Future, ThreadPoolExecutor
 from reportlab.pdfbase import pdfutils
 from reportlab import rl_config
 from reportlab.lib.utils import open_for_read, makeFileName, isSeq, isBytes, isUnicode, _digester, isStr, bytestr, annotateException, TimeStamp
@@ -48,8 +50,30 @@ Pages = "Pages"
 PDF_VERSION_DEFAULT = (1, 3)
 PDF_SUPPORT_VERSION = dict(     #map keyword to min version that supports it
     transparency = (1, 4),
+    objectStreams = (1, 5),
     )
 
+_zStrategies = dict(
+    default = zlib.Z_DEFAULT_STRATEGY,
+    filtered = zlib.Z_FILTERED,
+    huffman = zlib.Z_HUFFMAN_ONLY,
+    rle = zlib.Z_RLE,
+    fixed = zlib.Z_FIXED,
+    )
+
+def zcompress(data):
+    "flate compress data with rl_config.compressionLevel and rl_config.compressionStrategy"
+    level = rl_config.compressionLevel
+    strategy = _zStrategies[rl_config.compressionStrategy]
+    if strategy==zlib.Z_DEFAULT_STRATEGY:
+        return zlib.compress(data,level)
+    c = zlib.compressobj(level,zlib.DEFLATED,zlib.MAX_WBITS,zlib.DEF_MEM_LEVEL,strategy)
+    return c.compress(data)+c.flush()
+
+def _resolved(content):
+    "content or the result of a compression started earlier (see PDFDocument.submitCompression)"
+    return content.result() if isinstance(content,Future) else content
+
 def pdfdocEnc(x):
     return x.encode('extpdfdoc') if isinstance(x,str) else x
 
@@ -112,6 +136,10 @@ class PDFDocument(PDFObject):
     # set this to define filters
     defaultStreamFilters = None
     encrypt = NoEncryption() # default no encryption
+    _streamTo = None    # output of a streamed document (see setStreaming)
+    _streamFile = None  # PDFFile writing to it, opened by the first streamed page
+    _compressor = None  # executor compressing the page and image streams (see setCompressionThreads)
+    _objectStreams = 0  # pack the objects in object streams (see setObjectStreams)
     def __init__(self,
                  dummyoutline=0,
                  compression=rl_config.pageCompression,
@@ -169,6 +197,30 @@ class PDFDocument(PDFObject):
         # XXX: maybe this should also set self.defaultStreamFilters?
         self.compression = onoff
 
+    def setCompressionThreads(self, threads):
+        """compress the page and image streams on threads worker threads: each stream is
+        submitted when it is finished (page added, image registered) and collected when the
+        document is formatted. 0 compresses them on the calling thread (the default)."""
+        if self._compressor is not None:
+            self._compressor.shutdown()  # the submitted streams are still collected
+        self._compressor = ThreadPoolExecutor(threads,'rl-compress') if threads else None
+
+    def setObjectStreams(self, onoff):
+        """if onoff is true the objects which are not streams (pages, fonts, annotations, outlines...)
+        are packed in compressed object streams and the xref table is a stream (PDF 1.5).
+        Encrypted and signed documents keep the classic layout."""
+        self._objectStreams = onoff
+
+    def _useObjectStreams(self):
+        return (self._objectStreams and isinstance(self.encrypt,NoEncryption)
+                and not getattr(self,'_digiSigs',None))
+
+    def submitCompression(self, func, *args):
+        "func(*args) or, with compression threads, a Future of it (see setCompressionThreads)"
+        if self._compressor is None:
+            return func(*args)
+        return self._compressor.submit(func,*args)
+
     def ensureMinPdfVersion(self, *keys):
         "Ensure that the pdf version is greater than or equal to that specified by the keys"
         for k in keys:
@@ -189,10 +241,8 @@ class PDFDocument(PDFObject):
         self._ID = (b'\n['+IDs+IDs+b']\n% ReportLab generated PDF document -- digest (http://www.reportlab.com)\n')
         return self._ID
 
-    def SaveToFile(self, filename, canvas):
-        if getattr(self,'_savedToFile',False):
-            raise RuntimeError("class %s instances can only be saved once" % self.__class__.__name__)
-        self._savedToFile = True
+    def _openOutput(self, filename):
+        "return (file, filename, myfile) for a file name or a file-like object"
         if hasattr(getattr(filename, "write",None),'__call__'):
             myfile = 0
             f = filename
@@ -208,11 +258,103 @@ class PDFDocument(PDFObject):
             f = open(filename, "wb")
         else:
             raise TypeError('Cannot use %s as a filename or file' % repr(filename))
+        return f, filename, myfile
+
+    def setStreaming(self, filename):
+        """write the document to filename (a file name or a file-like object) while it is made:
+        each page is formatted, written and released when it is added (see streamPage),
+        SaveToFile then writes the remaining objects, the xref and the trailer.
+        Pass None to keep the whole document until it is saved (the default)."""
+        if self._streamFile is not None:
+            raise RuntimeError("pages already streamed to %s" % self._streamTo)
+        self._streamTo = filename
+
+    def _canStream(self):
+        # the encryption keys and digital signatures need the complete document
+        return (self._streamTo is not None and isinstance(self.encrypt,NoEncryption)
+                and not getattr(self,'_digiSigs',None))
+
+    def _openStream(self):
+        "the PDFFile writing to the streamed output (opened by the first call)"
+        if self._streamFile is None:
+            f, filename, myfile = self._streamOutput = self._openOutput(self._streamTo)
+            self._streamFile = PDFFile(self._pdfVersion, sink=f)
+        return self._streamFile
+
+    def streamPage(self, name):
+        """format and write the page called name and the objects made while formatting it (its content stream...)
+        then release them: only their offsets are kept. Pages with forward references (forms defined later...)
+        are left for the final formatting."""
+        File = self._openStream()
+        self.Reference(self.Pages)      # shared: must not be written with the page
+        first = self.objectcounter+1
+        oids = [name]
+        out = []
+        self.__accum__ = File
+        try:
+            while oids:
+                oid = oids.pop(0)
+                out.append((oid,self._formatObject(oid)))
+                # new objects belong to this page
+                while first<=self.objectcounter:
+                    oids.append(self.numberToId[first])
+                    first += 1
+        except KeyError:
+            # a forward reference: the objects registered meanwhile are formatted at the end
+            return
+        finally:
+            del self.__accum__
+        idToOb = self.idToObject
+        idToOf = self.idToOffset
+        for oid, (comment, IOf) in out:
+            if comment: File.add(comment)
+            idToOf[oid] = File.add(IOf)
+            idToOb[oid] = None
+        # the page tree keeps a reference only
+        pages = self.Pages.pages
+        for i in range(len(pages)-1,-1,-1):
+            if getattr(pages[i],__InternalName__,None)==name:
+                pages[i] = PDFObjectReference(name)
+                break
+
+    def _formatObject(self, oid, objStm=None):
+        """return (comment, formatted indirect object) for the object called oid
+        or (None, None) if it is not a stream and is added to objStm (a PDFObjectStream)"""
+        obj = self.idToObject[oid]
+        if objStm is not None and not isinstance(obj,PDFObjectStream):
+            n, v = self.idToObjectNumberAndVersion[oid]
+            fcontent = format(obj, self, toplevel=1)
+            if not fcontent.endswith(b'endstream\n'):
+                objStm.add(n, fcontent)
+                return None, None
+            IOf = PDFIndirectObject.enclose(n, v, fcontent)
+        else:
+            IOf = PDFIndirectObject(oid, obj).format(self)
+        comment = None
+        # add a comment to the PDF output
+        if not rl_config.invariant and rl_config.pdfComments:
+            try:
+                classname = obj.__class__.__name__
+            except:
+                classname = ascii(obj)
+            comment = "%% %s: class %s \n" % (ascii(oid), classname[:50])
+        return comment, IOf
 
-        data = self.GetPDFData(canvas)
-        if isUnicode(data):
-            data = data.encode('latin1')
-        f.write(data)
+    def SaveToFile(self, filename, canvas):
+        if getattr(self,'_savedToFile',False):
+            raise RuntimeError("class %s instances can only be saved once" % self.__class__.__name__)
+        self._savedToFile = True
+        if self._streamTo is not None:
+            # the pages are already written, the rest is written by format
+            self._openStream()
+            self.GetPDFData(canvas)
+            f, filename, myfile = self._streamOutput
+        else:
+            f, filename, myfile = self._openOutput(filename)
+            data = self.GetPDFData(canvas)
+            if isUnicode(data):
+                data = data.encode('latin1')
+            f.write(data)
         if myfile:
             f.close()
             import os
@@ -279,6 +421,15 @@ class PDFDocument(PDFObject):
         self.Pages.addPage(page)
         self.pageCounter += 1
         self.inObject = None
+        if self._compressor is not None and not page.Override_default_compilation:
+            page.makeContents()
+            page.Contents.compressLater(self)
+        if self._canStream():
+            if self._compressor is not None:
+                # written one page later: its compression runs while the next page is drawn
+                name, self._lastPage = getattr(self,'_lastPage',None), name
+            if name:
+                self.streamPage(name)
 
     def addForm(self, name, form):
         """add a Form XObject."""
@@ -408,47 +559,75 @@ class PDFDocument(PDFObject):
         idToOf = self.idToOffset
         ### note that new entries may be "appended" DURING FORMATTING
         # __accum__ allows objects to know where they are in the file etc etc
-        self.__accum__ = File = PDFFile(self._pdfVersion) # output collector
+        useObjStms = self._useObjectStreams()
+        if useObjStms:
+            self.ensureMinPdfVersion('objectStreams')
+        if self._streamFile is not None:
+            # streamed: the pages are already written, the rest follows them
+            File = self._streamFile
+            if self._pdfVersion>File.pdfVersion:
+                # the header was written before a feature needed a later version
+                cat.Version = PDFName("%s.%s" % self._pdfVersion)
+        else:
+            File = PDFFile(self._pdfVersion) # output collector
+        self.__accum__ = File
+        objStm = None   # object stream being filled
+        packed = {}     # object number to (object stream number, index) of the packed objects
         while True:
             counter += 1 # do next object...
-            if counter not in numbertoid: break
+            if counter not in numbertoid:
+                if objStm is None or not objStm.objects: break
+                # the last object stream is the next object
+                self.Reference(objStm)
+                objStm = None
             oid = numbertoid[counter]
-            #printidToOb
-            obj = idToOb[oid]
-            IO = PDFIndirectObject(oid, obj)
-            # register object number and version
-            IOf = IO.format(self)
-            # add a comment to the PDF output
-            if not rl_config.invariant and rl_config.pdfComments:
-                try:
-                    classname = obj.__class__.__name__
-                except:
-                    classname = ascii(obj)
-                File.add("%% %s: class %s \n" % (ascii(oid), classname[:50]))
-            offset = File.add(IOf)
-            idToOf[oid] = offset
+            if oid not in idToOf:   # not streamed yet
+                if useObjStms and objStm is None:
+                    objStm = PDFObjectStream()
+                comment, IOf = self._formatObject(oid, objStm)
+                if IOf is None:
+                    packed[counter] = objStm, len(objStm.objects)-1
+                    if objStm.full():
+                        self.Reference(objStm)
+                        objStm = None
+                else:
+                    if comment: File.add(comment)
+                    idToOf[oid] = File.add(IOf)
             ids.append(oid)
         del self.__accum__
         # sanity checks (must happen AFTER formatting)
         lno = len(numbertoid)
         if counter-1!=lno:
             raise ValueError("counter %s doesn't match number to id dictionary %s" %(counter, lno))
-        # now add the xref
-        xref = PDFCrossReferenceTable()
-        xref.addsection(0, ids)
-        xreff = xref.format(self)
-        xrefoffset = File.add(xreff)
-        # now add the trailer
-        trailer = PDFTrailer(
-            startxref = xrefoffset,
-            Size = lno+1,
-            Root = self.Reference(cat),
-            Info = self.Reference(info),
-            Encrypt = encryptref,
-            ID = self.ID(),
-            )
-        trailerf = trailer.format(self)
-        File.add(trailerf)
+        if useObjStms:
+            # the xref stream is the last object and holds the trailer
+            xref = PDFCrossReferenceStream(
+                ids, packed, File.offset,
+                Root = self.Reference(cat),
+                Info = self.Reference(info),
+                ID = self.ID(),
+                )
+            File.add(xref.format(self))
+        else:
+            # now add the xref
+            xref = PDFCrossReferenceTable()
+            xref.addsection(0, ids)
+            xreff = xref.format(self)
+            xrefoffset = File.add(xreff)
+            # now add the trailer
+            trailer = PDFTrailer(
+                startxref = xrefoffset,
+                Size = lno+1,
+                Root = self.Reference(cat),
+                Info = self.Reference(info),
+                Encrypt = encryptref,
+                ID = self.ID(),
+                )
+            trailerf = trailer.format(self)
+            File.add(trailerf)
+        if self._compressor is not None:
+            self._compressor.shutdown()
+            self._compressor = None
         for ds in getattr(self,'_digiSigs',[]):
             ds.sign(File)
         # return string format for pdf file
@@ -749,7 +928,7 @@ class PDFStreamFilterZCompress:
     def encode(self, text):
         if isUnicode(text):
             text = text.encode('utf8')
-        return zlib.compress(text)
+        return zcompress(text)
     def decode(self, encoded):
         return zlib.decompress(encoded)
 
@@ -780,6 +959,14 @@ class PDFStream(PDFObject):
         self.dictionary = dictionary
         self.content = content
         self.filters = filters
+    def compressLater(self, document):
+        "start the flate compression of the content on the compression threads of document"
+        filters = self.filters
+        if filters is None:
+            filters = document.defaultStreamFilters
+        if (filters and filters[-1] is PDFZCompress and self.content is not None
+                and document._compressor is not None):
+            self._zcontent = document.submitCompression(PDFZCompress.encode,self.content)
     def format(self, document):
         dictionary = self.dictionary
         # copy it for modification
@@ -796,10 +983,15 @@ class PDFStream(PDFObject):
             rf = list(filters)
             rf.reverse()
             fnames = []
+            zcontent = getattr(self,'_zcontent',None)  # first filter applied by compressLater
             for f in rf:
                 #print "*****************content:"; print repr(content[:200])
                 #print "*****************filter", f.pdfname
-                content = f.encode(content)
+                if zcontent is not None:
+                    content = zcontent.result()
+                    zcontent = None
+                else:
+                    content = f.encode(content)
                 fnames.insert(0, PDFName(f.pdfname))
             #print "*****************finally:"; print content[:200]
             #print "****** FILTERS", fnames
@@ -865,6 +1057,10 @@ class PDFIndirectObject(PDFObject):
         # set encryption parameters
         document.encrypt.register(n, v)
         fcontent = format(self.content, document, toplevel=1)   # yes this is at top level
+        return self.enclose(n, v, fcontent)
+    @staticmethod
+    def enclose(n, v, fcontent):
+        "the indirect object n v made of the formatted object fcontent"
         return (pdfdocEnc("%s %s obj\n"%(n,v))
             +fcontent+ (b'' if fcontent.endswith(b'\n') else b'\n')
             +b'endobj\n')
@@ -880,9 +1076,11 @@ class PDFObjectReference(PDFObject):
 
 class PDFFile(PDFObject):
     ### just accumulates strings: keeps track of current offset
-    def __init__(self,pdfVersion=PDF_VERSION_DEFAULT):
+    ### if sink (a file-like object) is given the strings are written to it instead
+    def __init__(self,pdfVersion=PDF_VERSION_DEFAULT,sink=None):
         self.strings = []
-        self.write = self.strings.append
+        self.write = self.strings.append if sink is None else sink.write
+        self.pdfVersion = pdfVersion
         self.offset = 0
         ### chapter 5
         # Following Ken Lunde's advice and the PDF spec, this includes
@@ -983,6 +1181,67 @@ class PDFTrailer(PDFObject):
                 ]
                 )
 
+class PDFObjectStream(PDFObject):
+    "objects which are not streams packed in a compressed stream (PDF 1.5 /Type /ObjStm)"
+    __RefOnly__ = 1
+    __Comment__ = "object stream"
+    maxObjects = 200    # objects per stream
+    def __init__(self):
+        self.objects = []   # (object number, formatted object)
+    def add(self, n, fcontent):
+        self.objects.append((n, fcontent))
+    def full(self):
+        return len(self.objects)>=self.maxObjects
+    def format(self, document):
+        offsets = []
+        pos = 0
+        for n, fcontent in self.objects:
+            offsets.append('%d %d' % (n, pos))
+            pos += len(fcontent)+1
+        header = pdfdocEnc(' '.join(offsets)+'\n')
+        S = PDFStream(PDFDictionary(dict(Type=PDFName('ObjStm'), N=len(self.objects), First=len(header))),
+                    header+b'\n'.join(fcontent for n, fcontent in self.objects),
+                    filters=rl_config.useA85 and [PDFBase85Encode,PDFZCompress] or [PDFZCompress])
+        return S.format(document)
+
+class PDFCrossReferenceStream(PDFObject):
+    """xref stream (PDF 1.5): the cross reference entries and the trailer in the last indirect object of the file.
+    ids are the object ids in object number order, packed maps the numbers of the objects in object streams
+    to (object stream, index), offset is the position of this object in the file"""
+    def __init__(self, ids, packed, offset, Root=None, Info=None, ID=None):
+        self.ids = ids
+        self.packed = packed
+        self.offset = offset
+        self.Root = Root
+        self.Info = Info
+        self.ID = ID
+    def format(self, document):
+        idToNV = document.idToObjectNumberAndVersion
+        idToOffset = document.idToOffset
+        n = len(self.ids)+1     # this object
+        entries = [(0, 0, 65535)]
+        for id in self.ids:
+            num, version = idToNV[id]
+            if num in self.packed:
+                objStm, index = self.packed[num]
+                entries.append((2, idToNV[objStm.__InternalName__][0], index))
+            else:
+                entries.append((1, idToOffset[id], version))
+        entries.append((1, self.offset, 0))
+        w = max(1,(max(e[1] for e in entries).bit_length()+7)//8)
+        content = b''.join(t.to_bytes(1,'big')+f.to_bytes(w,'big')+g.to_bytes(2,'big') for t, f, g in entries)
+        D = PDFDictionary(dict(Type=PDFName('XRef'), Size=n+1, W=PDFArray([1,w,2]), Root=self.Root))
+        if self.Info is not None: D['Info'] = self.Info
+        if self.ID is not None: D['ID'] = self.ID
+        D.multiline = 'forced'
+        S = PDFStream(D, content, filters=[PDFZCompress])
+        return b''.join([
+                PDFIndirectObject.enclose(n, 0, S.format(document)),
+                b'startxref\n',
+                pdfdocEnc(str(self.offset)),
+                b'\n%%EOF\n',
+                ])
+
 #### XXXX skipping incremental update,
 #### encryption
 
@@ -1028,7 +1287,7 @@ class PDFCatalog(PDFObject):
     __NoDefault__ = """
         Dests Outlines Pages Threads AcroForm Names OpenAction PageMode URI
         ViewerPreferences PageLabels PageLayout JavaScript StructTreeRoot SpiderInfo
-        MarkInfo Metadata Tabs""".split()
+        MarkInfo Metadata Tabs Version""".split()
     __Refs__ = __NoDefault__
 
     def format(self, document):
@@ -1133,6 +1392,20 @@ class PDFPage(PDFCatalog):
             code = '\n'.join(code)+'\n'
         self.stream = code
 
+    def makeContents(self):
+        "make the content stream of the page from its stream (if not set already)"
+        if not self.Contents:
+            stream = self.stream
+            if not stream:
+                self.Contents = teststream()
+            else:
+                S = PDFStream()
+                if self.compression:
+                    S.filters = rl_config.useA85 and [PDFBase85Encode, PDFZCompress] or [PDFZCompress]
+                S.content = stream
+                S.__Comment__ = "page stream"
+                self.Contents = S
+
     def setPageTransition(self, tranDict):
         self.Trans = PDFDictionary(tranDict)
 
@@ -1148,17 +1421,7 @@ class PDFPage(PDFCatalog):
             #raise ValueError("annotations not reimplemented yet")
             if not isinstance(self.Annots,PDFObject):
                 self.Annots = PDFArray(self.Annots)
-        if not self.Contents:
-            stream = self.stream
-            if not stream:
-                self.Contents = teststream()
-            else:
-                S = PDFStream()
-                if self.compression:
-                    S.filters = rl_config.useA85 and [PDFBase85Encode, PDFZCompress] or [PDFZCompress]
-                S.content = stream
-                S.__Comment__ = "page stream"
-                self.Contents = S
+        self.makeContents()
         if not self.Resources:
             resources = PDFResourceDictionary()
             # fonts!
@@ -2108,7 +2371,9 @@ class PDFImageXObject(PDFObject):
             ext = os.path.splitext(source)[1].lower()
             src = open_for_read(source)
             try:
-                if not(ext in ('.jpg', '.jpeg') and self.loadImageFromJPEG(src)):
+                if not(ext in ('.jpg', '.jpeg') and self.loadImageFromJPEG(src)
+                        or ext=='.png' and self.loadImageFromPNG(src.read())):
+                    src.seek(0)
                     if rl_config.useA85:
                         self.loadImageFromA85(src)
                     else:
@@ -2157,6 +2422,77 @@ class PDFImageXObject(PDFObject):
         self.mask = None
         return True
 
+    def loadImageFromPNG(self, data):
+        """copy the compressed data of the PNG file data (bytes) without decoding it:
+        8 bit non interlaced gray, RGB or palette images (the data is read with
+        /Predictor 15). The alpha channel of gray or RGB images with alpha is split
+        into the soft mask (inflated and deflated again, not unfiltered).
+        Returns False for the others."""
+        info = pdfutils.readPNGInfo(data)
+        if not info:
+            return False
+        width, height, bitDepth, colorType, interlace, palette, transparency, idat = info
+        if bitDepth!=8 or interlace or colorType not in (0,2,3,4,6):
+            return False    # 16 bit, interlaced: decoded
+        mask = self.mask
+        if mask not in (None,'auto') and colorType not in (2,6):
+            return False    # RGB color key mask of a gray or palette image: decoded to RGB
+        if transparency is not None and colorType in (0,2,3):
+            if colorType!=2 or len(transparency)!=6:
+                return False    # transparent gray or palette entries: decoded
+            if mask=='auto':
+                tc = transparency[1],transparency[3],transparency[5]  # 16 bit big endian samples
+                mask = (tc[0], tc[0], tc[1], tc[1], tc[2], tc[2])
+        alpha = None
+        if colorType in (4,6):
+            colors = 3 if colorType==6 else 1
+            try:
+                split = pdfutils.splitPNGAlpha(zlib.decompress(idat),width,height,colors)
+            except zlib.error:
+                return False
+            if not split:
+                return False
+            idat, alpha, opaque = split
+            if mask!='auto' or opaque:
+                alpha = None
+            colorType -= 4
+        if mask=='auto':
+            mask = None
+        elif hasattr(mask,'rgb'):
+            _ = mask.rgb()
+            mask = _[0],_[0],_[1],_[1],_[2],_[2]
+        if colorType==3:
+            if not palette:
+                return False
+            self.colorSpace = PDFArray([PDFName('Indexed'),PDFName('DeviceRGB'),len(palette)//3-1,
+                                    PDFText(palette,enc='raw')])
+            colors = 1
+        else:
+            self.colorSpace = 'DeviceRGB' if colorType==2 else 'DeviceGray'
+            colors = 3 if colorType==2 else 1
+        self.width, self.height = width, height
+        self.bitsPerComponent = 8
+        self.mask = mask
+        self._decodeParms = dict(Predictor=15, Colors=colors, Columns=width)
+        if rl_config.useA85:
+            self._filters = 'ASCII85Decode','FlateDecode' #'A85','Fl'
+        else:
+            self._filters = 'FlateDecode', #'Fl'
+        if colorType==info[3]:
+            self.streamContent = asciiBase85Encode(idat) if rl_config.useA85 else idat
+        else:
+            self._raw = idat    # split scanlines, encoded by compressLater or format
+        if alpha is not None:
+            smask = self._smask = PDFImageXObject(_digester(alpha),mask=None)
+            smask.width, smask.height = width, height
+            smask.bitsPerComponent = 8
+            smask.colorSpace = 'DeviceGray'
+            smask._filters = self._filters
+            smask._decodeParms = dict(Predictor=15, Colors=1, Columns=width)
+            smask._decode = [0,1]
+            smask._raw = alpha
+        return True
+
     def loadImageFromRaw(self,source):
         IMG=[]
         imagedata = pdfutils.makeRawImage(source,IMG=IMG,detectJpeg=True)
@@ -2174,7 +2510,7 @@ class PDFImageXObject(PDFObject):
 
     def _checkTransparency(self,im):
         if self.mask=='auto':
-            if im._dataA:
+            if im._dataA and im._dataA.getRGBData().strip(b'\xff'):
                 self.mask = None
                 self._smask = PDFImageXObject(_digester(im._dataA.getRGBData()),im._dataA,mask=None)
                 self._smask._decode = [0,1]
@@ -2193,13 +2529,12 @@ class PDFImageXObject(PDFObject):
         fp = im.jpeg_fh()
         if fp:
             self.loadImageFromJPEG(fp)
-        else:
+        elif not self._loadPNGSource(im):
             self.width, self.height = im.getSize()
             raw = im.getRGBData()
             #assert len(raw) == self.width*self.height, "Wrong amount of data for image expected %sx%s=%s got %s" % (self.width,self.height,self.width*self.height,len(raw))
-            self.streamContent = zlib.compress(raw)
+            self._raw = raw     # encoded by compressLater or format
             if rl_config.useA85:
-                self.streamContent = asciiBase85Encode(self.streamContent)
                 self._filters = 'ASCII85Decode','FlateDecode' #'A85','Fl'
             else:
                 self._filters = 'FlateDecode', #'Fl'
@@ -2207,7 +2542,48 @@ class PDFImageXObject(PDFObject):
             self.bitsPerComponent = 8
             self._checkTransparency(im)
 
+    def _loadPNGSource(self, im):
+        # the file read by an ImageReader (not one of a PIL image, which may have been changed)
+        fp = getattr(im,'fp',None)
+        if (isinstance(fp,BytesIO) and getattr(im._image,'format',None)=='PNG'
+                and not (isStr(im.fileName) and im.fileName.startswith('PILIMAGE_'))):
+            return self.loadImageFromPNG(fp.getvalue())
+        return False
+
+    @staticmethod
+    def _encodeRaw(raw):
+        data = zcompress(raw)
+        if rl_config.useA85:
+            data = asciiBase85Encode(data)
+        return data
+
+    def copy(self):
+        "an unregistered copy of the encoded image and of its soft mask (the data is shared)"
+        new = self.__class__.__new__(self.__class__)
+        new.__dict__.update((k,v) for k,v in self.__dict__.items() if k not in (__InternalName__,'smask'))
+        smask = self.__dict__.get('_smask')
+        if smask is not None:
+            new._smask = smask.copy()
+        return new
+
+    def encodedSize(self):
+        "size of the encoded data and of the soft mask data (0 for data still being compressed)"
+        content = self.streamContent
+        size = 0 if isinstance(content,Future) else len(content)
+        smask = self.__dict__.get('_smask')
+        return size+smask.encodedSize() if smask is not None else size
+
+    def compressLater(self, document):
+        "start the encoding of the image data on the compression threads of document (or do it now)"
+        raw = self.__dict__.pop('_raw',None)
+        if raw is not None:
+            self.streamContent = document.submitCompression(self._encodeRaw,raw)
+
     def format(self, document):
+        raw = self.__dict__.pop('_raw',None)
+        if raw is not None:
+            self.streamContent = self._encodeRaw(raw)
+        self.streamContent = _resolved(self.streamContent)
         S = PDFStream(content = self.streamContent)
         dict = S.dictionary
         dict["Type"] = PDFName("XObject")
@@ -2215,17 +2591,88 @@ class PDFImageXObject(PDFObject):
         dict["Width"] = self.width
         dict["Height"] = self.height
         dict["BitsPerComponent"] = self.bitsPerComponent
-        dict["ColorSpace"] = PDFName(self.colorSpace)
+        dict["ColorSpace"] = self.colorSpace if isinstance(self.colorSpace,PDFObject) else PDFName(self.colorSpace)
         if self.colorSpace=='DeviceCMYK' and getattr(self,'_dotrans',0):
             dict["Decode"] = PDFArray([1,0,1,0,1,0,1,0])
         elif getattr(self,'_decode',None):
             dict["Decode"] = PDFArray(self._decode)
         dict["Filter"] = PDFArray(map(PDFName,self._filters))
+        decodeParms = getattr(self,'_decodeParms',None)
+        if decodeParms:
+            # the parameters of the last filter (FlateDecode)
+            decodeParms = PDFDictionary(decodeParms)
+            dict["DecodeParms"] = PDFArray([PDFnull]*(len(self._filters)-1)+[decodeParms]) if len(self._filters)>1 else decodeParms
         dict["Length"] = len(self.streamContent)
         if self.mask: dict["Mask"] = PDFArray(self.mask)
         if getattr(self,'smask',None): dict["SMask"] = self.smask
         return S.format(document)
 
+class PDFImageCache:
+    """process wide LRU cache of the encoded images (PDFImageXObject) keyed by a digest of their content and
+    the encoding parameters: an image drawn again in any document of the process is neither decoded nor
+    compressed. The encoded data kept is limited to rl_config.pdfImageCacheSize bytes (0 disables it)."""
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            self._images = OrderedDict()    # key to (PDFImageXObject, size)
+            self.size = 0
+            self.hits = 0
+            self.misses = 0
+
+    @staticmethod
+    def key(digest):
+        "the key of the image with content digest (image data and mask) with the current encoding parameters"
+        return (digest, rl_config.useA85, rl_config.compressionLevel, rl_config.compressionStrategy)
+
+    def get(self, key):
+        "a copy of the image stored with key or None"
+        with self._lock:
+            entry = self._images.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._images.move_to_end(key)
+            return entry[0].copy()
+
+    def put(self, key, image):
+        "keep a copy of image (data being compressed is counted when it is done)"
+        if not rl_config.pdfImageCacheSize: return
+        image = image.copy()
+        with self._lock:
+            self._resize(key, image, image.encodedSize())
+            for content in (image.streamContent, getattr(getattr(image,'_smask',None),'streamContent',None)):
+                if isinstance(content,Future):
+                    content.add_done_callback(lambda f, key=key, image=image: self._resize(key, image, image.encodedSize(), f))
+
+    def _resize(self, key, image, size, future=None):
+        with self._lock:
+            if future is not None:
+                # count the compressed data as soon as it is ready
+                if future.exception() is not None or self._images.get(key,(None,))[0] is not image:
+                    return
+                for obj in (image, getattr(image,'_smask',None)):
+                    if obj is not None and obj.streamContent is future and future.done():
+                        obj.streamContent = future.result()
+                size = image.encodedSize()
+            old = self._images.get(key)
+            if old is not None: self.size -= old[1]
+            self._images[key] = image, size
+            self.size += size
+            # the least recently used images are dropped
+            while self.size>rl_config.pdfImageCacheSize and len(self._images)>1:
+                self.size -= self._images.popitem(last=False)[1][1]
+
+    def stats(self):
+        "dict of the hits, misses, images and size (bytes) of the cache"
+        with self._lock:
+            return dict(hits=self.hits, misses=self.misses, images=len(self._images), size=self.size)
+
+imageCache = PDFImageCache()
+
 class PDFSeparationCMYKColor:
     def __init__(self, cmyk):
         from reportlab.lib.colors import CMYKColor
@@ -18,10 +18,11 @@ a registry of Font, TypeFace and Encoding objects.  Ideally these
 would be pre-loaded, but due to a nasty circularity problem we
 trap attempts to access them and do it on first access.
 """
-import os, sys, encodings
+import os, sys, encodings, functools
 from reportlab.pdfbase import _fontdata
 from reportlab.lib.logger import warnOnce
-from reportlab.lib.utils import rl_isfile, rl_glob, rl_isdir, open_and_read, open_and_readlines, findInPaths, isSeq, isStr
+from reportlab.lib.utils import rl_isfile, rl_glob, rl_isdir, open_and_read, open_and_readlines, findInPaths, isSeq, isStr, isUnicode
+from reportlab import rl_config
 from reportlab.rl_config import defaultEncoding, T1SearchPath
 from reportlab.lib.rl_accel import unicode2T1, instanceStringWidthT1
 from reportlab.pdfbase import rl_codecs
@@ -360,7 +361,39 @@ class Font:
         self._notdefFont = name=='ZapfDingbats' and self or _notdefFont
 
     def stringWidth(self, text, size, encoding='utf8'):
-        return instanceStringWidthT1(self, text, size, encoding=encoding)
+        return _unitStringWidth(self, text, encoding)*0.001*size
+
+    def stringWidths(self, texts, size, encoding='utf8'):
+        "widths of many strings"
+        u = _unitStringWidth
+        return [u(self, text, encoding)*0.001*size for text in texts]
+
+    def unitStringWidth(self, text, encoding='utf8'):
+        "width of text in 1/1000ths of the font size"
+        if not isUnicode(text): text = text.decode(encoding)
+        try:
+            return sum(map(self._unicodeWidths.__getitem__, map(ord, text)))
+        except (IndexError, TypeError):
+            #a character not in the table: is it in a substitution font?
+            return sum((sum(map(f.widths.__getitem__,t)) for f, t in unicode2T1(text,[self]+self.substitutionFonts)))
+
+    @property
+    def _unicodeWidths(self):
+        "widths of the characters of the encoding indexed by unicode (None for the others)"
+        W = self.__dict__.get('_unicodeWidthsCache')
+        if W is None:
+            U = {}
+            for i, width in enumerate(self.widths):
+                try:
+                    u = ord(bytes((i,)).decode(self.encName))
+                except (UnicodeDecodeError, TypeError, LookupError):
+                    continue
+                U[u] = None if u in U else width    #not sure which code would be used
+            W = [None]*(max(U)+1 if U else 0)
+            for u, width in U.items():
+                W[u] = width
+            self._unicodeWidthsCache = W
+        return W
 
     def __repr__(self):
         return "<%s %s>" % (self.__class__.__name__, self.face.name)
@@ -730,9 +763,26 @@ def getRegisteredFontNames():
 
 def stringWidth(text, fontName, fontSize, encoding='utf8'):
     """Compute width of string in points;
-    not accelerated as fast enough because of instanceStringWidthT1/TTF"""
+    font widths of recent strings are cached (rl_config.stringWidthCacheSize)"""
     return getFont(fontName).stringWidth(text, fontSize, encoding=encoding)
 
+def stringWidths(texts, fontName, fontSize, encoding='utf8'):
+    """Compute the widths of many strings in the same font in points"""
+    font = getFont(fontName)
+    if hasattr(font,'stringWidths'):
+        return font.stringWidths(texts, fontSize, encoding=encoding)
+    return [font.stringWidth(text, fontSize, encoding=encoding) for text in texts]
+
+def _setStringWidthCache():
+    '''(re)makes the cache of the unit widths of strings by font'''
+    global _unitStringWidth
+    size = rl_config.stringWidthCacheSize
+    def _unitStringWidth(font, text, encoding):
+        return font.unitStringWidth(text, encoding)
+    if size:
+        _unitStringWidth = functools.lru_cache(maxsize=size)(_unitStringWidth)
+_setStringWidthCache()
+
 def dumpFontData():
     print('Registered Encodings:')
     keys = list(_encodings.keys())
@@ -818,6 +868,7 @@ def _reset(
         d.clear()
         d.update(v)
     rl_codecs.RL_Codecs.reset_dynamic_codecs()
+    _setStringWidthCache()
 
 from reportlab.rl_config import register_reset
 register_reset(_reset)
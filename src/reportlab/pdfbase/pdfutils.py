@@ -273,6 +273,87 @@ def readJPEGInfo(image):
                 x = struct.unpack('BB', image.read(2))
                 image.seek( (x[0] << 8) + x[1] - 2, 1)
 
+# PNG images: the compressed data (IDAT chunks) is deflated scanlines with
+# a filter byte per row, which is what the PDF FlateDecode filter with the
+# PNG predictors (/Predictor 15) reads: it can be copied without decoding.
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+def readPNGInfo(data):
+    """Read the chunks of a PNG file (bytes) needed to copy its data.
+    Returns (width, height, bit depth, color type, interlace, palette, transparency, data)
+    or None if data is not a PNG file; palette and transparency are the PLTE and tRNS
+    chunks (or None), data is the concatenated IDAT chunks."""
+    import struct
+    if data[:8]!=PNG_SIGNATURE:
+        return None
+    pos = 8
+    palette = transparency = None
+    idat = []
+    header = None
+    while pos+8<=len(data):
+        length, kind = struct.unpack('>I4s', data[pos:pos+8])
+        chunk = data[pos+8:pos+8+length]
+        pos += length+12    #length, type, data, crc
+        if kind==b'IHDR':
+            header = struct.unpack('>IIBBBBB', chunk)
+        elif kind==b'PLTE':
+            palette = chunk
+        elif kind==b'tRNS':
+            transparency = chunk
+        elif kind==b'IDAT':
+            idat.append(chunk)
+        elif kind==b'IEND':
+            break
+    if header is None or not idat:
+        return None
+    width, height, bitDepth, colorType, compression, filter, interlace = header
+    if compression or filter:
+        return None
+    return width, height, bitDepth, colorType, interlace, palette, transparency, b''.join(idat)
+
+# the PNG filters only combine bytes of the same channel (the byte of the previous
+# pixel, of the row above and of the pixel above the previous one): the channels
+# of a filtered row can be separated without unfiltering it.
+def _opaqueRows(n):
+    "filtered alpha rows of n opaque pixels after opaque rows by filter type (first row, next rows)"
+    ff = b'\xff'*n
+    return (
+        (ff, ff),                                                   # None
+        (ff[:1]+bytes(n-1), ff[:1]+bytes(n-1)),                     # Sub
+        (ff, bytes(n)),                                             # Up
+        (ff[:1]+b'\x80'*(n-1), b'\x80'+bytes(n-1)),                 # Average
+        (ff[:1]+bytes(n-1), bytes(n)),                              # Paeth
+        )
+
+def splitPNGAlpha(data, width, height, colors):
+    """Separate the alpha channel of the inflated scanlines data of an 8 bit PNG image
+    with colors color samples and an alpha sample per pixel.
+    Returns (color scanlines, alpha scanlines, opaque), both still filtered, opaque
+    is true when every alpha sample is 255; None if the data is not valid."""
+    n = colors+1
+    stride = 1+width*n
+    if len(data)<stride*height:
+        return None
+    C = bytearray(height*(1+width*colors))
+    A = bytearray(height*(1+width))
+    opaqueRows = _opaqueRows(width)
+    opaque = True
+    c = a = 0
+    for y in range(height):
+        row = data[y*stride:(y+1)*stride]
+        filterType = row[0]
+        if filterType>4:
+            return None
+        C[c] = A[a] = filterType
+        for i in range(colors):
+            C[c+1+i:c+1+width*colors:colors] = row[1+i::n]
+        alpha = row[n::n]
+        A[a+1:a+1+width] = alpha
+        if opaque:
+            opaque = alpha==opaqueRows[filterType][y>0]
+        c += 1+width*colors
+        a += 1+width
+    return bytes(C), bytes(A), opaque
+
 class _fusc:
     def __init__(self,k, n):
         assert k, 'Argument k should be a non empty string'
@@ -58,9 +58,9 @@ from reportlab.pdfbase import pdfmetrics, pdfdoc
 from reportlab import rl_config
 from reportlab.lib.rl_accel import hex32, add32, calcChecksum, instanceStringWidthTTF, fp_str
 from reportlab.rl_config import register_reset, shapedFontGlob
-from collections import namedtuple
-from io import BytesIO
-import os, time, functools
+from collections import namedtuple, OrderedDict
+from io import BytesIO, UnsupportedOperation
+import os, time, functools, mmap
 
 try:
     import uharfbuzz
@@ -167,6 +167,38 @@ def TTFOpenFile(fn):
                     return tfn, f
         raise TTFError('Can\'t open file "%s"' % fn)
 
+def TTFMapFile(f):
+    '''returns the contents of an open TTF file, memory mapped if possible'''
+    if rl_config.ttfMmap:
+        try:
+            return mmap.mmap(f.fileno(),0,access=mmap.ACCESS_READ)
+        except (AttributeError, OSError, ValueError, UnsupportedOperation):
+            pass    #not a real file or empty
+    return f.read()
+
+def _ttfFileStamp(f):
+    try:
+        st = os.fstat(f.fileno())
+    except (AttributeError, OSError, ValueError, UnsupportedOperation):
+        return None
+    return st.st_mtime_ns, st.st_size
+
+#parsed TTFontFile dicts shared between instances, the rl_config.ttfParsedCacheSize last used files
+#(realpath,charInfo,validate,subfontIndex) --> ((mtime,size),__dict__ without the file map)
+_parsedTTFFiles = OrderedDict()
+#subset streams made by TTFontFile.makeSubset (key,subset,glyphs) --> bytes
+_ttfSubsets = OrderedDict()
+_ttfSubsetsSize = [0]
+
+def _copyCharMaps(D):
+    '''copy of a TTFontFile __dict__ with its own character maps (shaping adds private characters to them,
+    the glyphToChar lists are replaced not changed)'''
+    D = D.copy()
+    for a in ('charToGlyph','charWidths','glyphToChar'):
+        if a in D:
+            D[a] = D[a].copy()
+    return D
+
 class TTFontParser:
     "Basic TTF file parser"
     ttfVersions = (0x00010000,0x74727565,0x74746366)
@@ -256,7 +288,7 @@ class TTFontParser:
                 self._ttf_data = f.read()
             else:
                 self.filename, f = TTFOpenFile(f)
-                self._ttf_data = f.read()
+                self._ttf_data = TTFMapFile(f)
                 f.close()
         self._pos = 0
 
@@ -273,8 +305,11 @@ class TTFontParser:
                 raise TTFError('TTF file "%s": invalid checksum %s table: %s (expected %s)' % (self.filename,hex32(checksum),t['tag'],hex32(xchecksum)))
 
     def checksumFile(self):
-        # Check the checksums for the whole file
-        checksum = calcChecksum(self._ttf_data)
+        # Check the checksums for the whole file, a chunk at a time (the data may be a large map)
+        data = self._ttf_data
+        checksum = 0
+        for pos in range(0, len(data), 0x100000):
+            checksum = add32(checksum, calcChecksum(data[pos:pos+0x100000]))
         if 0xB1B0AFBA!=checksum:
             raise TTFError('TTF file "%s": invalid checksum %s (expected 0xB1B0AFBA) len: %d &3: %d' % (self.filename,hex32(checksum),len(self._ttf_data),(len(self._ttf_data)&3)))
 
@@ -424,7 +459,41 @@ class TTFontFile(TTFontParser):
         file can be a filename or a file object.  If validate is set to a false
         values, skips checksum validation.  This can save time, especially if
         the font is large.  See TTFontFile.extractInfo for more information.
+
+        Fonts read from a file name are parsed once: later instances copy the
+        parsed tables while the file is unchanged (rl_config.ttfParsedCacheSize
+        files are kept). Each instance maps the file itself, the map is closed
+        with the instance.
         """
+        key = None
+        if isStr(file) and not isStr(subfontIndex):
+            self.filename, f = TTFOpenFile(file)
+            stamp = _ttfFileStamp(f)
+            if stamp is not None:
+                key = os.path.realpath(self.filename), charInfo, validate, subfontIndex
+                cached = _parsedTTFFiles.pop(key,None)
+                if cached and cached[0]==stamp and rl_config.ttfParsedCacheSize:
+                    _parsedTTFFiles[key] = cached
+                    self.__dict__.update(_copyCharMaps(cached[1]))
+                    if '_ttf_data' not in cached[1]:
+                        self._ttf_data = TTFMapFile(f)
+                    f.close()
+                    return
+            self._ttf_data = TTFMapFile(f)
+            f.close()
+        self._parse(file, charInfo, validate, subfontIndex)
+        if key:
+            self._subsetKey = key+stamp
+            if rl_config.ttfParsedCacheSize:
+                D = _copyCharMaps(self.__dict__)
+                if isinstance(self._ttf_data, mmap.mmap):
+                    #not kept open by the cache
+                    del D['_ttf_data']
+                _parsedTTFFiles[key] = stamp, D
+                while len(_parsedTTFFiles)>rl_config.ttfParsedCacheSize:
+                    _parsedTTFFiles.popitem(last=False)
+
+    def _parse(self, file, charInfo, validate, subfontIndex):
         if isStr(subfontIndex): #bytes or unicode
             sfi = 0
             __dict__ = self.__dict__.copy()
@@ -886,7 +955,28 @@ class TTFontFile(TTFontParser):
     # Subsetting
 
     def makeSubset(self, subset):
-        """Create a subset of a TrueType font"""
+        """Create a subset of a TrueType font
+
+        Subsets of fonts read from a file name are kept, up to
+        rl_config.ttfSubsetCacheSize bytes, for the next documents using
+        the same characters."""
+        key = getattr(self,'_subsetKey',None)
+        maxSize = rl_config.ttfSubsetCacheSize
+        if key is None or not maxSize:
+            return self._makeSubset(subset)
+        charToGlyph = self.charToGlyph
+        key = key, tuple(subset), tuple(charToGlyph.get(code,0) for code in subset)
+        try:
+            data = _ttfSubsets.pop(key)
+        except KeyError:
+            data = self._makeSubset(subset)
+            _ttfSubsetsSize[0] += len(data)
+        _ttfSubsets[key] = data
+        while _ttfSubsetsSize[0]>maxSize:
+            _ttfSubsetsSize[0] -= len(_ttfSubsets.popitem(last=False)[1])
+        return data
+
+    def _makeSubset(self, subset):
         output = TTFontMaker()
 
         # Build a mapping of glyphs in the subset to glyph numbers in
@@ -1090,6 +1180,16 @@ class TTFontFace(TTFontFile, pdfmetrics.TypeFace):
         "Returns the width of character U+<code>"
         return self.charWidths.get(code, self.defaultWidth)
 
+    @property
+    def _unicodeWidths(self):
+        "widths of the characters U+0000 to U+20FF (Latin, Greek, Cyrillic ... punctuation, currency)"
+        W = self.__dict__.get('_unicodeWidthsCache')
+        if W is None:
+            g = self.charWidths.get
+            dw = self.defaultWidth
+            W = self._unicodeWidthsCache = [g(u,dw) for u in range(0x2100)]
+        return W
+
     def addSubsetObjects(self, doc, fontname, subset):
         """Generate a TrueType font subset and add it to the PDF document.
         Returns a PDFReference to the new FontDescriptor object."""
@@ -1215,7 +1315,29 @@ class TTFont:
         self._shaped = bool(shaped and uharfbuzz)
 
     def stringWidth(self,text,size,encoding='utf8'):
-        return instanceStringWidthTTF(self,text,size,encoding)
+        if self._shaped:    #shaping changes the widths
+            return instanceStringWidthTTF(self,text,size,encoding)
+        return 0.001*size*pdfmetrics._unitStringWidth(self,text,encoding)
+
+    def stringWidths(self,texts,size,encoding='utf8'):
+        "widths of many strings"
+        if self._shaped:
+            return [instanceStringWidthTTF(self,text,size,encoding) for text in texts]
+        u = pdfmetrics._unitStringWidth
+        scale = 0.001*size
+        return [scale*u(self,text,encoding) for text in texts]
+
+    def unitStringWidth(self,text,encoding='utf8'):
+        "width of text in 1/1000ths of the font size"
+        if not isUnicode(text):
+            text = text.decode(encoding or 'utf8')
+        face = self.face
+        try:
+            return sum(map(face._unicodeWidths.__getitem__, map(ord, text)))
+        except IndexError:
+            g = face.charWidths.get
+            dw = face.defaultWidth
+            return sum((g(ord(u),dw) for u in text))
 
     def _assignState(self,doc,asciiReadable=None,namePrefix=None):
         '''convenience function for those wishing to roll their own state properties'''
@@ -1348,7 +1470,7 @@ class TTFont:
         if not face:
             if uharfbuzz is None:
                 raise ValueError('Cannot import uharfbuzz so shaping is not allowed\nplease pip install uharfbuzz')
-            blob = uharfbuzz.Blob(self.face._ttf_data)
+            blob = uharfbuzz.Blob(bytes(self.face._ttf_data))  #may be an mmap
             face = self.__hbFace__ = uharfbuzz.Face(blob)
             del blob
             self.__hbUnis = {}
@@ -1372,7 +1494,7 @@ class TTFont:
             assert uchar<=0xF800
             self.__hbPrivate = self.__hbUnis[name] = uchar
             face.charToGlyph[uchar] = gid
-            face.glyphToChar.setdefault(gid,[]).append(uchar)
+            face.glyphToChar[gid] = face.glyphToChar.get(gid,[])+[uchar]   #the list may be shared
             face.charWidths[uchar] = advance
         return uchar
 
@@ -1557,6 +1679,9 @@ def freshTTFont(ttfn, ttfpath,**kwds):
 #preserve the initial values here
 def _reset():
     _cached_ttf_dirs.clear()
+    _parsedTTFFiles.clear()
+    _ttfSubsets.clear()
+    _ttfSubsetsSize[0] = 0
 
 register_reset(_reset)
 del register_reset
@@ -14,6 +14,7 @@ ENABLE_TRACKING = 1 # turn this off to do profile testing w/o tracking
 
 import re
 import hashlib
+from io import BytesIO
 from string import digits
 from math import sin, cos, tan, pi
 from reportlab import rl_config
@@ -23,7 +24,7 @@ from reportlab.pdfbase.ttfonts import ShapedStr, shapeFragWord
 from reportlab.pdfgen  import pathobject
 from reportlab.pdfgen.textobject import PDFTextObject, _PDFColorSetter
 from reportlab.lib.colors import black, _chooseEnforceColorSpace, Color, CMYKColor, toColor
-from reportlab.lib.utils import ImageReader, isSeq, isStr, isUnicode, _digester, asUnicode
+from reportlab.lib.utils import ImageReader, isSeq, isStr, isUnicode, _digester, asUnicode, open_for_read
 from reportlab.lib.abag import ABag
 from reportlab.lib.rl_accel import fp_str, escapePDF
 from reportlab.lib.boxstuff import aspectRatioFix
@@ -291,6 +292,9 @@ class Canvas(_PDFColorSetter):
                  trimBox=None,
                  bleedBox=None,
                  lang=None,
+                 streaming=None,
+                 compressionThreads=None,
+                 objectStreams=None,
                  **kwds,
                  ):
         """Create a canvas of a given size. etc.
@@ -303,6 +307,15 @@ class Canvas(_PDFColorSetter):
         as the preferred interface.  Default page size is A4.
         cropMarks may be True/False or an object with parameters borderWidth, markColor, markWidth
         and markLength
+
+        if streaming (default rl_config.pdfStreaming) is true the pages are written to filename
+        by showPage and released, see setStreaming.
+
+        compressionThreads (default rl_config.compressionThreads) threads compress the page and image
+        streams while the document is made, see setCompressionThreads.
+
+        if objectStreams (default rl_config.pdfObjectStreams) is true the pdf is written with compressed
+        object streams and an xref stream (PDF 1.5), see setObjectStreams.
     
         if enforceColorSpace is in ('cmyk', 'rgb', 'sep','sep_black','sep_cmyk') then one of
         the standard _PDFColorSetter callables will be used to enforce appropriate color settings.
@@ -358,6 +371,8 @@ class Canvas(_PDFColorSetter):
         #drawing coordinates.
         self.bottomup = bottomup
         self.imageCaching = rl_config.defaultImageCaching
+        self.setImageDownsampling(rl_config.imageTargetDPI, rl_config.imageResampling, rl_config.imageJPEGQuality)
+        self._imageDownsamplingStats = dict(images=0, bytesBefore=0, bytesAfter=0)
 
         self._cropBox = cropBox     #we don't do semantics for these at all
         self._artBox = artBox
@@ -369,6 +384,36 @@ class Canvas(_PDFColorSetter):
         self.state_stack = []
 
         self.setEncrypt(encrypt)
+        self.setStreaming(rl_config.pdfStreaming if streaming is None else streaming)
+        self.setCompressionThreads(rl_config.compressionThreads if compressionThreads is None else compressionThreads)
+        self.setObjectStreams(rl_config.pdfObjectStreams if objectStreams is None else objectStreams)
+
+    def setStreaming(self, onoff):
+        '''
+        If onoff is true the document is written to the file while it is made: each page is written
+        to the file and released by showPage, save writes the rest. Memory use does not grow with the
+        number of pages. Must be set before the first page; getpdfdata can't be used. Encrypted documents
+        are not streamed (they are written by save).
+        '''
+        self._doc.setStreaming(self._filename if onoff else None)
+
+    def setCompressionThreads(self, threads):
+        '''
+        Compress the page and image streams on threads worker threads: showPage and drawImage hand
+        them over as they are finished, save collects them. zlib releases the GIL so the pages
+        are compressed while the next ones are drawn. 0 compresses them on the calling thread.
+        The level and strategy are rl_config.compressionLevel and rl_config.compressionStrategy.
+        '''
+        self._doc.setCompressionThreads(threads)
+
+    def setObjectStreams(self, onoff):
+        '''
+        If onoff is true the objects which are not streams (pages, fonts, annotations, outlines,
+        form fields...) are packed in compressed object streams and the cross reference table
+        is a compressed stream: smaller files, which need a PDF 1.5 reader. Encrypted and signed
+        documents are written without them.
+        '''
+        self._doc.setObjectStreams(onoff)
 
     def setEncrypt(self, encrypt):
         '''
@@ -913,9 +958,61 @@ class Canvas(_PDFColorSetter):
             extraReturn=extraReturn)
         return (img_obj.width, img_obj.height)
 
+    def setImageDownsampling(self, dpi=None, resample='lanczos', jpegQuality=None):
+        '''
+        Images drawn by drawImage at a given size with more pixels than dpi pixels per inch
+        (0 or None: no limit) are downsampled before they are compressed with the PIL filter
+        resample ('nearest', 'box', 'bilinear', 'hamming', 'bicubic' or 'lanczos'). If jpegQuality
+        is set the downsampled images without transparency are encoded as JPEG with this quality
+        (JPEG images are always encoded as JPEG again, with quality 90 by default).
+        The defaults are rl_config.imageTargetDPI, imageResampling and imageJPEGQuality.
+        '''
+        self._imageDPI = dpi
+        self._imageResampling = resample
+        self._imageJPEGQuality = jpegQuality
+
+    def getImageDownsamplingStats(self):
+        '''
+        dict of the number of images downsampled, the bytes of their data before and after
+        (pixels or JPEG data, before compression) and the bytes saved
+        '''
+        stats = self._imageDownsamplingStats.copy()
+        stats['saved'] = stats['bytesBefore']-stats['bytesAfter']
+        return stats
+
+    def _downsampledSize(self, reader, width, height, preserveAspectRatio, anchor, anchorAtXY, dpi):
+        '''(pixel width, pixel height) of the image drawn at width x height points with dpi pixels
+        per inch or None if it has no more pixels'''
+        iw, ih = reader.getSize()
+        width, height = aspectRatioFix(preserveAspectRatio,anchor,0,0,width,height,iw,ih,anchorAtXY)[2:4]
+        scale = max(abs(width)*dpi/72.0/iw, abs(height)*dpi/72.0/ih)
+        if scale>=1:
+            return None
+        return max(1,int(round(iw*scale))), max(1,int(round(ih*scale)))
+
+    def _downsampledImage(self, reader, size, resample, jpegQuality):
+        '''an ImageReader of the image of reader resized to size'''
+        from PIL import Image
+        im = reader._image
+        if im.mode not in ('RGB','RGBA','L','LA','CMYK'):
+            im = im.convert('RGBA' if im.mode in ('P','PA') and ('transparency' in im.info or im.mode=='PA') else 'RGB')
+        small = im.resize(size, getattr(Image.Resampling,resample.upper()))
+        jpeg = reader.jpeg_fh() is not None
+        stats = self._imageDownsamplingStats
+        stats['images'] += 1
+        stats['bytesBefore'] += len(reader.fp.getvalue()) if jpeg else im.size[0]*im.size[1]*len(im.getbands())
+        if (jpegQuality or jpeg) and small.mode in ('RGB','L','CMYK'):
+            buf = BytesIO()
+            small.save(buf, 'JPEG', quality=jpegQuality or 90)
+            stats['bytesAfter'] += buf.tell()
+            buf.seek(0)
+            return ImageReader(buf)
+        stats['bytesAfter'] += size[0]*size[1]*len(small.getbands())
+        return ImageReader(small)
+
     def drawImage(self, image, x, y, width=None, height=None, mask=None, 
             preserveAspectRatio=False, anchor='c', anchorAtXY=False, showBoundary=False,
-            extraReturn=None):
+            extraReturn=None, dpi=None, resample=None, jpegQuality=None):
         """Draws the image (ImageReader object or filename) as specified.
 
         "image" may be an image filename or an ImageReader object. 
@@ -973,36 +1070,81 @@ class Canvas(_PDFColorSetter):
         whether to reuse it.
 
         In general you should use drawImage in preference to drawInlineImage
-        unless you have read the PDF Spec and understand the tradeoffs."""        
+        unless you have read the PDF Spec and understand the tradeoffs.
+
+        If width and height are given, images with more than dpi pixels per inch
+        at this size are downsampled with the resample filter and maybe encoded
+        as JPEG with jpegQuality, the defaults are set by setImageDownsampling."""        
        
         self._currentPageHasImages = 1
 
+        # the pixels needed to draw the image at its size (None: all)
+        downsample = reader = None
+        if dpi is None: dpi = self._imageDPI
+        if dpi and width is not None and height is not None:
+            reader = image if isinstance(image,ImageReader) else ImageReader(image)
+            downsample = self._downsampledSize(reader,width,height,preserveAspectRatio,anchor,anchorAtXY,dpi)
+            if resample is None: resample = self._imageResampling
+            if jpegQuality is None: jpegQuality = self._imageJPEGQuality
+        if downsample is None:
+            ds = b''
+        else:
+            ds = ('%dx%d %s %s' % (downsample+(resample,jpegQuality))).encode('utf8')
+
         # first, generate a unique name/signature for the image.  If ANYTHING
         # is different, even the mask, this should be different.
         if isinstance(image,ImageReader):
-            rawdata = image.getRGBData()
-            smask = image._dataA
-            if mask=='auto' and smask:
-                mdata = smask.getRGBData()
-            else:
+            fp = getattr(image,'fp',None)
+            if not isStr(image.fileName) and isinstance(fp,BytesIO):
+                #read from a file-like object: its bytes identify it without decoding it
+                rawdata = fp.getvalue()
                 mdata = str(mask)
+            else:
+                rawdata = image.getRGBData()
+                smask = image._dataA
+                if mask=='auto' and smask:
+                    mdata = smask.getRGBData()
+                else:
+                    mdata = str(mask)
             if isUnicode(mdata):
                 mdata = mdata.encode('utf8')
-            name = _digester(rawdata+mdata)
+            name = _digester(rawdata+mdata+ds)
+            contentName = name
         else:
             #filename, use it
             s = '%s%s' % (image, mask)
             if isUnicode(s):
                 s = s.encode('utf-8')
-            name = _digester(s)
+            name = _digester(s+ds)
+            contentName = None
 
         # in the pdf document, this will be prefixed with something to
         # say it is an XObject.  Does it exist yet?
         regName = self._doc.getXObjectName(name)
         imgObj = self._doc.idToObject.get(regName, None)
         if not imgObj:
-            #first time seen, create and register the PDFImageXobject
-            imgObj = pdfdoc.PDFImageXObject(name, image, mask=mask)
+            #first time seen, look for it in the images encoded by the process (see pdfdoc.imageCache)
+            cacheKey = None
+            if rl_config.pdfImageCacheSize:
+                if contentName is None:
+                    f = open_for_read(image,'b')
+                    try:
+                        contentName = _digester(f.read()+str(mask).encode('utf8')+ds)
+                    finally:
+                        f.close()
+                cacheKey = pdfdoc.imageCache.key(contentName)
+                imgObj = pdfdoc.imageCache.get(cacheKey)
+            if not imgObj:
+                #create the PDFImageXobject
+                if downsample is not None:
+                    image = self._downsampledImage(reader,downsample,resample,jpegQuality)
+                imgObj = pdfdoc.PDFImageXObject(name, image, mask=mask)
+                imgObj.compressLater(self._doc)
+                smask = getattr(imgObj,'_smask',None)
+                if smask:
+                    smask.compressLater(self._doc)
+                if cacheKey is not None:
+                    pdfdoc.imageCache.put(cacheKey, imgObj)
             imgObj.name = name
             self._setXObjects(imgObj)
             self._doc.Reference(imgObj, regName)
@@ -522,6 +522,9 @@ class BaseDocTemplate:
                     'printClip': None,
                     'printScaling': None,
                     'duplex': None,
+                    'streaming': None,
+                    'compressionThreads': None,
+                    'objectStreams': None,
                     }
     _invalidInitArgs = ()
     _firstPageTemplateIndex = 0
@@ -1005,6 +1008,14 @@ class BaseDocTemplate:
                             )
 
         getattr(canv,'setEncrypt',lambda x: None)(self.encrypt)
+        if self.streaming is not None:
+            # multiBuild makes several documents and saves only the last one: never streamed
+            getattr(canv,'setStreaming',lambda x: None)(self.streaming and getattr(self,'_doSave',1))
+        if self.compressionThreads is not None:
+            # the passes of multiBuild which are not saved are not compressed
+            getattr(canv,'setCompressionThreads',lambda x: None)(self.compressionThreads if getattr(self,'_doSave',1) else 0)
+        if self.objectStreams is not None:
+            getattr(canv,'setObjectStreams',lambda x: None)(self.objectStreams)
 
         canv._cropMarks = self.cropMarks
         canv.setAuthor(self.author)
@@ -399,10 +399,13 @@ class Image(Flowable):
     _fixedWidth = 1
     _fixedHeight = 1
     def __init__(self, filename, width=None, height=None, kind='direct',
-                 mask="auto", lazy=1, hAlign='CENTER', useDPI=False):
-        """If size to draw at not specified, get it from the image."""
+                 mask="auto", lazy=1, hAlign='CENTER', useDPI=False,
+                 dpi=None, resample=None, jpegQuality=None):
+        """If size to draw at not specified, get it from the image.
+        dpi, resample and jpegQuality set the downsampling of the image (see canvas.drawImage)."""
         self.hAlign = hAlign
         self._mask = mask
+        self._downsampling = dict(dpi=dpi, resample=resample, jpegQuality=jpegQuality)
         fp = hasattr(filename,'read')
         self._drawing = None
         if fp:
@@ -532,6 +535,7 @@ class Image(Flowable):
                                     self.drawWidth,
                                     self.drawHeight,
                                     mask=self._mask,
+                                    **getattr(self,'_downsampling',{})
                                     )
             if lazy>=2:
                 self._img = self._file = None
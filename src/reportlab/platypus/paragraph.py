@@ -12,7 +12,7 @@ __doc__='''The standard paragraph implementation'''
 from string import whitespace
 from operator import truth
 from unicodedata import category
-from reportlab.pdfbase.pdfmetrics import stringWidth, getAscentDescent, getFont
+from reportlab.pdfbase.pdfmetrics import stringWidth, stringWidths, getAscentDescent, getFont
 from reportlab.pdfbase.ttfonts import shapeFragWord
 from reportlab.platypus.paraparser import ParaParser, _PCT, _num as _parser_num, _re_us_value
 from reportlab.platypus.flowables import Flowable
@@ -1892,7 +1892,7 @@ class Paragraph(Flowable):
             f = frags[0]
             fS = f.fontSize
             fN = f.fontName
-            return max(stringWidth(w,fN,fS) for w in (split(f.text, ' ') if hasattr(f,'text') else f.words))
+            return max(stringWidths(split(f.text, ' ') if hasattr(f,'text') else f.words,fN,fS))
         else:
             return max(w[0] for w in _getFragWords(frags))
 
@@ -31,7 +31,7 @@ from reportlab.lib.utils import annotateException, IdentStr, flatten, isStr, asN
 from reportlab.lib.validators import isListOfNumbersOrNone
 from reportlab.lib.rl_accel import fp_str
 from reportlab.lib.abag import ABag as CellFrame
-from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.pdfbase.pdfmetrics import stringWidth, stringWidths
 from reportlab.platypus.doctemplate import Indenter, NullActionFlowable
 from reportlab.platypus.flowables import LIIndenter
 from collections import namedtuple
@@ -605,7 +605,7 @@ class Table(Flowable):
                 return 0
         fontName = s.fontname
         fontSize = s.fontsize
-        return max([stringWidth(x,fontName,fontSize) for x in v])
+        return max(stringWidths(v,fontName,fontSize))
 
     def _calc_height(self, availHeight, availWidth, H=None, W=None):
         H = self._argH
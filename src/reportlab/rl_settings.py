@@ -72,7 +72,20 @@ xmlParser
 textPaths
 toColorCanUse
 defCWRF
-shapedFontGlob'''.split())
+shapedFontGlob
+pdfStreaming
+compressionThreads
+compressionLevel
+compressionStrategy
+pdfObjectStreams
+pdfImageCacheSize
+imageTargetDPI
+imageResampling
+imageJPEGQuality
+ttfMmap
+ttfSubsetCacheSize
+ttfParsedCacheSize
+stringWidthCacheSize'''.split())
 
 allowTableBoundsErrors =    1 # set to 0 to die on too large elements in tables in debug (recommend 1 for production use)
 shapeChecking =             1
@@ -171,6 +184,19 @@ toColorCanUse='rl_extended_literal_eval'            #change to None or 'rl_safe_
 defCWRF=0.02                                        #fraction we can reduce defined column widths for overcommitted
                                                     #undefined widths
 shapedFontGlob=None                                 #None or space list of glob patterns that match shaped font names
+pdfStreaming=0                                      #if true canvases write each page to their file when it is finished
+compressionThreads=0                                #threads compressing the page and image streams, 0 for none
+compressionLevel=6                                  #zlib compression level of the streams 0-9 (6 is zlib's default)
+compressionStrategy='default'                       #zlib strategy of the streams 'default', 'filtered', 'huffman', 'rle' or 'fixed'
+pdfObjectStreams=0                                  #if true objects are packed in compressed object streams with an xref stream (PDF 1.5)
+pdfImageCacheSize=32*1024*1024                      #bytes of encoded images kept between documents by pdfdoc.imageCache, 0 to disable
+imageTargetDPI=None                                 #if set drawImage downsamples images to this resolution at their drawn size
+imageResampling='lanczos'                           #PIL filter of the downsampling 'nearest', 'box', 'bilinear', 'hamming', 'bicubic', 'lanczos'
+imageJPEGQuality=None                               #if set downsampled images without transparency are encoded as JPEG with this quality
+ttfMmap=1                                           #if true TrueType font files are memory mapped instead of read
+ttfSubsetCacheSize=4*1024*1024                      #bytes of TrueType font subsets kept between documents, 0 to disable
+ttfParsedCacheSize=16                               #number of parsed TrueType font files kept for the next fonts, 0 to disable
+stringWidthCacheSize=16384                          #number of (font, string) widths kept by stringWidth, 0 to disable
 
 # places to look for T1Font information
 T1SearchPath =  (
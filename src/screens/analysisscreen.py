@@ -3,16 +3,19 @@ Analysis Screen
 
 """
 from kivy.uix.screenmanager import Screen
-from colorimetry import Session, Sample
+from colorimetry import Session, Sample, ReportExport
 from kivy.uix.boxlayout import BoxLayout
-from kivy.properties import NumericProperty, ObjectProperty
+from kivy.properties import BooleanProperty, NumericProperty, ObjectProperty, StringProperty
 from kivy.app import App
 from kivy.base import Builder
+from kivy.clock import Clock, mainthread
 from kivy.uix.behaviors import TouchRippleButtonBehavior
 from kivy.factory import Factory
 from kivy_garden.graph import Graph, LinePlot, PointPlot
 from kivy.metrics import dp
 from popups import EvalConcentrationPopup
+from plotting import DecimatedPlot
+from datagrid import SessionDataModel
 from math import isclose
 
 
@@ -24,20 +27,26 @@ kv_str: str = """
 <DataGridItem>:
     orientation: "horizontal"
     Label:
-        text: f"{root.concentration:.2e}"
+        text: root.concentration_text
     Label:
-        text: f"{root.absorbance:.3f}" if root.absorbance is not None else "--"
-        
-        
+        text: root.absorbance_text
+
+
+<SortHeader@ButtonBehavior+Label>:
+    column: ''
+    title: ''
+    sort_column: ''
+    reverse: False
+    text: self.title + ((' (-)' if self.reverse else ' (+)') if self.sort_column == self.column else '')
+
+
 <DataGrid@RecycleView>:
     viewclass: 'DataGridItem'
-    RecycleBoxLayout:
+    RecycleRowsLayout:
+        # height of the rows
         default_size: None, dp(56)
-        # defines the size of the widget in reference to width and height
-        default_size_hint: 1, None
         size_hint_y: None
         height: self.minimum_height
-        orientation: 'vertical' # defines the orientation of data item
 
 
 <AnalysisScreen>:
@@ -80,10 +89,18 @@ kv_str: str = """
                 orientation: 'horizontal'
                 size_hint_y: None
                 height: dp(20)
-                Label:
-                    text: 'Concentration (mol/L)'
-                Label:
-                    text: 'Absorbance (U.A.)'
+                SortHeader:
+                    column: 'concentration'
+                    title: 'Concentration (mol/L)'
+                    sort_column: root.sort_column or ''
+                    reverse: root.sort_reverse
+                    on_release: root.sort_data_grid(self.column)
+                SortHeader:
+                    column: 'absorbance'
+                    title: 'Absorbance (U.A.)'
+                    sort_column: root.sort_column or ''
+                    reverse: root.sort_reverse
+                    on_release: root.sort_data_grid(self.column)
             DataGrid:
                 id: data_grid
         Graph:
@@ -150,26 +167,116 @@ class DataGridItem(TouchRippleButtonBehavior, BoxLayout):
     """
     sample = ObjectProperty(None)
     remove_sample = ObjectProperty(None)
-    absorbance = NumericProperty(0.0, allownone=True)
-    concentration = NumericProperty(0.0)
+    absorbance_text = StringProperty("--")
+    concentration_text = StringProperty("")
     ripple_duration_in = 0.2
 
     def on_release(self) -> None:
         self.remove_sample(self.sample)
 
 
+class SessionData:
+    def __init__(self, number: int) -> None:
+        """
+        Lightweight state of a session, kept when its screen is not built
+        ---
+        number : id of the session
+        session : data of the session
+        report_export : running (or last) pdf export
+        screen : screen showing the session (None when it is not built)
+        """
+        self.number: int = number
+        self.session: Session = Session()
+        self.report_export: ReportExport | None = None
+        self.screen: AnalysisScreen | None = None
+
+    @mainthread
+    def export_done(self, report_export: ReportExport):
+        """
+        Called (in the main thread) when the background export ends
+        the screen that started the export may have been recycled: the screen showing the session now is updated
+        :param report_export: the finished export
+        """
+        if self.screen is not None:
+            self.screen.export_done(report_export)
+        if report_export.path is not None:
+            popup = Factory.MessagePopup(message='le fichier est disponible dans votre dossier document.')
+            popup.open()
+        elif report_export.error is not None:
+            popup = Factory.MessagePopup(message="l'export du document a échoué.")
+            popup.open()
+
+
 class AnalysisScreen(Screen):
     """
     Analysis screen for display sessions's data as table and graph
+    the screen shows a SessionData, it can be recycled for another session (see bind_session)
     number: id of this session
+    sort_column: column sorting the data grid (None: order of the session)
+    sort_reverse: the data grid is sorted in descending order
     """
     number = NumericProperty(0)
+    sort_column = StringProperty(None, allownone=True)
+    sort_reverse = BooleanProperty(False)
 
-    def __init__(self, **kwargs):
+    def __init__(self, data: SessionData | None = None, **kwargs):
         super().__init__(**kwargs)
-        self.session = Session()  # class to handle data and perform all operations
+        self.data: SessionData | None = None  # session shown
         self.data_plot = PointPlot(point_size=dp(5), color=(0, 0, 1, 1))  # plot for measures
         self.regression_plot = LinePlot(color=(0, 1, 1, 1), line_width=dp(2))  # plot for regression line
+        self.data_points = DecimatedPlot(self.data_plot, graph=self.ids.data_plot)  # points given to data_plot
+        self.grid_model = SessionDataModel()  # rows of the data grid, formatted when shown
+        self.ids.data_grid.data_model = self.grid_model
+        self._session_changes: list[tuple[str, int | None, Sample | None]] = []  # not yet shown
+        self._apply_session_changes = Clock.create_trigger(self.apply_session_changes)
+        self.bind_session(data if data is not None else SessionData(self.number))
+
+    @property
+    def session(self) -> Session:
+        """
+        class to handle data and perform all operations
+        """
+        return self.data.session
+
+    @property
+    def report_export(self) -> ReportExport | None:
+        """
+        running pdf export of the session
+        """
+        return self.data.report_export if self.data is not None else None
+
+    @report_export.setter
+    def report_export(self, value: ReportExport | None) -> None:
+        self.data.report_export = value
+
+    def bind_session(self, data: SessionData) -> None:
+        """
+        shows a session on this screen (widgets are kept, only their content is updated)
+        :param data: session to show
+        """
+        if self.data is not None:
+            self.data.session.unbind(self.on_session_change)
+            self.data.screen = None
+        self.data = data
+        data.screen = self
+        self._session_changes.clear()
+        data.session.bind(self.on_session_change)
+        self.number = data.number
+        self.ids.baseline_button.color = [0, 1, 0, 1] if data.session.reference is not None else [1, 0, 0, 1]
+        running = data.report_export is not None and data.report_export.running
+        self.ids.report_button.text = 'Annuler export' if running else 'Exporter Document'
+        self.update_data_grid()
+        self.update_graph()
+
+    def release_session(self) -> None:
+        """
+        forgets the session shown (the screen goes back to the pool of screens)
+        """
+        self.data.session.unbind(self.on_session_change)
+        self.data.screen = None
+        self._session_changes.clear()
+        self.data = None
+        self.grid_model.show(None)
 
     def ask_concentration(self):
         """
@@ -202,8 +309,6 @@ class AnalysisScreen(Screen):
         sample = Sample(red_value=sample_value[0], green_value=sample_value[1], blue_value=sample_value[2],
                         concentration=concentration)
         self.session.add_sample(sample)
-        self.update_data_grid()
-        self.update_graph()
 
     def ask_reference(self):
         """
@@ -224,8 +329,6 @@ class AnalysisScreen(Screen):
         # Clock.schedule_once(lambda dt: ConcentrationPopup().open(), 0.2)
         self.ids.baseline_button.color = [0, 1, 0, 1]
         self.session.reference = reference
-        self.update_data_grid()
-        self.update_graph()
 
     def ask_remove_sample(self, sample: Sample):
         """
@@ -244,8 +347,6 @@ class AnalysisScreen(Screen):
         :param sample: sample to be removed
         """
         self.session.remove_sample(sample)
-        self.update_data_grid()
-        self.update_graph()
 
     def ask_evaluate_concentration(self):
         """
@@ -269,32 +370,70 @@ class AnalysisScreen(Screen):
         popup.concentration_value = concentration
         popup.open()
 
+    def on_session_change(self, session: Session, event: str, index: int | None, sample: Sample | None):
+        """
+        Called after each change of the session
+        changes are shown at the next frame, all at once (the regression is computed once)
+        """
+        self._session_changes.append((event, index, sample))
+        self._apply_session_changes()
+
+    def apply_session_changes(self, dt: float = 0):
+        """
+        shows the changes of the session: rows and points are inserted or removed one by one,
+        everything is updated only if the reference changed or the session was cleared
+        """
+        changes, self._session_changes = self._session_changes, []
+        if not changes or self.data is None:
+            return
+        graph_shown = self.data_plot in self.ids.data_plot.plots
+        if not graph_shown or any(event in ('reference', 'clear') for event, _, _ in changes):
+            self.update_data_grid()
+            self.update_graph()
+            return
+        for event, index, sample in changes:
+            if event == 'add':
+                self.grid_model.inserted(index)
+                self.data_points.insert(index, (sample.concentration, sample.absorbance))
+            else:
+                self.grid_model.removed(index)
+                self.data_points.remove(index)
+        self.update_graph(points=False)
+
     def update_data_grid(self):
         """
         updates the data grid after changes
+        rows are read from the columns of the session and formatted only when they are shown
+        """
+        self.grid_model.show(self.session, self.ask_remove_sample)
+
+    def sort_data_grid(self, column: str):
+        """
+        sorts the data grid by a column: ascending, then descending, then in the order of the session
+        :param column: 'concentration' or 'absorbance'
         """
-        self.ids.data_grid.data = [{'concentration': item[0], 'absorbance': item[1], 'sample': item[2], 'remove_sample': self.ask_remove_sample} for item in self.session.absorbance_data_points]
+        if self.sort_column != column:
+            self.sort_column, self.sort_reverse = column, False
+        elif not self.sort_reverse:
+            self.sort_reverse = True
+        else:
+            self.sort_column, self.sort_reverse = None, False
+        self.grid_model.sort(self.sort_column, self.sort_reverse)
 
-    def update_graph(self):
+    def update_graph(self, points: bool = True):
         """
         updates the graphs after changes
+        :param points: sets all the points of the data plot (else they are already up to date)
+        the data plot gets at most data_points.budget points, decimated again only if the data or the x range changed
         """
         try:
             graph: Graph = self.ids.data_plot
             # if we can plot data
             if self.session.reference is not None and len(self.session.absorbance_data_points) > 0:
-                # prepare plot data (points)
-                max_absorbance = 0
-                max_concentration = 0
-                data_points = self.session.absorbance_data_points
-                coordinates_list = []
-                for i in range(len(data_points)):
-                    if data_points[i][1] is not None and data_points[i][1] > max_absorbance:
-                        max_absorbance = data_points[i][1]
-                    if data_points[i][0] > max_concentration:
-                        max_concentration = data_points[i][0]
-                    coordinates_list.append((data_points[i][0], data_points[i][1]))
-                self.data_plot.points = coordinates_list
+                # plot data (points)
+                if points:
+                    self.data_points.set_points([(c, a) for c, a, _ in self.session.absorbance_data_points])
+                max_concentration, max_absorbance = self.session.absorbance_bounds
                 # max graphique = max val + 10%
                 if isclose(max_concentration, 0.0):
                     graph.xmax = 0.001
@@ -320,6 +459,8 @@ class AnalysisScreen(Screen):
                     graph.add_plot(self.data_plot)
                 if self.regression_plot not in graph.plots:
                     graph.add_plot(self.regression_plot)
+                # decimated points of the visible range
+                self.data_points.update()
             # remove plots / disable buttons / remove equation if we can't plot
             else:
                 raise TypeError  # to eliminate duplicate... same code as if there were errors
@@ -338,7 +479,19 @@ class AnalysisScreen(Screen):
     def export_report(self):
         """
         Exports the session data and graph to a pdf document
+        the export runs in the background on a snapshot of the session
+        pressing the button again during the export cancels it
         """
-        self.session.export_report(self.number)
-        popup = Factory.MessagePopup(message='le fichier est disponible dans votre dossier document.')
-        popup.open()
+        if self.report_export is not None and self.report_export.running:
+            self.report_export.cancel()
+            return
+        self.ids.report_button.text = 'Annuler export'
+        self.report_export = ReportExport(self.session, self.number, on_done=self.data.export_done).start()
+
+    def export_done(self, report_export: ReportExport):
+        """
+        Called by the session shown when its background export ends
+        :param report_export: the finished export
+        """
+        if report_export is self.report_export:
+            self.ids.report_button.text = 'Exporter Document'
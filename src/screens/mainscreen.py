@@ -21,6 +21,12 @@ kv_str = """
             text: "Créer session d'analyse"
             font_size: '20sp'
             on_release: app.sm.add_session()
+        Button:
+            size_hint_y: None
+            height: dp(50)
+            background_normal: 'images/blank.png'
+            text: "Exporter toutes les sessions"
+            on_release: app.sm.export_sessions()
         BoxLayout:
             orientation: "horizontal"
             size_hint_y: None